@@ -1,17 +1,29 @@
 import os
+import threading
 from dotenv import load_dotenv
 from agent_core.holistic_ai_bedrock import get_chat_model
 from langchain.agents import create_agent
 from agent_core.tools import (
     get_state,
     set_state,
+    patch_state,
+    allocate_tasks,
+    check_fairness,
+    check_progress,
+    set_task_dependencies,
+    task_slack,
+    rank_tasks_for_users,
     list_uploaded_files,
     load_document_to_memory,
+    load_documents_to_memory,
     get_document_from_memory,
     save_document_to_memory,
+    search_documents,
+    recall_tool_result,
     ask_user
 )
 from agent_core.models import ProjectOutputModel
+from agent_core.tool_concurrency import ToolConcurrencyMiddleware
 
 
 load_dotenv()
@@ -29,42 +41,95 @@ Your autonomous loop:
 1. Call get_state to load project_state.
 2. If project_state is empty:
    - Call list_uploaded_files to detect assignment files.
-   - For each file: call load_document_to_memory.
-   - After loading: call get_document_from_memory to retrieve text.
-   - Parse assignment brief from retrieved document.
+   - Call load_documents_to_memory once with all listed files.
+     Independent read-only calls (e.g. several search_documents queries) can be
+     issued together in one turn; they run concurrently.
+   - After loading: call search_documents to retrieve the passages you need
+     (brief, deliverables, deadlines, marking criteria) instead of whole documents.
+   - Parse assignment brief from the retrieved passages.
    - Extract tasks, deliverables, and deadlines.
    - Call ask_user to obtain team preferences.
-   - Allocate tasks based on preferences.
+   - Call set_state with the tasks (skills, effort, deadline) and users
+     (skills, preferences, capacity, CV text if provided). If users gave no
+     preferences, call rank_tasks_for_users to rank tasks by CV/skill match.
+     Then call allocate_tasks to assign them; it writes assigned_to and
+     assignment_plan into project_state.
    - Call set_state to persist the full project plan.
+   - Call set_task_dependencies with which tasks must finish before others
+     start; it rejects cycles and returns the critical path.
+   - Once both have returned, call ProjectOutputModel with the plan as your
+     final answer (its arguments are the structured output; no separate summary).
 
 3. If project_state exists:
-   - Compare actual vs expected progress.
-   - If deviation detected: call corrective_action.
+   - Actual vs expected progress is compared in code before you are called;
+     the deviations it flagged are listed in the request (check_progress
+     returns the current list, check_fairness the workload balance and
+     task_slack the critical path and how far each task can slip).
+   - For each deviation decide how to correct it (e.g. reassign with
+     allocate_tasks or patch_state) and call corrective_action.
    - If no corrective action needed: return "NO_ACTION".
 
 Rules:
 - You MUST call a tool or return "NO_ACTION".
 - Never assume project_state; always retrieve it via get_state.
-- Always write updated project_state using set_state.
+- Always write updated project_state using set_state, or patch_state for small changes.
 """
 
-def build_agent():
-    llm = get_chat_model("claude-3-5-sonnet")
+DEFAULT_MODEL = "claude-3-5-sonnet"
 
-    tools = [
-        get_state,
-        set_state,
-        list_uploaded_files,
-        load_document_to_memory,
-        get_document_from_memory,
-        save_document_to_memory,
-        ask_user
-    ]
+TOOLS = [
+    get_state,
+    set_state,
+    patch_state,
+    allocate_tasks,
+    check_fairness,
+    check_progress,
+    set_task_dependencies,
+    task_slack,
+    rank_tasks_for_users,
+    list_uploaded_files,
+    load_document_to_memory,
+    load_documents_to_memory,
+    get_document_from_memory,
+    save_document_to_memory,
+    search_documents,
+    recall_tool_result,
+    ask_user
+]
+
+_agent_cache = {}
+_agent_cache_lock = threading.Lock()
+
+def build_agent(model_name: str = DEFAULT_MODEL, tools: list = None):
+    llm = get_chat_model(model_name)
 
     agent = create_agent(
         model=llm,
-        tools=tools,
+        tools=tools if tools is not None else TOOLS,
         response_format=ProjectOutputModel,
-        system_prompt=system_prompt
+        system_prompt=system_prompt,
+        middleware=[ToolConcurrencyMiddleware()]
     )
-    return agent
\ No newline at end of file
+    return agent
+
+def get_agent(model_name: str = DEFAULT_MODEL, tools: list = None):
+    """Return the compiled agent for this model and tool set, building it once."""
+    tools = tools if tools is not None else TOOLS
+    key = (model_name, tuple(t.name for t in tools))
+
+    agent = _agent_cache.get(key)
+    if agent is None:
+        with _agent_cache_lock:
+            agent = _agent_cache.get(key)
+            if agent is None:
+                agent = build_agent(model_name, tools)
+                _agent_cache[key] = agent
+    return agent
+
+def invalidate_agent_cache(model_name: str = None) -> int:
+    """Drop cached agents (all, or only those for model_name) so the next call rebuilds."""
+    with _agent_cache_lock:
+        keys = [k for k in _agent_cache if model_name is None or k[0] == model_name]
+        for key in keys:
+            del _agent_cache[key]
+    return len(keys)
@@ -0,0 +1,476 @@
+"""Deterministic task allocation: cost matrix, optimal assignment, fairness.
+
+The three stages mirror the spec's allocation tools:
+
+- ``build_cost_matrix`` (OptimisationMatrixBuilder): a users x tasks NumPy
+  matrix combining skill fit, stated preference and deadline pressure (urgent
+  tasks weight skill fit more heavily);
+- ``solve_assignment`` (HungarianSolver): optimal rectangular assignment.
+  More tasks than people are handled by giving each user ``capacity`` slots.
+  scipy's ``linear_sum_assignment`` over the slot matrix is used when
+  installed, otherwise an equivalent NumPy min-cost-flow solver (successive
+  shortest paths over user nodes);
+- ``fairness_report`` / ``allocate`` (FairnessCheck, Reoptimise): the exact
+  capacity-constrained assignment is checked for workload balance; if it is
+  unfair, overloaded users are priced up (Lagrangian multipliers on their
+  load) and the matrix re-solved until the plan is fair. Each of those rounds
+  is one vectorised argmin, so re-optimising stays cheap. Balancing
+  indivisible efforts is a bin-packing problem, so this stage is a
+  heuristic: the plan is optimal for the priced costs, not necessarily the
+  cheapest fair plan (see ``allocate``).
+
+Everything is deterministic for a given state (ties break on input order).
+"""
+
+import math
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_lsa
+except ImportError:  # optional: the NumPy solver below is used instead
+    _scipy_lsa = None
+
+MAX_REOPTIMISATIONS = 50
+REOPTIMISE_STEP = 0.02
+
+
+class AllocationError(ValueError):
+    """The state does not describe an allocatable problem."""
+
+
+# Inputs ------------------------------------------------------------------------
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    if isinstance(value, dict):
+        return [{**(v if isinstance(v, dict) else {"value": v}), "name": k} for k, v in value.items()]
+    return list(value)
+
+
+def state_tasks(state: dict) -> Tuple[List[dict], Optional[str]]:
+    """Tasks from project_state and the state key they were read from.
+
+    ``tasks`` may be a {name: task} mapping or a list; the spec's
+    ``refined_tasks`` / ``raw_tasks`` are used when ``tasks`` is absent.
+    """
+    for key in ("tasks", "refined_tasks", "raw_tasks"):
+        tasks = state.get(key)
+        if tasks:
+            return [t if isinstance(t, dict) else {"name": str(t)} for t in _as_list(tasks)], key
+    return [], None
+
+
+def state_users(state: dict) -> List[dict]:
+    """Team members with skills, preferences and capacity merged from the spec's state fields."""
+    users = _as_list(state.get("users") or state.get("team"))
+    users = [u if isinstance(u, dict) else {"name": str(u)} for u in users]
+    if not users and state.get("skill_profiles"):
+        users = [{"name": name} for name in state["skill_profiles"]]
+    profiles = state.get("skill_profiles") or {}
+    rankings = state.get("final_rankings") or state.get("ai_rankings") or {}
+    merged = []
+    for user in users:
+        name = user.get("name") or user.get("user")
+        if not name:
+            continue
+        merged.append({
+            **user,
+            "name": name,
+            "skills": user.get("skills") or user.get("expertise") or profiles.get(name) or {},
+            "preferences": user.get("preferences") or rankings.get(name) or [],
+        })
+    return merged
+
+
+def _weights(value: Any) -> Dict[str, float]:
+    """Skill list / comma string / {skill: level} -> {skill: weight in [0, 1]}."""
+    if isinstance(value, str):
+        value = [s for s in value.replace(";", ",").split(",")]
+    if isinstance(value, dict):
+        items = {str(k).strip().lower(): float(v) for k, v in value.items() if isinstance(v, (int, float))}
+        top = max(items.values(), default=0) or 1.0
+        return {k: max(0.0, v / top) for k, v in items.items() if k}
+    return {str(s).strip().lower(): 1.0 for s in value or [] if str(s).strip()}
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value)[:10]).date()
+    except ValueError:
+        return None
+
+
+def _effort(task: dict) -> float:
+    for key in ("effort", "estimated_hours", "hours", "duration"):
+        value = task.get(key)
+        if isinstance(value, (int, float)) and value > 0:
+            return float(value)
+    return 1.0
+
+
+# Cost matrix -------------------------------------------------------------------
+
+def build_cost_matrix(
+    users: Sequence[dict],
+    tasks: Sequence[dict],
+    skill_weight: float = 1.0,
+    preference_weight: float = 1.0,
+    deadline_weight: float = 0.5,
+    today: Optional[date] = None,
+) -> Dict[str, np.ndarray]:
+    """Users x tasks cost (lower is better) and its components, each in [0, 1]."""
+    n_users, n_tasks = len(users), len(tasks)
+    names = [str(t.get("name", i)) for i, t in enumerate(tasks)]
+    task_index = {name: i for i, name in enumerate(names)}
+
+    # Skill fit: weighted overlap of required skills with user skill levels
+    task_skills = [_weights(t.get("skills") or t.get("required_skills") or []) for t in tasks]
+    user_skills = [_weights(u.get("skills")) for u in users]
+    vocabulary = {s: i for i, s in enumerate(sorted({s for ws in task_skills + user_skills for s in ws}))}
+    required = np.zeros((n_tasks, len(vocabulary)))
+    levels = np.zeros((n_users, len(vocabulary)))
+    for i, ws in enumerate(task_skills):
+        for s, w in ws.items():
+            required[i, vocabulary[s]] = w
+    for i, ws in enumerate(user_skills):
+        for s, w in ws.items():
+            levels[i, vocabulary[s]] = w
+    required_total = required.sum(axis=1)
+    fit = np.full((n_users, n_tasks), 0.5)
+    has_skills = required_total > 0
+    if has_skills.any():
+        fit[:, has_skills] = (levels @ required[has_skills].T) / required_total[has_skills]
+
+    # Preference: rank position (1 for the top choice) or explicit scores
+    preference = np.full((n_users, n_tasks), 0.5)
+    for u, user in enumerate(users):
+        prefs = user.get("preferences")
+        if isinstance(prefs, dict) and prefs:
+            scores = np.array([float(v) for v in prefs.values()])
+            low, high = scores.min(), scores.max()
+            preference[u] = 0.0
+            for name, score in prefs.items():
+                if name in task_index:
+                    preference[u, task_index[name]] = 1.0 if high == low else (float(score) - low) / (high - low)
+        elif prefs:
+            ranked = [p for p in prefs if p in task_index]
+            preference[u] = 0.0
+            for rank, name in enumerate(ranked):
+                preference[u, task_index[name]] = 1.0 - rank / max(len(ranked), 1)
+
+    # Deadline pressure: 1 for overdue / due today, 0 at the furthest deadline
+    today = today or date.today()
+    days = np.array([
+        (d - today).days if (d := _parse_date(t.get("deadline"))) else np.nan for t in tasks
+    ], dtype=float)
+    horizon = np.nanmax(days) if np.isfinite(days).any() and np.nanmax(days) > 0 else 30.0
+    pressure = np.where(np.isnan(days), 0.0, np.clip(1.0 - days / horizon, 0.0, 1.0))
+
+    score = skill_weight * fit * (1.0 + deadline_weight * pressure) + preference_weight * preference
+    return {"cost": -score, "fit": fit, "preference": preference, "pressure": pressure}
+
+
+# Solver ------------------------------------------------------------------------
+
+def _transfer_row(cost: np.ndarray, tasks: np.ndarray, u: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Cheapest way to move one of user u's tasks to each other user: (delta, task)."""
+    if len(tasks) == 0:
+        return np.full(cost.shape[0], np.inf), np.full(cost.shape[0], -1)
+    deltas = cost[:, tasks] - cost[u, tasks]
+    best = deltas.argmin(axis=1)
+    row = deltas[np.arange(cost.shape[0]), best]
+    row[u] = np.inf
+    return row, tasks[best]
+
+
+def _successive_shortest_paths(cost: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """Min-cost capacitated assignment of tasks (columns) to users (rows).
+
+    A min-cost flow over user nodes: each task is added along the shortest
+    path that may shift already-assigned tasks between users and ends at a
+    user with a free slot. Bellman-Ford over the dense user x user transfer
+    matrix keeps each step O(users^2) rather than O(slots), since users are
+    few and tasks many.
+    """
+    n_users, n_tasks = cost.shape
+    users = np.arange(n_users)
+    # Warm start: tasks sitting at their own argmin are an optimal partial flow
+    # (every transfer is non-negative). Each user keeps the tasks it is hardest
+    # to replace on, up to capacity; only the overflow needs augmenting.
+    first = cost.argmin(axis=0)
+    regret = np.partition(cost, 1, axis=0)[1] - cost[first, np.arange(n_tasks)] if n_users > 1 else np.zeros(n_tasks)
+    assignment = np.full(n_tasks, -1, dtype=np.int64)
+    members: List[List[int]] = [[] for _ in range(n_users)]
+    for t in np.lexsort((np.arange(n_tasks), -regret)):
+        u = int(first[t])
+        if len(members[u]) < capacity[u]:
+            members[u].append(int(t))
+            assignment[t] = u
+    counts = np.array([len(m) for m in members], dtype=np.int64)
+    transfer = np.full((n_users, n_users), np.inf)
+    transfer_task = np.full((n_users, n_users), -1, dtype=np.int64)
+    for u in users:
+        transfer[u], transfer_task[u] = _transfer_row(cost, np.array(members[u], dtype=np.int64), u)
+
+    for t0 in np.flatnonzero(assignment < 0):
+        dist = cost[:, t0].copy()
+        pred_user = np.full(n_users, -1, dtype=np.int64)
+        pred_task = np.full(n_users, t0, dtype=np.int64)
+        active = users
+        for _ in range(n_users):
+            # Relax only from users whose distance changed in the last round
+            via = dist[active, None] + transfer[active]
+            best = via.argmin(axis=0)
+            candidate = via[best, users]
+            improved = np.flatnonzero(candidate < dist - 1e-12)
+            if not len(improved):
+                break
+            source = active[best[improved]]
+            dist[improved] = candidate[improved]
+            pred_user[improved] = source
+            pred_task[improved] = transfer_task[source, improved]
+            active = improved
+
+        target = int(np.argmin(np.where(counts < capacity, dist, np.inf)))
+        counts[target] += 1
+
+        changed = set()
+        current = target
+        while current != -1:
+            task, previous = int(pred_task[current]), int(pred_user[current])
+            if previous != -1:
+                members[previous].remove(task)
+                changed.add(previous)
+            members[current].append(task)
+            changed.add(current)
+            assignment[task] = current
+            current = previous
+        for u in changed:
+            transfer[u], transfer_task[u] = _transfer_row(cost, np.array(members[u], dtype=np.int64), u)
+    return assignment
+
+
+def solver_name() -> str:
+    return "scipy" if _scipy_lsa is not None else "numpy-ssp"
+
+
+def capacities(users: Sequence[dict], n_tasks: int) -> np.ndarray:
+    """Max tasks per user: their ``capacity``/``max_tasks`` or an even share plus one."""
+    default = math.ceil(n_tasks / max(len(users), 1)) + 1
+    caps = []
+    for user in users:
+        value = user.get("capacity", user.get("max_tasks"))
+        caps.append(int(value) if isinstance(value, (int, float)) and value >= 0 else default)
+    return np.array(caps, dtype=np.int64)
+
+
+def solve_assignment(cost: np.ndarray, capacity: np.ndarray) -> np.ndarray:
+    """Optimal user index for each task with at most ``capacity[u]`` tasks per user.
+
+    The rectangular assignment of tasks to user slots; without binding
+    capacities it is simply the per-task argmin.
+    """
+    n_users, n_tasks = cost.shape
+    if capacity.sum() < n_tasks:
+        raise AllocationError(f"Team capacity ({int(capacity.sum())} tasks) is below the {n_tasks} tasks to assign")
+    assignment = cost.argmin(axis=0)
+    if (np.bincount(assignment, minlength=n_users) <= capacity).all():
+        return assignment
+    if _scipy_lsa is None:
+        return _successive_shortest_paths(cost, capacity)
+    slot_user = np.repeat(np.arange(n_users), capacity)
+    rows, cols = _scipy_lsa(cost.T[:, slot_user])
+    assignment = np.empty(n_tasks, dtype=np.int64)
+    assignment[rows] = slot_user[cols]
+    return assignment
+
+
+# Fairness ----------------------------------------------------------------------
+
+def load_limit(effort: np.ndarray, n_users: int, tolerance: float = 0.25) -> float:
+    """Heaviest fair workload: ``max((1 + tolerance) * mean, mean + largest task)``.
+
+    Indivisible tasks make perfect balance impossible in general, hence the
+    largest-task allowance.
+    """
+    mean = effort.sum() / n_users if n_users else 0.0
+    return max((1 + tolerance) * mean, mean + (effort.max() if len(effort) else 0.0))
+
+
+def fairness_report(
+    assignment: np.ndarray,
+    effort: np.ndarray,
+    n_users: int,
+    fit: Optional[np.ndarray] = None,
+    preference: Optional[np.ndarray] = None,
+    tolerance: float = 0.25,
+) -> dict:
+    """Workload balance of an assignment; ``fair`` when the heaviest load is within ``load_limit``."""
+    loads = np.bincount(assignment, weights=effort, minlength=n_users)
+    counts = np.bincount(assignment, minlength=n_users)
+    mean = loads.mean() if n_users else 0.0
+    limit = load_limit(effort, n_users, tolerance)
+    ordered = np.sort(loads)
+    gini = 0.0
+    if loads.sum() > 0:
+        index = np.arange(1, n_users + 1)
+        gini = float((2 * index - n_users - 1) @ ordered / (n_users * ordered.sum()))
+    report = {
+        "fair": bool(loads.max() <= limit + 1e-9) if n_users else True,
+        "loads": loads.tolist(),
+        "task_counts": counts.tolist(),
+        "mean_load": float(mean),
+        "max_load": float(loads.max()) if n_users else 0.0,
+        "min_load": float(loads.min()) if n_users else 0.0,
+        "load_limit": float(limit),
+        "gini": gini,
+    }
+    if fit is not None and len(assignment):
+        tasks = np.arange(len(assignment))
+        report["mean_skill_fit"] = float(fit[assignment, tasks].mean())
+        report["mean_preference"] = float(preference[assignment, tasks].mean())
+    return report
+
+
+def rebalance(
+    cost: np.ndarray, assignment: np.ndarray, effort: np.ndarray, capacity: np.ndarray, limit: float
+) -> np.ndarray:
+    """Move tasks off users over ``limit`` (or capacity), cheapest cost increase first.
+
+    Each move goes to a user who stays within the limit and capacity; stops
+    when nobody is overloaded or no such move exists.
+    """
+    assignment = assignment.copy()
+    n_users = cost.shape[0]
+    loads = np.bincount(assignment, weights=effort, minlength=n_users)
+    counts = np.bincount(assignment, minlength=n_users)
+    tasks = np.arange(len(assignment))
+    while True:
+        overloaded = (loads > limit + 1e-9) | (counts > capacity)
+        if not overloaded.any():
+            return assignment
+        movable = tasks[overloaded[assignment]]
+        delta = cost[:, movable] - cost[assignment[movable], movable]
+        fits = (loads[:, None] + effort[None, movable] <= limit + 1e-9) & (counts < capacity)[:, None]
+        delta = np.where(fits, delta, np.inf)
+        best = int(delta.argmin())
+        if not np.isfinite(delta.flat[best]):
+            return assignment
+        user, column = divmod(best, len(movable))
+        task = movable[column]
+        loads[assignment[task]] -= effort[task]
+        counts[assignment[task]] -= 1
+        loads[user] += effort[task]
+        counts[user] += 1
+        assignment[task] = user
+
+
+def allocate(
+    state: dict,
+    skill_weight: float = 1.0,
+    preference_weight: float = 1.0,
+    deadline_weight: float = 0.5,
+    fairness_tolerance: float = 0.25,
+    today: Optional[date] = None,
+) -> dict:
+    """Full pipeline over project_state: matrix -> solve -> fairness check -> re-optimise.
+
+    The first solve is the exact capacity-constrained assignment
+    (``solve_assignment``); when its workloads are fair it is the plan, with
+    ``reoptimisations`` 0. Otherwise overloaded users get a growing
+    per-unit-of-effort penalty (and users over capacity a per-task one) and the
+    assignment is re-solved until loads are within the fairness limit. If the
+    prices have not settled after ``MAX_REOPTIMISATIONS`` rounds, the priced
+    matrix goes through the exact solver and any remaining overload is moved
+    off with ``rebalance``. A re-optimised plan is fair but can cost more than
+    the cheapest fair plan (within 10% on small instances checked against brute
+    force in tests/test_allocation.py). Returns the assignment plan (task name ->
+    user name, per-user loads and the fairness report) plus ``task_assignments``,
+    (task index, user name) pairs in the order of the state's tasks, which stay
+    exact when task names repeat. Raises ``AllocationError`` if there are no
+    tasks or users.
+    """
+    tasks, tasks_key = state_tasks(state)
+    users = state_users(state)
+    if not tasks:
+        raise AllocationError("project_state has no tasks to allocate")
+    if not users:
+        raise AllocationError("project_state has no users (or skill_profiles) to allocate to")
+
+    matrices = build_cost_matrix(users, tasks, skill_weight, preference_weight, deadline_weight, today)
+    cost = matrices["cost"]
+    effort = np.array([_effort(t) for t in tasks])
+    capacity = capacities(users, len(tasks))
+    if capacity.sum() < len(tasks):
+        raise AllocationError(f"Team capacity ({int(capacity.sum())} tasks) is below the {len(tasks)} tasks to assign")
+    n_users = len(users)
+    limit = load_limit(effort, n_users, fairness_tolerance)
+    mean_load = effort.sum() / n_users
+    relative_effort = effort / effort.mean()
+    # Price steps are relative to the spread of the cost matrix
+    scale = float(np.ptp(cost)) or 1.0
+    load_prices = np.zeros(n_users)
+    count_prices = np.zeros(n_users)
+
+    assignment = solve_assignment(cost, capacity)
+    if (np.bincount(assignment, weights=effort, minlength=n_users) <= limit + 1e-9).all():
+        rounds = 0
+    else:
+        for rounds in range(1, MAX_REOPTIMISATIONS + 1):
+            step = REOPTIMISE_STEP * scale / math.sqrt(rounds)
+            over_load = np.bincount(assignment, weights=effort, minlength=n_users) - limit
+            over_count = np.bincount(assignment, minlength=n_users) - capacity
+            load_prices = np.maximum(0.0, load_prices + step * over_load / mean_load)
+            count_prices = np.maximum(0.0, count_prices + step * over_count)
+            priced = cost + load_prices[:, None] * relative_effort[None, :] + count_prices[:, None]
+            assignment = priced.argmin(axis=0)
+            over_load = np.bincount(assignment, weights=effort, minlength=n_users) - limit
+            over_count = np.bincount(assignment, minlength=n_users) - capacity
+            if (over_load <= 1e-9).all() and (over_count <= 0).all():
+                break
+        else:
+            assignment = rebalance(cost, solve_assignment(priced, capacity), effort, capacity, limit)
+
+    report = fairness_report(
+        assignment, effort, n_users, matrices["fit"], matrices["preference"], fairness_tolerance
+    )
+    user_names = [u["name"] for u in users]
+    task_names = [str(t.get("name", i)) for i, t in enumerate(tasks)]
+    return {
+        "tasks_key": tasks_key,
+        "task_assignments": [(t, user_names[u]) for t, u in enumerate(assignment)],
+        "assignments": {task_names[t]: user_names[u] for t, u in enumerate(assignment)},
+        "loads": dict(zip(user_names, report.pop("loads"))),
+        "task_counts": dict(zip(user_names, report.pop("task_counts"))),
+        "fairness": report,
+        "objective": float(cost[assignment, np.arange(len(tasks))].sum()),
+        "reoptimisations": rounds,
+        "weights": {"skill": skill_weight, "preference": preference_weight, "deadline": deadline_weight},
+        "solver": solver_name(),
+    }
+
+
+def fairness_of_state(state: dict, tolerance: float = 0.25) -> dict:
+    """Fairness report for the ``assigned_to`` values already in project_state."""
+    tasks, _ = state_tasks(state)
+    users = state_users(state)
+    user_index = {u["name"]: i for i, u in enumerate(users)}
+    if not tasks or not users:
+        raise AllocationError("project_state needs tasks and users to check fairness")
+    assigned = [(i, user_index.get(t.get("assigned_to"))) for i, t in enumerate(tasks)]
+    unassigned = [str(tasks[i].get("name", i)) for i, u in assigned if u is None]
+    indices = np.array([i for i, u in assigned if u is not None], dtype=np.int64)
+    assignment = np.array([u for _, u in assigned if u is not None], dtype=np.int64)
+    effort = np.array([_effort(tasks[i]) for i in indices])
+    report = fairness_report(assignment, effort, len(users), tolerance=tolerance)
+    user_names = [u["name"] for u in users]
+    report["loads"] = dict(zip(user_names, report["loads"]))
+    report["task_counts"] = dict(zip(user_names, report["task_counts"]))
+    report["unassigned"] = unassigned
+    return report
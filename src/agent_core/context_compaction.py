@@ -0,0 +1,140 @@
+"""Token-budgeted compaction of the message history sent to the proxy.
+
+Every ReAct turn re-sends all earlier tool results, so long ingestion runs
+grow the payload roughly quadratically. Before each call the compactor:
+
+1. replaces earlier copies of identical tool results with a short pointer
+   to the latest copy, and
+2. if the estimated size is still over the token budget, replaces the
+   oldest large tool results (outside the most recent few) with a stub
+   holding a preview and a reference that ``recall_tool_result`` resolves.
+
+Only content strings change; tool_use / tool_result pairing is preserved.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+DEFAULT_BUDGET_TOKENS = int(os.getenv("HOLISTIC_AI_CONTEXT_BUDGET", "50000"))
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text and JSON
+    return len(text) // 4 + 1
+
+
+class ReferenceStore:
+    """Bounded map of elided tool-result content, keyed by reference."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, content: str) -> str:
+        ref = "ref_" + hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            self._items[ref] = content
+            self._items.move_to_end(ref)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        with self._lock:
+            return self._items.get(ref)
+
+
+references = ReferenceStore()
+
+
+def _tool_results(api_messages: List[dict]) -> List[dict]:
+    """The tool_result blocks of api_messages, oldest first."""
+    blocks = []
+    for message in api_messages:
+        content = message.get("content")
+        if message.get("role") == "user" and isinstance(content, list):
+            blocks.extend(b for b in content if isinstance(b, dict) and b.get("type") == "tool_result")
+    return blocks
+
+
+def _message_tokens(api_messages: List[dict]) -> int:
+    total = 0
+    for message in api_messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+        elif isinstance(content, list):
+            for block in content:
+                total += estimate_tokens(str(block.get("content") or block.get("text") or block.get("input") or ""))
+    return total
+
+
+class ContextCompactor:
+    def __init__(
+        self,
+        budget_tokens: int = DEFAULT_BUDGET_TOKENS,
+        keep_recent: int = 3,
+        min_elide_chars: int = 2000,
+        min_dedupe_chars: int = 500,
+        preview_chars: int = 300,
+        reference_store: ReferenceStore = references,
+    ):
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.min_elide_chars = min_elide_chars
+        self.min_dedupe_chars = min_dedupe_chars
+        self.preview_chars = preview_chars
+        self.reference_store = reference_store
+
+    def compact(self, api_messages: List[dict]) -> Tuple[List[dict], dict]:
+        """Compact tool results in place; returns the messages and a stats dict."""
+        before = _message_tokens(api_messages)
+        results = _tool_results(api_messages)
+        deduped = elided = 0
+
+        # 1. Dedupe: keep only the latest copy of each large, repeated result
+        latest = {}
+        for block in results:
+            text = str(block.get("content", ""))
+            if len(text) >= self.min_dedupe_chars:
+                latest[hashlib.sha256(text.encode("utf-8")).hexdigest()] = block
+        for block in results:
+            text = str(block.get("content", ""))
+            if len(text) < self.min_dedupe_chars:
+                continue
+            keeper = latest[hashlib.sha256(text.encode("utf-8")).hexdigest()]
+            if keeper is not block:
+                block["content"] = (
+                    f"[Duplicate of the later tool result for {keeper.get('tool_use_id')}; content omitted]"
+                )
+                deduped += 1
+
+        # 2. Budget: stub out the oldest large results until under budget
+        total = _message_tokens(api_messages)
+        candidates = results[:-self.keep_recent] if self.keep_recent else results
+        for block in candidates:
+            if total <= self.budget_tokens:
+                break
+            text = str(block.get("content", ""))
+            if len(text) < self.min_elide_chars or text.startswith("[Elided"):
+                continue
+            ref = self.reference_store.put(text)
+            stub = (
+                f"[Elided tool result, {len(text)} chars, reference {ref}. "
+                f"Call recall_tool_result('{ref}') for the full text, or search_documents for passages. "
+                f"Preview: {text[:self.preview_chars]}]"
+            )
+            block["content"] = stub
+            total -= estimate_tokens(text) - estimate_tokens(stub)
+            elided += 1
+
+        return api_messages, {
+            "tokens_before": before,
+            "tokens_after": _message_tokens(api_messages),
+            "deduplicated": deduped,
+            "elided": elided,
+        }
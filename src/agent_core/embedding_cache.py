@@ -0,0 +1,225 @@
+"""Persistent embedding cache keyed by (model, text hash).
+
+Vectors live in one float16 matrix per model, memory-mapped from
+``vectors.f16`` and grown by doubling; ``ids.txt`` has the vector dimension
+on its first line, then the SHA-256 of the text stored in each row, in row
+order. A restart maps the matrix back in and reads the id index, so only text
+that was never embedded by that model (a new or edited CV, task or document
+chunk) goes to the encoder.
+
+Several worker processes can share a cache directory: appends hold an
+exclusive lock on ``lock`` and first read the ids other processes appended,
+so each new row goes after the last one on disk. Rows are written
+vectors-first, then their ids, so a crash between the two leaves
+unreferenced rows that are simply overwritten later.
+"""
+
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from agent_core.embedding_worker import get_embedding_worker
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(os.getcwd(), ".cache", "embeddings"))
+
+_INITIAL_ROWS = 1024
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Append-only float16 memmap of embeddings for a single model."""
+
+    def __init__(self, model: str, root: str = EMBEDDING_CACHE_DIR):
+        self.model = model
+        self.root = os.path.join(root, hashlib.sha256(model.encode("utf-8")).hexdigest()[:16])
+        self._vectors_path = os.path.join(self.root, "vectors.f16")
+        self._ids_path = os.path.join(self.root, "ids.txt")
+        self._lock_path = os.path.join(self.root, "lock")
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._count = 0  # id lines read so far, i.e. rows known to be filled
+        self._ids_offset = 0
+        self._matrix: Optional[np.memmap] = None
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.root, exist_ok=True)
+        model_path = os.path.join(self.root, "model.txt")
+        if not os.path.exists(model_path):
+            with open(model_path, "w", encoding="utf-8") as f:
+                f.write(self.model)
+        with self._lock:
+            self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self) -> None:
+        """Pick up ids appended since the last read (by this or another process)."""
+        try:
+            with open(self._ids_path, "rb") as f:
+                f.seek(self._ids_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        complete = data.rfind(b"\n") + 1  # ignore a line still being written
+        if not complete:
+            return
+        self._ids_offset += complete
+        lines = data[:complete].decode("utf-8").splitlines()
+        if self.dim is None:
+            self.dim = int(lines.pop(0))
+        for digest in lines:
+            self._rows.setdefault(digest, self._count)
+            self._count += 1
+        self._map()
+
+    def _map(self) -> None:
+        if self.dim is None or not os.path.exists(self._vectors_path):
+            return
+        capacity = os.path.getsize(self._vectors_path) // (2 * self.dim)
+        if self._matrix is None or self._matrix.shape[0] != capacity:
+            if self._matrix is not None:
+                self._matrix.flush()
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+
+    def _ensure_capacity(self, rows: int, dim: int) -> None:
+        if self.dim is None:
+            # Nothing on disk yet (the caller holds the file lock and has refreshed)
+            self.dim = dim
+            header = f"{dim}\n".encode("utf-8")
+            with open(self._ids_path, "wb") as f:
+                f.write(header)
+            self._ids_offset = len(header)
+        elif dim != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim vectors for {self.model}, got {dim}")
+        size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+        capacity = size // (2 * dim)
+        if rows > capacity:
+            new_capacity = max(capacity, _INITIAL_ROWS)
+            while new_capacity < rows:
+                new_capacity *= 2
+            if self._matrix is not None:
+                self._matrix.flush()
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(new_capacity * dim * 2)
+        self._map()
+
+    def put(self, digests: List[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float16)
+        with self._lock, self._file_lock():
+            self._refresh()
+            fresh, seen = [], set()
+            for i, digest in enumerate(digests):
+                if digest not in self._rows and digest not in seen:
+                    seen.add(digest)
+                    fresh.append(i)
+            if not fresh:
+                return
+            start = self._count
+            self._ensure_capacity(start + len(fresh), vectors.shape[1])
+            self._matrix[start:start + len(fresh)] = vectors[fresh]
+            self._matrix.flush()
+            data = "".join(f"{digests[i]}\n" for i in fresh).encode("utf-8")
+            with open(self._ids_path, "ab") as f:
+                f.write(data)
+            self._ids_offset += len(data)
+            for offset, i in enumerate(fresh):
+                self._rows[digests[i]] = start + offset
+            self._count += len(fresh)
+
+    def embed(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """float16 (n, dim) vectors for texts, calling encode only for unseen text."""
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float16)
+        digests = [text_digest(t) for t in texts]
+        with self._lock:
+            rows = np.array([self._rows.get(d, -1) for d in digests], dtype=np.int64)
+            if (rows < 0).any():
+                # Another worker process may have embedded them since
+                self._refresh()
+                rows = np.array([self._rows.get(d, -1) for d in digests], dtype=np.int64)
+            hit = rows >= 0
+            cached = np.asarray(self._matrix[rows[hit]]) if hit.any() else None
+
+        misses = np.flatnonzero(~hit)
+        missing: Dict[str, str] = {}
+        for i in misses:
+            missing.setdefault(digests[i], texts[i])
+        if missing:
+            computed = np.asarray(encode(list(missing.values())), dtype=np.float16)
+            self.put(list(missing), computed)
+
+        dim = cached.shape[1] if cached is not None else computed.shape[1]
+        vectors = np.empty((len(texts), dim), dtype=np.float16)
+        if cached is not None:
+            vectors[hit] = cached
+        if missing:
+            position = {digest: k for k, digest in enumerate(missing)}
+            vectors[misses] = computed[[position[digests[i]] for i in misses]]
+        with self._lock:
+            self.hits += int(hit.sum())
+            self.misses += len(missing)
+        return vectors
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model": self.model,
+                "entries": len(self._rows),
+                "dim": self.dim,
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes": 0 if self._matrix is None else int(self._matrix.nbytes),
+            }
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model: Optional[str] = None) -> EmbeddingCache:
+    """Process-wide cache for the given model key (default: the embedding worker's)."""
+    if model is None:
+        worker = get_embedding_worker()
+        model = f"{worker.model_name}|{worker.backend}"
+    with _caches_lock:
+        cache = _caches.get(model)
+        if cache is None:
+            cache = _caches[model] = EmbeddingCache(model)
+        return cache
+
+
+def cached_embed(texts: List[str]) -> np.ndarray:
+    """Embed through the shared worker, reusing cached vectors for unchanged text."""
+    return get_embedding_cache().embed(texts, get_embedding_worker().embed)
+
+
+def embedding_cache_stats() -> list:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [cache.stats() for cache in caches]
@@ -0,0 +1,205 @@
+"""Dynamic-batching embedding worker.
+
+Concurrent ``embed`` calls are queued and coalesced into micro-batches by a
+single background thread: a batch is flushed once it reaches
+``max_batch_size`` texts or ``max_wait_ms`` after its first request arrived.
+The model runs either as the regular sentence-transformers (PyTorch) backend
+or as an int8-quantised ONNX graph on CPU. Vectors are returned as float16.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Optional
+
+import numpy as np
+
+from agent_core.telemetry import span
+
+DEFAULT_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+DEFAULT_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # "torch" or "onnx-int8"
+DEFAULT_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+
+def load_encoder(model_name: str, backend: str):
+    """Load a sentence-transformers encoder for the requested backend."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "onnx-int8":
+        return SentenceTransformer(
+            model_name,
+            device="cpu",
+            backend="onnx",
+            model_kwargs={"file_name": DEFAULT_ONNX_FILE},
+        )
+    if backend == "torch":
+        return SentenceTransformer(model_name, device="cpu")
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+class _Request:
+    __slots__ = ("texts", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingWorker:
+    """Background thread that embeds queued texts in micro-batches."""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL,
+        backend: str = DEFAULT_BACKEND,
+        max_batch_size: int = int(os.getenv("EMBEDDING_MAX_BATCH", "64")),
+        max_wait_ms: float = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "10")),
+        normalize: bool = True,
+        encoder=None,
+    ):
+        self.model_name = model_name
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.normalize = normalize
+
+        self._encoder = encoder
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._carry: Optional[_Request] = None
+        self._stats_lock = threading.Lock()
+        self._texts_done = 0
+        self._batches_done = 0
+        self._busy_seconds = 0.0
+        self._recent: deque = deque(maxlen=256)  # (finished_at, n_texts)
+        self._thread = threading.Thread(target=self._run, name="embedding-worker", daemon=True)
+        self._thread.start()
+
+    @property
+    def dimension(self) -> int:
+        return self._get_encoder().get_sentence_embedding_dimension()
+
+    def _get_encoder(self):
+        if self._encoder is None:
+            self._encoder = load_encoder(self.model_name, self.backend)
+        return self._encoder
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for embedding; the future resolves to a float16 (n, dim) array."""
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.zeros((0, 0), dtype=np.float16))
+            return request.future
+        self._queue.put(request)
+        return request.future
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        return self.submit(texts).result(timeout=timeout)
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _collect_batch(self) -> Optional[List[_Request]]:
+        first = self._carry or self._queue.get()
+        self._carry = None
+        if first is None:
+            return None
+
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            if size + len(request.texts) > self.max_batch_size:
+                # Keep requests whole; this one opens the next batch
+                self._carry = request
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                return
+
+            texts = [text for request in batch for text in request.texts]
+            started = time.perf_counter()
+            try:
+                with span("embedding.batch", texts=len(texts), requests=len(batch), backend=self.backend):
+                    vectors = self._get_encoder().encode(
+                        texts,
+                        batch_size=self.max_batch_size,
+                        normalize_embeddings=self.normalize,
+                        convert_to_numpy=True,
+                    )
+                    vectors = np.asarray(vectors, dtype=np.float16)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            finished = time.perf_counter()
+
+            offset = 0
+            for request in batch:
+                n = len(request.texts)
+                request.future.set_result(vectors[offset:offset + n])
+                offset += n
+
+            with self._stats_lock:
+                self._texts_done += len(texts)
+                self._batches_done += 1
+                self._busy_seconds += finished - started
+                self._recent.append((finished, len(texts)))
+
+    def stats(self) -> dict:
+        now = time.perf_counter()
+        with self._stats_lock:
+            window = [(t, n) for t, n in self._recent if now - t <= 60]
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "queue_depth": self._queue.qsize() + (1 if self._carry is not None else 0),
+                "texts_embedded": self._texts_done,
+                "batches": self._batches_done,
+                "avg_batch_size": self._texts_done / self._batches_done if self._batches_done else 0.0,
+                "throughput_texts_per_s": self._texts_done / self._busy_seconds if self._busy_seconds else 0.0,
+                "recent_texts_per_s": sum(n for _, n in window) / 60,
+            }
+
+
+_worker: Optional[EmbeddingWorker] = None
+_worker_lock = threading.Lock()
+
+
+def get_embedding_worker() -> EmbeddingWorker:
+    """Return the process-wide worker, starting it on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = EmbeddingWorker()
+        return _worker
+
+
+def embedding_worker_stats() -> dict:
+    if _worker is None:
+        return {"running": False}
+    return {"running": True, **_worker.stats()}
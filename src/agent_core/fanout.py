@@ -0,0 +1,147 @@
+"""Fan-out of independent LLM calls over users, tasks, or users x tasks.
+
+CV parsing, skill extraction and per-user explanations are one call per item
+with no dependency between items, so they run as a single bounded-concurrency
+batch: wall time is roughly one call's latency per ``max_concurrency`` items
+instead of the sum. Results are keyed and ordered like the input; a failed
+item is reported in ``errors`` without affecting the others.
+
+    users = state["team"]
+    profiles = fan_out(model, users, lambda u: f"Extract skills from this CV:\\n{u['cv']}")
+    for name, message in profiles.results.items():
+        ...
+"""
+
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+
+class FanOutResult(NamedTuple):
+    results: Dict[Hashable, Any]
+    errors: Dict[Hashable, Exception]
+
+
+def item_key(item: Any) -> Hashable:
+    """Identify a user or task: its ``id``/``name``/``user`` field, or the item itself."""
+    for field in ("id", "name", "user"):
+        value = item.get(field) if isinstance(item, dict) else getattr(item, field, None)
+        if value is not None:
+            return value
+    return item
+
+
+def _config(max_concurrency: Optional[int], config: Optional[RunnableConfig]) -> RunnableConfig:
+    config = dict(config or {})
+    if max_concurrency is not None:
+        config["max_concurrency"] = max_concurrency
+    return config
+
+
+def _collect(keys: List[Hashable], outputs: List[Any]) -> FanOutResult:
+    results: Dict[Hashable, Any] = {}
+    errors: Dict[Hashable, Exception] = {}
+    for key, output in zip(keys, outputs):
+        if isinstance(output, Exception):
+            errors[key] = output
+        else:
+            results[key] = output
+    return FanOutResult(results, errors)
+
+
+def _prepare(
+    items: Iterable[Any], build_input: Callable[[Any], Any], key: Callable[[Any], Hashable]
+) -> Tuple[List[Hashable], List[Any]]:
+    keys: List[Hashable] = []
+    inputs: List[Any] = []
+    seen = set()
+    for item in items:
+        k = key(item)
+        if k in seen:
+            raise ValueError(f"Duplicate fan-out key: {k!r}")
+        seen.add(k)
+        keys.append(k)
+        inputs.append(build_input(item))
+    return keys, inputs
+
+
+def fan_out(
+    runnable: Runnable,
+    items: Iterable[Any],
+    build_input: Callable[[Any], Any],
+    *,
+    key: Callable[[Any], Hashable] = item_key,
+    max_concurrency: Optional[int] = None,
+    config: Optional[RunnableConfig] = None,
+) -> FanOutResult:
+    """Invoke ``runnable`` once per item, concurrently, keyed by ``key(item)``."""
+    keys, inputs = _prepare(items, build_input, key)
+    if not inputs:
+        return FanOutResult({}, {})
+    outputs = runnable.batch(inputs, _config(max_concurrency, config), return_exceptions=True)
+    return _collect(keys, outputs)
+
+
+async def afan_out(
+    runnable: Runnable,
+    items: Iterable[Any],
+    build_input: Callable[[Any], Any],
+    *,
+    key: Callable[[Any], Hashable] = item_key,
+    max_concurrency: Optional[int] = None,
+    config: Optional[RunnableConfig] = None,
+) -> FanOutResult:
+    """Async ``fan_out``."""
+    keys, inputs = _prepare(items, build_input, key)
+    if not inputs:
+        return FanOutResult({}, {})
+    outputs = await runnable.abatch(inputs, _config(max_concurrency, config), return_exceptions=True)
+    return _collect(keys, outputs)
+
+
+def _pairs(users: Sequence[Any], tasks: Sequence[Any]) -> List[Tuple[Any, Any]]:
+    return [(user, task) for user in users for task in tasks]
+
+
+def fan_out_pairs(
+    runnable: Runnable,
+    users: Sequence[Any],
+    tasks: Sequence[Any],
+    build_input: Callable[[Any, Any], Any],
+    *,
+    user_key: Callable[[Any], Hashable] = item_key,
+    task_key: Callable[[Any], Hashable] = item_key,
+    max_concurrency: Optional[int] = None,
+    config: Optional[RunnableConfig] = None,
+) -> FanOutResult:
+    """One call per (user, task) pair, keyed by ``(user_key(user), task_key(task))``."""
+    return fan_out(
+        runnable,
+        _pairs(users, tasks),
+        lambda pair: build_input(*pair),
+        key=lambda pair: (user_key(pair[0]), task_key(pair[1])),
+        max_concurrency=max_concurrency,
+        config=config,
+    )
+
+
+async def afan_out_pairs(
+    runnable: Runnable,
+    users: Sequence[Any],
+    tasks: Sequence[Any],
+    build_input: Callable[[Any, Any], Any],
+    *,
+    user_key: Callable[[Any], Hashable] = item_key,
+    task_key: Callable[[Any], Hashable] = item_key,
+    max_concurrency: Optional[int] = None,
+    config: Optional[RunnableConfig] = None,
+) -> FanOutResult:
+    """Async ``fan_out_pairs``."""
+    return await afan_out(
+        runnable,
+        _pairs(users, tasks),
+        lambda pair: build_input(*pair),
+        key=lambda pair: (user_key(pair[0]), task_key(pair[1])),
+        max_concurrency=max_concurrency,
+        config=config,
+    )
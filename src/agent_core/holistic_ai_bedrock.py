@@ -5,20 +5,41 @@ This is a self-contained wrapper that can be used in tutorials without importing
 
 import os
 import json
+import logging
 import requests
-from typing import List, Optional, Any, Iterator, Type
+from typing import List, Optional, Any, AsyncIterator, Iterator, Type, Tuple, Union
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage
-from langchain_core.callbacks import CallbackManagerForLLMRun
-from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.messages import BaseMessage, AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableConfig
 from pydantic import Field, SecretStr, BaseModel as PydanticBaseModel
+from agent_core.context_compaction import DEFAULT_BUDGET_TOKENS, ContextCompactor
+from agent_core.payload import PayloadBuilder, dumps
+from agent_core.resilience import Resilience, get_resilience
+from agent_core.response_cache import ResponseCache, get_default_response_cache
+from agent_core.structured_output import model_schema, parse_structured, repair_args, validation_feedback
+from agent_core.streaming import StreamAccumulator, is_event_stream, iter_stream_events, parse_stream_line
+from agent_core.telemetry import Span, metrics, span, start_span
+from agent_core.transport import DEFAULT_POOL_SIZE, get_async_client, get_sync_session
+
+DEFAULT_API_ENDPOINT = os.getenv(
+    "HOLISTIC_AI_API_ENDPOINT",
+    "https://ctwa92wg1b.execute-api.us-east-1.amazonaws.com/prod/invoke",
+)
+
+logger = logging.getLogger(__name__)
+
+llm_requests = metrics.counter("llm_requests_total", "Requests sent to the proxy (cache misses)", ("model",))
+llm_tokens = metrics.counter("llm_tokens_total", "Tokens reported by the proxy", ("model", "direction"))
+llm_bytes = metrics.counter("llm_bytes_total", "Request/response body bytes", ("direction",))
 
 
 class HolisticAIBedrockChat(BaseChatModel):
     """Chat model for Holistic AI Bedrock Proxy API (for tutorials)."""
     
     api_endpoint: str = Field(
-        default="https://ctwa92wg1b.execute-api.us-east-1.amazonaws.com/prod/invoke",
+        default=DEFAULT_API_ENDPOINT,
         description="API endpoint URL"
     )
     
@@ -33,6 +54,52 @@ class HolisticAIBedrockChat(BaseChatModel):
     max_tokens: int = Field(default=1024, description="Maximum tokens to generate")
     temperature: float = Field(default=0.7, description="Temperature for generation")
     timeout: int = Field(default=60, description="Request timeout in seconds")
+    pool_size: int = Field(default=DEFAULT_POOL_SIZE, description="Max pooled keep-alive connections to the proxy")
+    http2: bool = Field(default=True, description="Use HTTP/2 on the async transport when h2 is installed")
+    response_cache: Optional[ResponseCache] = Field(
+        default=None,
+        exclude=True,
+        description="Opt-in cache of proxy responses keyed by the request payload"
+    )
+    cache_sampled: bool = Field(
+        default=os.getenv("HOLISTIC_AI_CACHE_SAMPLED", "0") == "1",
+        description="Also serve requests with temperature > 0 from the response cache, "
+                    "replaying one sample instead of drawing a new one"
+    )
+    prompt_caching: bool = Field(
+        default=os.getenv("HOLISTIC_AI_PROMPT_CACHING", "0") == "1",
+        description="Mark the static system prompt and tool prefix with cache_control breakpoints "
+                    "(opt-in: the proxy must accept content-block system messages and cache_control)"
+    )
+    context_budget_tokens: Optional[int] = Field(
+        default=DEFAULT_BUDGET_TOKENS,
+        description="Compact old tool results above this estimated token count (None disables)"
+    )
+    max_retries: int = Field(
+        default=int(os.getenv("HOLISTIC_AI_MAX_RETRIES", "3")),
+        description="Retries on 408/429/5xx and connection errors, with exponential backoff and jitter"
+    )
+    retry_base_delay: float = Field(default=0.5, description="First backoff ceiling in seconds")
+    retry_max_delay: float = Field(default=8.0, description="Backoff ceiling in seconds")
+    hedge_requests: bool = Field(
+        default=os.getenv("HOLISTIC_AI_HEDGE", "0") == "1",
+        description="Start a second request when the first is slower than the observed p95"
+    )
+    rate_limit_per_second: Optional[float] = Field(
+        default=float(os.getenv("HOLISTIC_AI_RATE_LIMIT", "0")) or None,
+        description="Client-side request rate shared by all models on this endpoint (None disables)"
+    )
+    rate_limit_burst: Optional[float] = Field(default=None, description="Token bucket capacity")
+    circuit_failure_threshold: int = Field(
+        default=5, description="Consecutive failures before the circuit breaker opens"
+    )
+    circuit_reset_timeout: float = Field(
+        default=30.0, description="Seconds the circuit stays open before a probe request"
+    )
+    max_concurrency: int = Field(
+        default=int(os.getenv("HOLISTIC_AI_MAX_CONCURRENCY", "8")),
+        description="Default in-flight requests for batch/abatch when the config does not set one"
+    )
     
     class Config:
         arbitrary_types_allowed = True
@@ -91,18 +158,51 @@ class HolisticAIBedrockChat(BaseChatModel):
                 return msg.content
         return None
     
+    def _batch_configs(
+        self, config: Optional[Union[RunnableConfig, List[RunnableConfig]]], size: int
+    ) -> List[RunnableConfig]:
+        configs = config if isinstance(config, list) else [config or {}] * size
+        return [{"max_concurrency": self.max_concurrency, **c} for c in configs]
+    
+    def batch(
+        self,
+        inputs: List[Any],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> List[Any]:
+        """Run independent calls on the pooled session, at most ``max_concurrency`` at once.
+        
+        Results keep the input order; with ``return_exceptions=True`` a failed
+        item yields its exception instead of aborting the whole batch.
+        """
+        if not inputs:
+            return []
+        return super().batch(
+            inputs, self._batch_configs(config, len(inputs)), return_exceptions=return_exceptions, **kwargs
+        )
+    
+    async def abatch(
+        self,
+        inputs: List[Any],
+        config: Optional[Union[RunnableConfig, List[RunnableConfig]]] = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> List[Any]:
+        """Async ``batch`` on the shared httpx client (multiplexed over HTTP/2 when available)."""
+        if not inputs:
+            return []
+        return await super().abatch(
+            inputs, self._batch_configs(config, len(inputs)), return_exceptions=return_exceptions, **kwargs
+        )
+    
     def bind_tools(self, tools: List[Any], **kwargs: Any) -> "HolisticAIBedrockChat":
         """Bind tools to the model for tool calling."""
-        bound_model = self.__class__(
-            api_endpoint=self.api_endpoint,
-            team_id=self.team_id,
-            api_token=self.api_token,
-            model=self.model,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            timeout=self.timeout,
-        )
+        bound_model = self.model_copy()
         bound_model._bound_tools = tools
+        bound_model._payload_builder = PayloadBuilder(tools, self.prompt_caching)
         return bound_model
     
     def with_structured_output(
@@ -112,7 +212,8 @@ class HolisticAIBedrockChat(BaseChatModel):
     ) -> "HolisticAIBedrockStructuredOutput":
         """Create a model that returns structured output matching the schema.
         
-        Uses Holistic AI Bedrock API's response_format feature for native structured output.
+        By default the answer comes back in one call as a forced, schema-typed tool
+        call; pass ``method="json_schema"`` for the API's response_format instead.
         """
         return HolisticAIBedrockStructuredOutput(
             base_model=self,
@@ -120,21 +221,22 @@ class HolisticAIBedrockChat(BaseChatModel):
             **kwargs
         )
     
-    def _generate(
-        self,
-        messages: List[BaseMessage],
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> ChatResult:
-        """Generate chat response."""
-        tools = kwargs.get("tools") or getattr(self, "_bound_tools", None)
-        
+    def _build_payload(self, messages: List[BaseMessage], **kwargs: Any) -> Tuple[dict, Optional[dict]]:
+        """Build the proxy request payload; returns it with the response_format in effect."""
         system_prompt = self._extract_system_prompt(messages)
         api_messages = self._convert_messages_to_api_format(messages)
         
+        if self.context_budget_tokens:
+            api_messages, stats = ContextCompactor(self.context_budget_tokens).compact(api_messages)
+            if stats["deduplicated"] or stats["elided"]:
+                logger.info(
+                    "Compacted context: ~%d -> ~%d tokens (%d deduplicated, %d elided)",
+                    stats["tokens_before"], stats["tokens_after"], stats["deduplicated"], stats["elided"],
+                )
+        
+        builder = self._get_payload_builder(kwargs.get("tools"))
         if system_prompt:
-            api_messages.insert(0, {"role": "user", "content": f"System: {system_prompt}"})
+            api_messages.insert(0, builder.system_message(system_prompt))
         
         payload = {
             "team_id": self.team_id,
@@ -154,122 +256,241 @@ class HolisticAIBedrockChat(BaseChatModel):
             # When using response_format, we should NOT include tools in the same request
             # The API may not support both simultaneously
             # Tools should be handled separately before structured output
-            tools = None  # Disable tools when using response_format
+        elif builder.tool_definitions:
+            payload["tools"] = builder.tool_definitions
+            payload["tool_choice"] = kwargs.get("tool_choice") or {"type": "auto"}
         
+        return payload, response_format
+    
+    def _get_payload_builder(self, tools: Optional[List[Any]] = None) -> PayloadBuilder:
+        """The precompiled prefix for the bound tools (per-call tools get a fresh one)."""
         if tools:
-            # Check if tools is actually a list of tool objects
-            # (with_structured_output might pass schema objects or other non-tool objects)
-            tools_list = []
-            for tool in tools:
-                # Only process if it's a tool object with 'name' and 'description' attributes
-                # Skip Pydantic schemas and other non-tool objects
-                if (hasattr(tool, 'name') and 
-                    hasattr(tool, 'description') and 
-                    callable(getattr(tool, 'name', None)) == False):  # name should not be callable
-                    try:
-                        tool_dict = {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "input_schema": tool.args_schema.model_json_schema() if hasattr(tool, "args_schema") else {}
-                        }
-                        tools_list.append(tool_dict)
-                    except Exception:
-                        # Skip if we can't process this tool
-                        continue
-            
-            if tools_list:
-                payload["tools"] = tools_list
-                payload["tool_choice"] = {"type": "auto"}
-        
-        headers = {
+            return PayloadBuilder(tools, self.prompt_caching)
+        builder = getattr(self, "_payload_builder", None)
+        if builder is None or builder.prompt_caching != self.prompt_caching:
+            builder = PayloadBuilder(getattr(self, "_bound_tools", None), self.prompt_caching)
+            self._payload_builder = builder
+        return builder
+    
+    def _encode_payload(self, payload: dict) -> bytes:
+        """Serialise the request body once, logging what each call sends."""
+        body = dumps(payload)
+        logger.info(
+            "Proxy request: model=%s messages=%d bytes=%d est_tokens=%d",
+            self.model, len(payload["messages"]), len(body), len(body) // 4,
+        )
+        return body
+    
+    def _headers(self) -> dict:
+        return {
             "Content-Type": "application/json",
             "X-Team-ID": self.team_id,
             "X-API-Token": self.api_token.get_secret_value(),
         }
+    
+    def _parse_result(self, result: dict, response_format: Optional[dict]) -> ChatResult:
+        """Turn a proxy JSON response into a ChatResult."""
+        content = ""
+        tool_calls = []
         
-        try:
-            response = requests.post(
-                self.api_endpoint,
-                headers=headers,
-                json=payload,
-                timeout=self.timeout,
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            content = ""
-            tool_calls = []
-            
-            # Handle structured output response format
-            # According to API docs, structured JSON is in result["content"][0]["text"]
-            if response_format and "content" in result and len(result["content"]) > 0:
-                # For structured output, content is a JSON string in result["content"][0]["text"]
-                first_block = result["content"][0]
-                if isinstance(first_block, dict):
-                    if first_block.get("type") == "text":
-                        content = first_block.get("text", "")
-                    else:
-                        # Fallback: try to get text from any field
-                        content = first_block.get("text", str(first_block))
+        # Handle structured output response format
+        # According to API docs, structured JSON is in result["content"][0]["text"]
+        if response_format and "content" in result and len(result["content"]) > 0:
+            # For structured output, content is a JSON string in result["content"][0]["text"]
+            first_block = result["content"][0]
+            if isinstance(first_block, dict):
+                if first_block.get("type") == "text":
+                    content = first_block.get("text", "")
                 else:
-                    content = str(first_block)
-            elif "content" in result and len(result["content"]) > 0:
-                # Regular response format
-                for content_block in result["content"]:
-                    if isinstance(content_block, dict):
-                        if content_block.get("type") == "text":
-                            text = content_block.get("text", "")
-                            if text:
-                                content += text + "\n" if content else text
-                        elif content_block.get("type") == "tool_use":
-                            tool_calls.append({
-                                "name": content_block.get("name", ""),
-                                "args": content_block.get("input", {}),
-                                "id": content_block.get("id", "")
-                            })
-                    elif isinstance(content_block, str):
-                        content += content_block
-                
-                content = content.rstrip("\n")
-            elif "text" in result:
-                content = result["text"]
-            else:
-                content = str(result)
-            
-            # Create AIMessage - use dict format for tool_calls
-            # Reference: langchain-aws ChatBedrockConverse uses dict format
-            # LangChain automatically handles dict format for tool_calls
-            # If response_format was used, content is JSON string that needs parsing
-            if response_format and content:
-                # Content is JSON string from structured output
-                # Store raw JSON in message content
-                message = AIMessage(content=content)
-            elif tool_calls:
-                # When there are tool calls, use dict format directly
-                # LangChain's AIMessage constructor accepts dict format
-                message = AIMessage(content="", tool_calls=tool_calls)
+                    # Fallback: try to get text from any field
+                    content = first_block.get("text", str(first_block))
             else:
-                message = AIMessage(content=content)
-            
-            generation = ChatGeneration(message=message)
-            return ChatResult(generations=[generation])
+                content = str(first_block)
+        elif "content" in result and len(result["content"]) > 0:
+            # Regular response format
+            for content_block in result["content"]:
+                if isinstance(content_block, dict):
+                    if content_block.get("type") == "text":
+                        text = content_block.get("text", "")
+                        if text:
+                            content += text + "\n" if content else text
+                    elif content_block.get("type") == "tool_use":
+                        name = content_block.get("name", "")
+                        args = content_block.get("input", {})
+                        schema = self._get_payload_builder().input_schemas.get(name)
+                        tool_calls.append({
+                            "name": name,
+                            # Fix JSON-string nesting etc. locally rather than re-asking
+                            "args": repair_args(args, schema) if schema else args,
+                            "id": content_block.get("id", "")
+                        })
+                elif isinstance(content_block, str):
+                    content += content_block
             
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Error calling Holistic AI Bedrock API: {e}"
-            if hasattr(e, 'response') and e.response:
+            content = content.rstrip("\n")
+        elif "text" in result:
+            content = result["text"]
+        else:
+            content = str(result)
+        
+        # Create AIMessage - use dict format for tool_calls
+        # Reference: langchain-aws ChatBedrockConverse uses dict format
+        # LangChain automatically handles dict format for tool_calls
+        # If response_format was used, content is JSON string that needs parsing
+        if response_format and content:
+            # Content is JSON string from structured output
+            # Store raw JSON in message content
+            message = AIMessage(content=content)
+        elif tool_calls:
+            # When there are tool calls, use dict format directly
+            # LangChain's AIMessage constructor accepts dict format
+            message = AIMessage(content="", tool_calls=tool_calls)
+        else:
+            message = AIMessage(content=content)
+        
+        generation = ChatGeneration(message=message)
+        return ChatResult(generations=[generation])
+    
+    def _cache_lookup(self, payload: dict) -> Tuple[Optional[str], Optional[dict]]:
+        """Return (cache key, cached response); both None when caching is off.
+
+        Sampled requests (temperature > 0) bypass the cache unless
+        ``cache_sampled`` is set: a cached answer would make every call
+        return the same sample.
+        """
+        if self.response_cache is None:
+            return None, None
+        if (payload.get("temperature") or 0) > 0 and not self.cache_sampled:
+            return None, None
+        cache_key = self.response_cache.make_key(payload)
+        return cache_key, self.response_cache.get(cache_key)
+    
+    def _cache_store(self, cache_key: Optional[str], result: dict) -> None:
+        if cache_key is not None:
+            self.response_cache.set(cache_key, result)
+    
+    def _resilience(self) -> Resilience:
+        return get_resilience(
+            self.api_endpoint,
+            max_retries=self.max_retries,
+            base_delay=self.retry_base_delay,
+            max_delay=self.retry_max_delay,
+            hedge=self.hedge_requests,
+            rate_limit=self.rate_limit_per_second,
+            rate_burst=self.rate_limit_burst,
+            failure_threshold=self.circuit_failure_threshold,
+            reset_timeout=self.circuit_reset_timeout,
+        )
+    
+    @staticmethod
+    def _is_transport_error(e: BaseException) -> bool:
+        if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        try:
+            import httpx
+        except ImportError:
+            return False
+        return isinstance(e, httpx.TransportError)
+    
+    @staticmethod
+    def _request_error(e: Exception, response: Any = None) -> ValueError:
+        """Build the ValueError raised for transport and HTTP errors."""
+        error_msg = f"Error calling Holistic AI Bedrock API: {e}"
+        if response is None:
+            response = getattr(e, "response", None)
+        if response is not None:
+            try:
+                error_detail = response.text
+                error_msg += f"\nResponse: {error_detail}"
+                # Try to parse JSON error if available
                 try:
-                    error_detail = e.response.text
-                    error_msg += f"\nResponse: {error_detail}"
-                    # Try to parse JSON error if available
-                    try:
-                        error_json = e.response.json()
-                        error_msg += f"\nError details: {json.dumps(error_json, indent=2)}"
-                    except:
-                        pass
-                except:
+                    error_json = response.json()
+                    error_msg += f"\nError details: {json.dumps(error_json, indent=2)}"
+                except Exception:
                     pass
-            raise ValueError(error_msg)
+            except Exception:
+                pass
+        return ValueError(error_msg)
+    
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Generate chat response."""
+        with span("llm.generate", model=self.model) as call_span:
+            payload, response_format = self._build_payload(messages, **kwargs)
+        
+            body, response_bytes = None, 0
+            cache_key, result = self._cache_lookup(payload)
+            if result is None:
+                session = get_sync_session(self.pool_size)
+                body = self._encode_payload(payload)
+                try:
+                    response = self._resilience().call(
+                        lambda: session.post(
+                            self.api_endpoint,
+                            headers=self._headers(),
+                            data=body,
+                            timeout=self.timeout,
+                        ),
+                        self._is_transport_error,
+                    )
+                    response.raise_for_status()
+                    result = response.json()
+                    response_bytes = len(response.content)
+                except requests.exceptions.RequestException as e:
+                    raise self._request_error(e)
+                self._cache_store(cache_key, result)
+        
+            self._trace_call(call_span, body, response_bytes, result)
+        
+        return self._parse_result(result, response_format)
+    
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Generate chat response on the shared async connection pool."""
+        client = get_async_client(self.pool_size, self.http2)
+        if client is None:
+            # httpx not installed: run the pooled sync path in a worker thread
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        
+        import httpx
+        
+        with span("llm.generate", model=self.model) as call_span:
+            payload, response_format = self._build_payload(messages, **kwargs)
+        
+            body, response_bytes = None, 0
+            cache_key, result = self._cache_lookup(payload)
+            if result is None:
+                body = self._encode_payload(payload)
+                try:
+                    response = await self._resilience().acall(
+                        lambda: client.post(
+                            self.api_endpoint,
+                            headers=self._headers(),
+                            content=body,
+                            timeout=self.timeout,
+                        ),
+                        self._is_transport_error,
+                    )
+                    response.raise_for_status()
+                    result = response.json()
+                    response_bytes = len(response.content)
+                except httpx.HTTPError as e:
+                    raise self._request_error(e)
+                self._cache_store(cache_key, result)
+        
+            self._trace_call(call_span, body, response_bytes, result)
+        
+        return self._parse_result(result, response_format)
     
     def _stream(
         self,
@@ -277,57 +498,242 @@ class HolisticAIBedrockChat(BaseChatModel):
         stop: Optional[List[str]] = None,
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
-    ) -> Iterator[ChatGeneration]:
-        """Stream chat response."""
-        result = self._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
-        yield result.generations[0]
+    ) -> Iterator[ChatGenerationChunk]:
+        """Stream chat response token by token."""
+        call_span = start_span("llm.stream", model=self.model)
+        try:
+            yield from self._stream_chunks(call_span, messages, run_manager, **kwargs)
+        except Exception as e:
+            call_span.end(e)
+            raise
+        finally:
+            call_span.end()
+    
+    def _stream_chunks(
+        self,
+        call_span: Span,
+        messages: List[BaseMessage],
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        payload, response_format = self._build_payload(messages, **kwargs)
+        
+        cache_key, result = self._cache_lookup(payload)
+        if result is not None:
+            self._trace_call(call_span, None, 0, result)
+            yield self._result_to_chunk(self._parse_result(result, response_format))
+            return
+        
+        payload["stream"] = True
+        session = get_sync_session(self.pool_size)
+        body = self._encode_payload(payload)
+        try:
+            # Retries only cover opening the stream; nothing has been yielded yet
+            response = self._resilience().call(
+                lambda: session.post(
+                    self.api_endpoint,
+                    headers=self._headers(),
+                    data=body,
+                    timeout=self.timeout,
+                    stream=True,
+                ),
+                self._is_transport_error,
+                hedge=False,
+            )
+            with response:
+                response.raise_for_status()
+                if not is_event_stream(response.headers.get("content-type", "")):
+                    # Proxy answered with a regular JSON body
+                    result = response.json()
+                    self._cache_store(cache_key, result)
+                    self._trace_call(call_span, body, len(response.content), result)
+                    yield self._result_to_chunk(self._parse_result(result, response_format))
+                    return
+                
+                accumulator = StreamAccumulator()
+                for event in iter_stream_events(response.iter_lines(decode_unicode=True)):
+                    chunk = accumulator.feed(event)
+                    if chunk is None:
+                        continue
+                    generation = ChatGenerationChunk(message=chunk)
+                    if run_manager and chunk.content:
+                        run_manager.on_llm_new_token(chunk.content, chunk=generation)
+                    yield generation
+        except requests.exceptions.RequestException as e:
+            raise self._request_error(e)
+        
+        result = accumulator.result()
+        self._trace_call(call_span, body, None, result)
+        self._cache_store(cache_key, result)
+    
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """Stream chat response token by token on the shared async connection pool."""
+        client = get_async_client(self.pool_size, self.http2)
+        if client is None:
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+        
+        call_span = start_span("llm.stream", model=self.model)
+        try:
+            async for chunk in self._astream_chunks(client, call_span, messages, run_manager, **kwargs):
+                yield chunk
+        except Exception as e:
+            call_span.end(e)
+            raise
+        finally:
+            call_span.end()
+    
+    async def _astream_chunks(
+        self,
+        client: Any,
+        call_span: Span,
+        messages: List[BaseMessage],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        import httpx
+        
+        payload, response_format = self._build_payload(messages, **kwargs)
+        
+        cache_key, result = self._cache_lookup(payload)
+        if result is not None:
+            self._trace_call(call_span, None, 0, result)
+            yield self._result_to_chunk(self._parse_result(result, response_format))
+            return
+        
+        payload["stream"] = True
+        body = self._encode_payload(payload)
+        request = client.build_request(
+            "POST",
+            self.api_endpoint,
+            headers=self._headers(),
+            content=body,
+            timeout=self.timeout,
+        )
+        try:
+            # Retries only cover opening the stream; nothing has been yielded yet
+            response = await self._resilience().acall(
+                lambda: client.send(request, stream=True),
+                self._is_transport_error,
+                hedge=False,
+            )
+            try:
+                if response.is_error:
+                    await response.aread()
+                response.raise_for_status()
+                if not is_event_stream(response.headers.get("content-type", "")):
+                    await response.aread()
+                    result = response.json()
+                    self._cache_store(cache_key, result)
+                    self._trace_call(call_span, body, len(response.content), result)
+                    yield self._result_to_chunk(self._parse_result(result, response_format))
+                    return
+                
+                accumulator = StreamAccumulator()
+                pending: List[str] = []
+                async for line in response.aiter_lines():
+                    event = parse_stream_line(line, pending)
+                    if event is None:
+                        continue
+                    chunk = accumulator.feed(event)
+                    if chunk is None:
+                        continue
+                    generation = ChatGenerationChunk(message=chunk)
+                    if run_manager and chunk.content:
+                        await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+                    yield generation
+            finally:
+                await response.aclose()
+        except httpx.HTTPError as e:
+            raise self._request_error(e)
+        
+        result = accumulator.result()
+        self._trace_call(call_span, body, None, result)
+        self._cache_store(cache_key, result)
+    
+    def _trace_call(self, call_span: Span, body: Optional[bytes], response_bytes: Optional[int], result: dict) -> None:
+        """Attach sizes and token usage to the call span and the LLM counters."""
+        usage = result.get("usage") or {}
+        input_tokens = usage.get("input_tokens") or 0
+        output_tokens = usage.get("output_tokens") or 0
+        call_span.set(
+            cache_hit=body is None,
+            request_bytes=len(body) if body else 0,
+            response_bytes=response_bytes,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            stop_reason=result.get("stop_reason"),
+        )
+        if body is not None:
+            llm_requests.inc(model=self.model)
+            llm_bytes.inc(len(body), direction="request")
+            llm_bytes.inc(response_bytes or 0, direction="response")
+            llm_tokens.inc(input_tokens, model=self.model, direction="input")
+            llm_tokens.inc(output_tokens, model=self.model, direction="output")
+    
+    @staticmethod
+    def _result_to_chunk(result: ChatResult) -> ChatGenerationChunk:
+        """Wrap a complete (cached or non-streamed) response as a single chunk."""
+        message = result.generations[0].message
+        tool_call_chunks = [
+            {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": i}
+            for i, tc in enumerate(message.tool_calls)
+        ]
+        return ChatGenerationChunk(
+            message=AIMessageChunk(content=message.content, tool_call_chunks=tool_call_chunks)
+        )
 
 
 class HolisticAIBedrockStructuredOutput:
-    """Wrapper for structured output using Holistic AI Bedrock API's response_format."""
+    """Wrapper for structured output from the Holistic AI Bedrock API.
+    
+    ``method="tool"`` (default) answers in a single call: the schema is sent as a
+    forced tool, and the tool-call arguments are repaired and validated locally,
+    re-asking with the validation errors at most ``max_reasks`` times. A
+    conversation that already ends on a final text answer is parsed locally
+    when that text is the JSON answer; otherwise the answer is regenerated as
+    the forced tool call instead of being reformatted by a second one.
+    ``method="json_schema"`` reformats the final AI text through the API's
+    ``response_format`` (one extra call).
+
+    Agents get the same single pass from ``create_agent(response_format=...)``,
+    which offers the schema as a tool alongside the others.
+    """
     
     def __init__(
         self,
         base_model: HolisticAIBedrockChat,
         schema: Type[PydanticBaseModel],
+        method: str = "tool",
+        max_reasks: int = 1,
         **kwargs: Any,
     ):
+        from langchain_core.tools import StructuredTool
+        
+        if method not in ("tool", "json_schema"):
+            raise ValueError(f"Unknown structured output method: {method}")
         self.base_model = base_model
         self.schema = schema
+        self.method = method
+        self.max_reasks = max_reasks
         
-        # Get JSON schema from Pydantic model
-        json_schema = schema.model_json_schema()
-        
-        # According to API docs, we can pass Pydantic's JSON schema directly
-        # The API will automatically wrap it in the correct format
-        # But we still need to clean it up to remove Pydantic-specific fields
-        cleaned_schema = {
-            "type": json_schema.get("type", "object"),
-            "properties": {},
-            "required": json_schema.get("required", []),
-        }
-        
-        # Clean up properties - remove Pydantic-specific fields like "title"
-        for key, value in json_schema.get("properties", {}).items():
-            cleaned_prop = {}
-            if "type" in value:
-                cleaned_prop["type"] = value["type"]
-            if "description" in value:
-                cleaned_prop["description"] = value["description"]
-            if "items" in value:
-                # Clean items as well - remove "title" and other non-standard fields
-                cleaned_items = {}
-                if "type" in value["items"]:
-                    cleaned_items["type"] = value["items"]["type"]
-                cleaned_prop["items"] = cleaned_items
-            if "enum" in value:
-                cleaned_prop["enum"] = value["enum"]
-            # Handle constraints
-            if "minimum" in value:
-                cleaned_prop["minimum"] = value["minimum"]
-            if "maximum" in value:
-                cleaned_prop["maximum"] = value["maximum"]
-            cleaned_schema["properties"][key] = cleaned_prop
+        # Fully resolved schema: nested models ($defs/$ref) and list items keep their shape
+        self._json_schema = model_schema(schema)
+        self._tool_name = schema.__name__
+        self._tool_model = base_model.bind_tools([
+            StructuredTool(
+                name=self._tool_name,
+                description=schema.__doc__ or f"Return the final answer as {self._tool_name}.",
+                args_schema=self._json_schema,
+            )
+        ])
         
         # Create response_format for API
         # According to docs, we can pass the schema directly
@@ -336,23 +742,65 @@ class HolisticAIBedrockStructuredOutput:
             "json_schema": {
                 "name": schema.__name__.lower(),
                 "strict": True,
-                "schema": cleaned_schema
+                "schema": self._json_schema
             }
         }
     
-    def invoke(self, input: Any, config: Optional[Any] = None, **kwargs: Any) -> PydanticBaseModel:
-        """Invoke the model and return structured output."""
+    def _call(self, model: HolisticAIBedrockChat, messages: List[BaseMessage], **kwargs: Any) -> AIMessage:
+        try:
+            result = model._generate(messages=messages, **kwargs)
+        except ValueError as e:
+            # If API returns error, provide helpful message
+            error_str = str(e)
+            if "500" in error_str or "Internal Server Error" in error_str:
+                raise ValueError(
+                    f"Holistic AI Bedrock API returned an error with structured output.\n"
+                    f"This may occur when:\n"
+                    f"1. Combining tools and structured output\n"
+                    f"2. API temporarily unavailable\n"
+                    f"3. response_format feature limitations\n\n"
+                    f"Original error: {error_str}\n\n"
+                    f"💡 Solution: let the agent return the structured answer as a tool call:\n"
+                    f"  from langchain.agents import create_agent\n"
+                    f"  agent = create_agent(model, tools=[...], response_format={self.schema.__name__})"
+                )
+            raise
+        return result.generations[0].message
+    
+    def _invoke_tool(self, messages: List[BaseMessage], **kwargs: Any) -> PydanticBaseModel:
         from langchain_core.messages import ToolMessage
+        from pydantic import ValidationError
         
-        # Convert input to messages if needed
-        if isinstance(input, str):
-            messages = [HumanMessage(content=input)]
-        elif isinstance(input, list):
-            messages = input
-        elif hasattr(input, "messages"):
-            messages = input.messages
-        else:
-            messages = [HumanMessage(content=str(input))]
+        if messages and isinstance(messages[-1], AIMessage) and not messages[-1].tool_calls:
+            # Conversation ends on the final text answer: use it if it already is
+            # the answer, else regenerate that turn as the forced tool call
+            try:
+                return parse_structured(self.schema, messages[-1].content, self._json_schema)
+            except ValueError:  # includes ValidationError
+                messages = messages[:-1]
+        tool_choice = {"type": "tool", "name": self._tool_name}
+        
+        for attempt in range(self.max_reasks + 1):
+            message = self._call(self._tool_model, messages, tool_choice=tool_choice, **kwargs)
+            calls = [tc for tc in message.tool_calls if tc["name"] == self._tool_name]
+            data = calls[0]["args"] if calls else message.content
+            try:
+                return parse_structured(self.schema, data, self._json_schema)
+            except ValidationError as e:
+                error, feedback = e, validation_feedback(e)
+            except ValueError as e:
+                error, feedback = e, str(e)
+            
+            if attempt == self.max_reasks:
+                raise ValueError(f"Failed to validate structured output: {error}\nContent: {data}")
+            if calls:
+                reply = ToolMessage(content=feedback, tool_call_id=calls[0]["id"])
+            else:
+                reply = HumanMessage(content=feedback)
+            messages = messages + [message, reply]
+    
+    def _invoke_json_schema(self, messages: List[BaseMessage], **kwargs: Any) -> PydanticBaseModel:
+        from pydantic import ValidationError
         
         # When using structured output with agents, the messages may contain tool call history
         # For structured output, we need to extract just the final AI response content
@@ -376,48 +824,32 @@ class HolisticAIBedrockStructuredOutput:
             # Fallback: use original messages
             messages_to_use = messages
         
-        # Call _generate with response_format
-        try:
-            result = self.base_model._generate(
-                messages=messages_to_use,
-                response_format=self._response_format,
-                **kwargs
-            )
-        except ValueError as e:
-            # If API returns error, provide helpful message
-            error_str = str(e)
-            if "500" in error_str or "Internal Server Error" in error_str:
-                raise ValueError(
-                    f"Holistic AI Bedrock API returned an error with structured output.\n"
-                    f"This may occur when:\n"
-                    f"1. Combining tools and structured output\n"
-                    f"2. API temporarily unavailable\n"
-                    f"3. response_format feature limitations\n\n"
-                    f"Original error: {error_str}\n\n"
-                    f"💡 Solution: Use OpenAI for agent + structured output:\n"
-                    f"  from langchain_openai import ChatOpenAI\n"
-                    f"  llm_openai = ChatOpenAI(model='gpt-5-mini')\n"
-                    f"  agent = create_react_agent(llm_openai, tools=[...], response_format={self.schema.__name__})"
-                )
-            raise
-        
-        # Extract JSON from response
-        content = result.generations[0].message.content
+        content = self._call(
+            self.base_model, messages_to_use, response_format=self._response_format, **kwargs
+        ).content
         
-        # Parse JSON and validate with Pydantic
+        # Repair locally (fences, JSON-string nesting...) then validate with Pydantic
         try:
-            if isinstance(content, str):
-                json_data = json.loads(content)
-            else:
-                json_data = content
-            
-            # Validate and return Pydantic object
-            return self.schema.model_validate(json_data)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse JSON from structured output: {e}\nContent: {content}")
-        except Exception as e:
+            return parse_structured(self.schema, content, self._json_schema)
+        except ValidationError as e:
             raise ValueError(f"Failed to validate structured output: {e}\nContent: {content}")
     
+    def invoke(self, input: Any, config: Optional[Any] = None, **kwargs: Any) -> PydanticBaseModel:
+        """Invoke the model and return structured output."""
+        # Convert input to messages if needed
+        if isinstance(input, str):
+            messages = [HumanMessage(content=input)]
+        elif isinstance(input, list):
+            messages = input
+        elif hasattr(input, "messages"):
+            messages = input.messages
+        else:
+            messages = [HumanMessage(content=str(input))]
+        
+        if self.method == "tool":
+            return self._invoke_tool(messages, **kwargs)
+        return self._invoke_json_schema(messages, **kwargs)
+    
     def __call__(self, input: Any, **kwargs: Any) -> PydanticBaseModel:
         """Make the wrapper callable."""
         return self.invoke(input, **kwargs)
@@ -432,7 +864,11 @@ def get_chat_model(model_name: str = "claude-3-5-sonnet", use_openai: bool = Fal
             - Full Bedrock IDs: 'us.anthropic.claude-3-5-sonnet-20241022-v2:0'
             - OpenAI models: 'gpt-5-nano', 'gpt-5-mini', 'gpt-5' (only if use_openai=True)
         use_openai: If True, use OpenAI instead of Bedrock (optional alternative)
-        **kwargs: Additional arguments for the model
+        **kwargs: Additional arguments for the model. Pass ``cache=True`` (or set
+            HOLISTIC_AI_RESPONSE_CACHE=1) to share the default response cache, or
+            ``cache=<ResponseCache>`` to use a specific one. Only temperature 0
+            requests are cached unless ``cache_sampled=True`` (or
+            HOLISTIC_AI_CACHE_SAMPLED=1).
     
     Returns:
         ChatModel instance
@@ -440,8 +876,6 @@ def get_chat_model(model_name: str = "claude-3-5-sonnet", use_openai: bool = Fal
     Raises:
         ValueError: If Bedrock credentials not set and use_openai=False
     """
-    from langchain_openai import ChatOpenAI
-    
     # Model name mapping
     bedrock_model_map = {
         'claude-3-5-sonnet': 'us.anthropic.claude-3-5-sonnet-20241022-v2:0',
@@ -467,6 +901,8 @@ def get_chat_model(model_name: str = "claude-3-5-sonnet", use_openai: bool = Fal
                 "OPENAI_API_KEY not set. To use OpenAI, set OPENAI_API_KEY in your .env file.\n"
                 "Alternatively, use Holistic AI Bedrock by setting HOLISTIC_AI_TEAM_ID and HOLISTIC_AI_API_TOKEN."
             )
+        from langchain_openai import ChatOpenAI
+        
         print("ℹ️  Using OpenAI (optional alternative)")
         return ChatOpenAI(model=model_name, **kwargs)
     
@@ -489,13 +925,30 @@ def get_chat_model(model_name: str = "claude-3-5-sonnet", use_openai: bool = Fal
     if not bedrock_model.startswith('us.') and not bedrock_model.startswith('mistral.'):
         bedrock_model = 'us.anthropic.claude-3-5-sonnet-20241022-v2:0'
     
+    cache = kwargs.get('cache', os.getenv("HOLISTIC_AI_RESPONSE_CACHE", "0") == "1")
+    if cache is True:
+        cache = get_default_response_cache()
+    
     from pydantic import SecretStr
     return HolisticAIBedrockChat(
+        api_endpoint=kwargs.get('api_endpoint', DEFAULT_API_ENDPOINT),
         team_id=team_id,
         api_token=SecretStr(api_token),
         model=bedrock_model,
         temperature=kwargs.get('temperature', 0.7),
         max_tokens=kwargs.get('max_tokens', 1024),
         timeout=kwargs.get('timeout', 60),
+        pool_size=kwargs.get('pool_size', DEFAULT_POOL_SIZE),
+        http2=kwargs.get('http2', True),
+        response_cache=cache or None,
+        **{
+            name: kwargs[name]
+            for name in (
+                'cache_sampled', 'max_retries', 'retry_base_delay', 'retry_max_delay', 'hedge_requests',
+                'rate_limit_per_second', 'rate_limit_burst',
+                'circuit_failure_threshold', 'circuit_reset_timeout', 'max_concurrency',
+            )
+            if name in kwargs
+        },
     )
 
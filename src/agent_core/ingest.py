@@ -0,0 +1,173 @@
+"""Document parsing and parallel bulk ingestion.
+
+``ingest_files`` parses many files at once on a process pool. PDFs are split
+into page ranges so one long PDF is parsed by several workers, and each file
+is yielded as soon as all of its parts are done. Parsed text goes through the
+persistent parse cache, so unchanged files are never sent to the pool.
+
+Both the single-file path (``parse_document``) and bulk ingestion extract PDF
+text with ``parse_pdf_pages``, so a cached blob is the same text whichever
+path wrote it.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Optional
+
+from langchain_community.document_loaders import (
+    PyPDFLoader,
+    UnstructuredFileLoader,
+    JSONLoader,
+    CSVLoader,
+    Docx2txtLoader,
+    TextLoader,
+)
+from agent_core.parse_cache import get_parse_cache
+from agent_core.telemetry import span, start_span
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 2)))
+PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "4"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_loader_for_file(file_path: str):
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext == ".pdf":
+        return PyPDFLoader(file_path)
+
+    if ext in [".txt", ".md"]:
+        return TextLoader(file_path)
+
+    if ext in [".doc", ".docx"]:
+        return Docx2txtLoader(file_path)
+
+    if ext == ".json":
+        return JSONLoader(file_path)
+
+    if ext == ".csv":
+        return CSVLoader(file_path)
+
+    return UnstructuredFileLoader(file_path)
+
+
+def parse_document(file_path: str) -> str:
+    if file_path.lower().endswith(".pdf"):
+        with span("loader.parse_document", file=os.path.basename(file_path), loader="pypdf") as s:
+            text = "\n".join(parse_pdf_pages(file_path, 0, pdf_page_count(file_path)))
+            s.set(chars=len(text))
+        return text
+    loader = get_loader_for_file(file_path)
+    with span("loader.parse_document", file=os.path.basename(file_path), loader=type(loader).__name__) as s:
+        docs = loader.load()
+        text = "\n".join(d.page_content for d in docs)
+        s.set(chars=len(text))
+    return text
+
+
+def pdf_page_count(file_path: str) -> int:
+    import pypdf
+
+    return len(pypdf.PdfReader(file_path).pages)
+
+
+def parse_pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop), one stripped string per page."""
+    import pypdf
+
+    reader = pypdf.PdfReader(file_path)
+    return [reader.pages[i].extract_text().strip() for i in range(start, min(stop, len(reader.pages)))]
+
+
+def get_ingest_pool() -> ProcessPoolExecutor:
+    """Process pool shared by bulk ingestion (spawned, so it is safe alongside threads)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=INGEST_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_ingest_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def ingest_files(file_paths: List[str], pages_per_task: int = PAGES_PER_TASK) -> Iterator[dict]:
+    """Parse files in parallel, yielding one result per file in completion order."""
+    cache = get_parse_cache()
+    started = time.perf_counter()
+    pending = {}  # file_path -> {"digest", "parts", "remaining", "span"}
+    futures = {}  # future -> (file_path, part index)
+
+    def result(file_path: str, **fields) -> dict:
+        return {
+            "file_path": file_path,
+            "file_name": os.path.basename(file_path),
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+            **fields,
+        }
+
+    for file_path in file_paths:
+        try:
+            digest = cache.file_digest(file_path)
+            text = cache.get(digest)
+            if text is not None:
+                start_span("loader.ingest_file", file=os.path.basename(file_path), cache_hit=True).end()
+                yield result(file_path, status="OK", sha256=digest, content=text, cache_hit=True)
+                continue
+
+            pool = get_ingest_pool()
+            if file_path.lower().endswith(".pdf"):
+                n_pages = pdf_page_count(file_path)
+                ranges = [(i, i + pages_per_task) for i in range(0, n_pages, pages_per_task)] or [(0, 0)]
+                for index, (start, stop) in enumerate(ranges):
+                    futures[pool.submit(parse_pdf_pages, file_path, start, stop)] = (file_path, index)
+            else:
+                ranges = [None]
+                futures[pool.submit(parse_document, file_path)] = (file_path, 0)
+            file_span = start_span("loader.ingest_file", file=os.path.basename(file_path), cache_hit=False, parts=len(ranges))
+            pending[file_path] = {
+                "digest": digest, "parts": [None] * len(ranges), "remaining": len(ranges), "span": file_span,
+            }
+        except Exception as e:
+            yield result(file_path, status="ERROR", message=str(e))
+
+    for future in as_completed(futures):
+        file_path, index = futures[future]
+        entry = pending.get(file_path)
+        if entry is None:
+            continue  # an earlier part of this file already failed
+        try:
+            entry["parts"][index] = future.result()
+        except Exception as e:
+            del pending[file_path]
+            entry["span"].end(e)
+            yield result(file_path, status="ERROR", message=str(e))
+            continue
+
+        entry["remaining"] -= 1
+        if entry["remaining"]:
+            continue
+
+        del pending[file_path]
+        parts = entry["parts"]
+        if isinstance(parts[0], list):
+            text = "\n".join(page for part in parts for page in part)
+        else:
+            text = parts[0]
+        cache.put(entry["digest"], text)
+        entry["span"].set(chars=len(text))
+        entry["span"].end()
+        yield result(file_path, status="OK", sha256=entry["digest"], content=text, cache_hit=False)
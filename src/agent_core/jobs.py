@@ -0,0 +1,235 @@
+"""Background job engine for agent runs.
+
+Jobs run on a bounded thread pool so long agent cycles never block the event
+loop. Submissions beyond ``max_queue`` waiting jobs are rejected. Python
+threads cannot be killed, so cancelling a running job (or its timeout
+expiring) only sets ``cancel_requested``: the job function polls it with
+``raise_if_cancelled()`` between steps and stops. The job stays ``running``
+until it has actually stopped, then becomes ``cancelled`` / ``timed_out``
+and whatever it returned is discarded.
+"""
+
+import contextvars
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED, TIMED_OUT)
+
+_current_job: contextvars.ContextVar = contextvars.ContextVar("current_job", default=None)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at its depth limit."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function once its job was cancelled or timed out."""
+
+
+def current_job() -> Optional["Job"]:
+    """The job whose function is running in this context, if any."""
+    return _current_job.get()
+
+
+def raise_if_cancelled() -> None:
+    """Stop the current job here if a cancel or timeout was requested (no-op outside jobs)."""
+    job = _current_job.get()
+    if job is not None and job.cancel_requested.is_set():
+        raise JobCancelled(job.stop_error or "Cancelled")
+
+
+class Job:
+    def __init__(self, kind: str, timeout: Optional[float], on_finish: Optional[Callable[["Job"], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.timeout = timeout
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = threading.Event()
+        # Final status and error once a requested stop has taken effect
+        self.stop_status: Optional[str] = None
+        self.stop_error: Optional[str] = None
+        self.future = None
+        self._on_finish = on_finish
+        self._timer: Optional[threading.Timer] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "timeout": self.timeout,
+            "cancel_requested": self.cancel_requested.is_set(),
+        }
+
+
+class JobManager:
+    """Run callables on a bounded worker pool and track them by job ID."""
+
+    def __init__(
+        self,
+        max_workers: int = int(os.getenv("AGENT_WORKERS", "4")),
+        max_queue: int = int(os.getenv("AGENT_QUEUE_LIMIT", "32")),
+        default_timeout: Optional[float] = float(os.getenv("AGENT_JOB_TIMEOUT", "300")),
+        max_retained: int = 1000,
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self.max_retained = max_retained
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable[..., Any], *args: Any, kind: str = "job",
+               timeout: Optional[float] = None, on_finish: Optional[Callable[[Job], None]] = None,
+               **kwargs: Any) -> Job:
+        """Queue fn(*args, **kwargs); raises QueueFullError at the depth limit.
+
+        on_finish(job) is called once the job reaches a final status, however it got there,
+        outside the manager's lock (so it may call back into the manager).
+        """
+        job = Job(kind, timeout if timeout is not None else self.default_timeout, on_finish)
+        context = contextvars.copy_context()
+        with self._lock:
+            if self.queue_depth() >= self.max_queue:
+                raise QueueFullError(f"Job queue is full ({self.max_queue} waiting)")
+            self._jobs[job.id] = job
+            self._prune()
+            job.future = self._executor.submit(context.run, self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a job: queued jobs never start, running ones stop at their next check."""
+        on_finish = None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            self._request_stop(job, CANCELLED, "Cancelled by request")
+            if job.future.cancel():
+                on_finish = self._finish(job, CANCELLED, error=job.stop_error)
+        self._notify(job, on_finish)
+        return job
+
+    def queue_depth(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts: dict = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": counts.get(QUEUED, 0),
+                "running": counts.get(RUNNING, 0),
+                "jobs": counts,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        on_finish = None
+        with self._lock:
+            if job.finished:
+                return
+            stopped = job.stop_status is not None
+            if stopped:
+                on_finish = self._finish(job, job.stop_status, error=job.stop_error)
+            else:
+                job.status = RUNNING
+                job.started_at = time.time()
+                if job.timeout:
+                    job._timer = threading.Timer(job.timeout, self._expire, args=(job,))
+                    job._timer.daemon = True
+                    job._timer.start()
+        if stopped:
+            self._notify(job, on_finish)
+            return
+
+        token = _current_job.set(job)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                if job.stop_status:
+                    on_finish = self._finish(job, job.stop_status, error=job.stop_error)
+                else:
+                    on_finish = self._finish(job, FAILED, error=f"{type(e).__name__}: {e}")
+            self._notify(job, on_finish)
+            return
+        finally:
+            _current_job.reset(token)
+
+        with self._lock:
+            if job.stop_status:
+                on_finish = self._finish(job, job.stop_status, error=job.stop_error)
+            else:
+                job.result = result
+                on_finish = self._finish(job, SUCCEEDED)
+        self._notify(job, on_finish)
+
+    def _expire(self, job: Job) -> None:
+        with self._lock:
+            if not job.finished:
+                self._request_stop(job, TIMED_OUT, f"Job exceeded {job.timeout}s timeout")
+
+    def _request_stop(self, job: Job, status: str, error: str) -> None:
+        # The first reason wins: a job cancelled after timing out stays timed out
+        if job.stop_status is None:
+            job.stop_status = status
+            job.stop_error = error
+        job.cancel_requested.set()
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> Optional[Callable[[Job], None]]:
+        """Record the final status (caller holds the lock); returns the on_finish callback to run."""
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        if job._timer is not None:
+            job._timer.cancel()
+        on_finish, job._on_finish = job._on_finish, None
+        return on_finish
+
+    @staticmethod
+    def _notify(job: Job, on_finish: Optional[Callable[[Job], None]]) -> None:
+        # Called after releasing the lock: callbacks may be slow or use the manager
+        if on_finish is not None:
+            on_finish(job)
+
+    def _prune(self) -> None:
+        # Forget the oldest finished jobs once over the retention limit
+        excess = len(self._jobs) - self.max_retained
+        for job_id in [j.id for j in self._jobs.values() if j.finished][:max(excess, 0)]:
+            del self._jobs[job_id]
@@ -0,0 +1,113 @@
+"""Persistent, content-addressed cache of parsed document text.
+
+Parsed text is stored as plain UTF-8 blobs named after the SHA-256 of the
+source file plus the loader version, so a restart reuses earlier parses and a
+changed file (even under the same name) gets a fresh one. A stat index
+remembers each path's (mtime, size) -> hash so unchanged files are not
+re-hashed on every lookup.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+from typing import Callable, Optional, Tuple
+
+# Bump when get_loader_for_file, PDF page extraction or text joining changes,
+# to invalidate old blobs
+LOADER_VERSION = "2"
+
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", os.path.join(os.getcwd(), ".cache", "parsed"))
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ParseCache:
+    """On-disk parse cache keyed by (content hash, loader version)."""
+
+    def __init__(self, root: str = PARSE_CACHE_DIR, loader_version: str = LOADER_VERSION):
+        self.root = root
+        self.loader_version = loader_version
+        self._blob_dir = os.path.join(root, "blobs")
+        self._stat_index_path = os.path.join(root, "stat_index.json")
+        self._lock = threading.Lock()
+        os.makedirs(self._blob_dir, exist_ok=True)
+        self._stat_index = self._read_stat_index()
+
+    def _read_stat_index(self) -> dict:
+        try:
+            with open(self._stat_index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def file_digest(self, path: str) -> str:
+        """SHA-256 of path, reusing the last hash while mtime and size are unchanged."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._stat_index.get(path)
+            if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                return entry["sha256"]
+
+        digest = sha256_file(path)
+        with self._lock:
+            self._stat_index[path] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest}
+            _atomic_write(self._stat_index_path, json.dumps(self._stat_index).encode("utf-8"))
+        return digest
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blob_dir, f"{digest}-v{self.loader_version}.txt")
+
+    def get(self, digest: str) -> Optional[str]:
+        blob_path = self._blob_path(digest)
+        try:
+            with open(blob_path, "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return ""
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return mm[:].decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def put(self, digest: str, text: str) -> None:
+        _atomic_write(self._blob_path(digest), text.encode("utf-8"))
+
+    def load(self, path: str, parse: Callable[[str], str]) -> Tuple[str, str, bool]:
+        """Return (text, sha256, cache_hit), calling parse(path) only on a miss."""
+        digest = self.file_digest(path)
+        text = self.get(digest)
+        if text is not None:
+            return text, digest, True
+        text = parse(path)
+        self.put(digest, text)
+        return text, digest, False
+
+
+_parse_cache: Optional[ParseCache] = None
+_parse_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> ParseCache:
+    global _parse_cache
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseCache()
+        return _parse_cache
@@ -0,0 +1,82 @@
+"""Precompiled request payload pieces for the Holistic AI Bedrock proxy.
+
+The system prompt and tool definitions are identical on every turn of an
+agent run. ``PayloadBuilder`` computes them once per bound model and
+serialises payloads with orjson when installed. With prompt caching enabled
+(opt-in, HOLISTIC_AI_PROMPT_CACHING=1) it also marks the end of that static
+prefix with an Anthropic ``cache_control`` breakpoint so the backend can
+reuse it; this turns the system message into content blocks, so only enable
+it on a proxy known to pass both through to Bedrock.
+"""
+
+import json
+from typing import Any, List, Optional
+
+from agent_core.structured_output import clean_json_schema
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialise a payload to compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def tool_definition(tool: Any) -> Optional[dict]:
+    """Proxy tool definition for a LangChain tool, or None for non-tool objects."""
+    # Only process if it's a tool object with 'name' and 'description' attributes
+    # Skip Pydantic schemas and other non-tool objects
+    if not (hasattr(tool, 'name') and
+            hasattr(tool, 'description') and
+            callable(getattr(tool, 'name', None)) == False):  # name should not be callable
+        return None
+    try:
+        args_schema = getattr(tool, "args_schema", None)
+        if args_schema is None:
+            input_schema = {"type": "object", "properties": {}}
+        elif isinstance(args_schema, dict):
+            # Structured-output tools (create_agent's ToolStrategy) carry a JSON schema dict
+            input_schema = clean_json_schema(args_schema)
+        else:
+            input_schema = clean_json_schema(args_schema.model_json_schema())
+        return {
+            "name": tool.name,
+            "description": tool.description,
+            "input_schema": input_schema
+        }
+    except Exception:
+        # Skip if we can't process this tool
+        return None
+
+
+class PayloadBuilder:
+    """Static payload prefix (tool definitions, system message) for one bound model."""
+
+    def __init__(self, tools: Optional[List[Any]] = None, prompt_caching: bool = False):
+        self.prompt_caching = prompt_caching
+        definitions = [d for d in (tool_definition(t) for t in tools or []) if d is not None]
+        self.input_schemas = {d["name"]: d["input_schema"] for d in definitions}
+        if definitions and prompt_caching:
+            definitions[-1] = {**definitions[-1], "cache_control": CACHE_CONTROL}
+        self.tool_definitions = definitions
+        self._system_prompt: Optional[str] = None
+        self._system_message: Optional[dict] = None
+
+    def system_message(self, system_prompt: str) -> dict:
+        """The leading message carrying the system prompt, built once per prompt text."""
+        if system_prompt != self._system_prompt:
+            text = f"System: {system_prompt}"
+            if self.prompt_caching:
+                content: Any = [{"type": "text", "text": text, "cache_control": CACHE_CONTROL}]
+            else:
+                content = text
+            self._system_message = {"role": "user", "content": content}
+            self._system_prompt = system_prompt
+        return self._system_message
@@ -0,0 +1,253 @@
+"""Rule-based progress engine that decides when an agent cycle is needed.
+
+Task status strings ("60%", "done", "blocked"...) and deadlines are parsed
+from project_state and compared with the progress expected by today, assuming
+linear progress from the task's start (or the project's) to its deadline.
+A task deviates when it is:
+
+- ``blocked``: its status says so;
+- ``overdue``: past its deadline and not done;
+- ``behind``: expected minus actual progress exceeds ``behind``;
+- ``at_risk``: due within ``due_soon_days`` with less than ``due_soon_min`` done.
+
+Thresholds come from the environment and can be overridden per project with
+a ``progress_thresholds`` object in project_state.
+
+``ProgressMonitor`` keeps each project's last evaluation, so a
+``/progress-update`` re-evaluates only the task it touched. Everything is
+recomputed when the state moved on by another writer, the day changed or
+the thresholds changed. The supervisor runs the LLM only when a deviation
+is flagged, i.e. not yet reported to the agent with its current kind. The
+API ``claim``s flagged deviations for the cycle it queues and ``release``s
+them again if that cycle cannot be queued or does not complete, so they are
+flagged on the next check.
+"""
+
+import os
+import re
+import threading
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from agent_core.allocation import state_tasks
+
+DONE_STATUSES = {"done", "complete", "completed", "finished", "submitted", "closed"}
+NOT_STARTED_STATUSES = {"todo", "to do", "not started", "pending", "planned", "open", "new"}
+BLOCKED_STATUSES = {"blocked", "stuck", "on hold"}
+
+_PERCENT = re.compile(r"(\d+(?:\.\d+)?)\s*%")
+
+
+class Thresholds(NamedTuple):
+    behind: float = float(os.getenv("PROGRESS_BEHIND_THRESHOLD", "0.2"))
+    due_soon_days: int = int(os.getenv("PROGRESS_DUE_SOON_DAYS", "2"))
+    due_soon_min: float = float(os.getenv("PROGRESS_DUE_SOON_MIN", "0.75"))
+
+    @classmethod
+    def from_state(cls, state: dict) -> "Thresholds":
+        overrides = state.get("progress_thresholds") or {}
+        values = {}
+        for field, default in cls()._asdict().items():
+            value = overrides.get(field)
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+            values[field] = type(default)(value) if valid else default
+        return cls(**values)
+
+
+def parse_date(value) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).strip()[:10]).date()
+    except ValueError:
+        return None
+
+
+def parse_progress(task: dict) -> Optional[float]:
+    """Fraction done in [0, 1] from ``progress`` or ``status``; None if it cannot be told."""
+    for key in ("progress", "status"):
+        value = task.get(key)
+        if isinstance(value, bool) or value is None:
+            continue
+        if isinstance(value, (int, float)):
+            return min(max(value / 100 if value > 1 else float(value), 0.0), 1.0)
+        text = str(value).strip().lower()
+        match = _PERCENT.search(text)
+        if match:
+            return min(float(match.group(1)) / 100, 1.0)
+        if text in DONE_STATUSES:
+            return 1.0
+        if text in NOT_STARTED_STATUSES:
+            return 0.0
+    return None
+
+
+def _deadline(task: dict) -> Optional[date]:
+    return parse_date(task.get("deadline") or task.get("due") or task.get("due_date"))
+
+
+def _start(task: dict, project_start: Optional[date]) -> Optional[date]:
+    return parse_date(task.get("start") or task.get("start_date")) or project_start
+
+
+def evaluate_task(
+    task: dict, today: date, thresholds: Thresholds, project_start: Optional[date] = None
+) -> Optional[dict]:
+    """The task's deviation, or None when it is on track (or there is nothing to judge)."""
+    actual = parse_progress(task)
+    deadline = _deadline(task)
+    start = _start(task, project_start)
+    expected = None
+    if deadline and start and deadline > start:
+        expected = min(max((today - start).days / (deadline - start).days, 0.0), 1.0)
+    days_left = (deadline - today).days if deadline else None
+    status = str(task.get("status", "")).strip().lower()
+
+    kind = None
+    if status in BLOCKED_STATUSES or status.startswith("blocked"):
+        kind = "blocked"
+    elif actual == 1.0:
+        return None
+    elif days_left is not None and days_left < 0:
+        kind = "overdue"
+    elif expected is not None and actual is not None and expected - actual > thresholds.behind:
+        kind = "behind"
+    elif days_left is not None and days_left <= thresholds.due_soon_days and (actual or 0.0) < thresholds.due_soon_min:
+        kind = "at_risk"
+    if kind is None:
+        return None
+    return {
+        "task": str(task.get("name")),
+        "kind": kind,
+        "actual": actual,
+        "expected": None if expected is None else round(expected, 3),
+        "delta": None if expected is None or actual is None else round(actual - expected, 3),
+        "days_left": days_left,
+        "assigned_to": task.get("assigned_to"),
+    }
+
+
+class _Evaluation:
+    __slots__ = ("version", "day", "thresholds", "project_start", "deviations")
+
+    def __init__(self, version: int, day: date, thresholds: Thresholds, project_start: Optional[date]):
+        self.version = version
+        self.day = day
+        self.thresholds = thresholds
+        self.project_start = project_start
+        self.deviations: Dict[str, dict] = {}
+
+
+class ProgressMonitor:
+    """Per-project incremental deviation tracking."""
+
+    def __init__(self):
+        self._evaluations: Dict[str, _Evaluation] = {}
+        self._reported: Dict[str, Dict[str, str]] = {}  # project -> {task: kind} handed to the agent
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        project_id: str,
+        state: dict,
+        version: int,
+        changed_tasks: Optional[Iterable[str]] = None,
+        today: Optional[date] = None,
+    ) -> dict:
+        """Evaluate project_state at ``version``; returns deviations and the flagged ones.
+
+        ``changed_tasks`` names the tasks written since the previous observed
+        version; when it is given and nothing else could have changed, only
+        those tasks are re-evaluated.
+        """
+        today = today or date.today()
+        thresholds = Thresholds.from_state(state)
+        project_start = parse_date(state.get("start_date") or state.get("project_start"))
+        tasks, _ = state_tasks(state)
+        by_name = {str(t.get("name")): t for t in tasks}
+
+        with self._lock:
+            previous = self._evaluations.get(project_id)
+            incremental = (
+                previous is not None
+                and changed_tasks is not None
+                and previous.version == version - 1
+                and previous.day == today
+                and previous.thresholds == thresholds
+                and previous.project_start == project_start
+            )
+            evaluation = _Evaluation(version, today, thresholds, project_start)
+            unchanged = (
+                previous is not None
+                and previous.version == version
+                and previous.day == today
+                and previous.thresholds == thresholds
+                and previous.project_start == project_start
+            )
+            if unchanged:
+                evaluation.deviations = dict(previous.deviations)
+                names = set()
+            elif incremental:
+                evaluation.deviations = dict(previous.deviations)
+                names = set(changed_tasks)
+            else:
+                names = set(by_name)
+            for name in names:
+                task = by_name.get(name)
+                deviation = evaluate_task(task, today, thresholds, project_start) if task else None
+                if deviation is None:
+                    evaluation.deviations.pop(name, None)
+                else:
+                    evaluation.deviations[name] = deviation
+            if previous is None or version >= previous.version:
+                self._evaluations[project_id] = evaluation
+                # A resolved deviation is flagged again if it comes back
+                reported = self._reported.get(project_id, {})
+                for task in [t for t in reported if t not in evaluation.deviations]:
+                    del reported[task]
+            reported = dict(self._reported.get(project_id, {}))
+
+        deviations = sorted(evaluation.deviations.values(), key=lambda d: d["task"])
+        flagged = [d for d in deviations if reported.get(d["task"]) != d["kind"]]
+        return {
+            "version": version,
+            "deviations": deviations,
+            "flagged": flagged,
+            "evaluated": len(names),
+            "incremental": incremental or unchanged,
+        }
+
+    def claim(self, project_id: str, deviations: List[dict]) -> List[dict]:
+        """Mark deviations as reported; returns those no other caller had claimed."""
+        with self._lock:
+            reported = self._reported.setdefault(project_id, {})
+            claimed = [d for d in deviations if reported.get(d["task"]) != d["kind"]]
+            for d in claimed:
+                reported[d["task"]] = d["kind"]
+            return claimed
+
+    def release(self, project_id: str, deviations: List[dict]) -> None:
+        """Undo ``claim`` (the agent never handled them), so they are flagged again."""
+        with self._lock:
+            reported = self._reported.get(project_id, {})
+            for d in deviations:
+                if reported.get(d["task"]) == d["kind"]:
+                    del reported[d["task"]]
+
+    def forget(self, project_id: str) -> None:
+        with self._lock:
+            self._evaluations.pop(project_id, None)
+            self._reported.pop(project_id, None)
+
+
+def deviation_prompt(deviations: List[dict]) -> str:
+    lines = [
+        f"- {d['task']}: {d['kind']} (actual {d['actual']}, expected {d['expected']}, "
+        f"days left {d['days_left']}, assigned to {d['assigned_to']})"
+        for d in deviations
+    ]
+    return "Run agent cycle. The progress engine flagged these deviations:\n" + "\n".join(lines)
+
+
+# Shared by the API routes and the check_progress tool
+monitor = ProgressMonitor()
@@ -0,0 +1,122 @@
+"""Project scoping: one deployment serves many student groups.
+
+Every project gets its own state-store namespace ``("project", <id>)``,
+upload folder, document-index partition and lock. The active project is
+resolved per call, so tools and helpers need no explicit argument:
+
+1. ``configurable.project_id`` in the LangChain run config (set by the API
+   when it invokes the agent; LangChain carries it into tool threads);
+2. the ``project_scope`` context variable (API handlers, jobs, scripts);
+3. ``DEFAULT_PROJECT_ID``. Its namespace is the original single-project
+   ``("project", "supervisor")``, so existing state stays where it was.
+
+Project locks serialise agent cycles within a project while independent
+projects run in parallel. They work from worker threads (``with``) and from
+the event loop (``async with``, which polls instead of blocking the loop).
+"""
+
+import asyncio
+import contextvars
+import os
+import re
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+from langchain_core.runnables.config import ensure_config
+
+DEFAULT_PROJECT_ID = os.getenv("DEFAULT_PROJECT_ID", "supervisor")
+
+_PROJECT_ID_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+_current_project: contextvars.ContextVar = contextvars.ContextVar("current_project", default=None)
+
+
+class InvalidProjectError(ValueError):
+    """The project id is not a safe identifier."""
+
+
+def validate_project_id(project_id: str) -> str:
+    if not isinstance(project_id, str) or not _PROJECT_ID_PATTERN.match(project_id):
+        raise InvalidProjectError(
+            f"Invalid project id {project_id!r}: use 1-64 letters, digits, '.', '_' or '-'"
+        )
+    return project_id
+
+
+def current_project_id() -> str:
+    configured = ensure_config().get("configurable", {}).get("project_id")
+    return configured or _current_project.get() or DEFAULT_PROJECT_ID
+
+
+@contextmanager
+def project_scope(project_id: Optional[str]) -> Iterator[str]:
+    """Make project_id the active project for the enclosed block (None keeps the current one)."""
+    if project_id is None:
+        yield current_project_id()
+        return
+    token = _current_project.set(validate_project_id(project_id))
+    try:
+        yield project_id
+    finally:
+        _current_project.reset(token)
+
+
+def project_namespace(project_id: Optional[str] = None) -> Tuple[str, ...]:
+    return ("project", project_id or current_project_id())
+
+
+def project_run_config(project_id: str, config: Optional[dict] = None) -> dict:
+    """Run config that carries project_id into the agent's tool calls."""
+    config = dict(config or {})
+    config["configurable"] = {**config.get("configurable", {}), "project_id": project_id}
+    return config
+
+
+class ProjectLock:
+    """A per-project mutex usable from threads and coroutines."""
+
+    def __init__(self, project_id: str):
+        self.project_id = project_id
+        self._lock = threading.Lock()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def acquire(self, timeout: float = -1) -> bool:
+        return self._lock.acquire(timeout=timeout)
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def __enter__(self) -> "ProjectLock":
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._lock.release()
+
+    async def __aenter__(self) -> "ProjectLock":
+        delay = 0.001
+        while not self._lock.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._lock.release()
+
+
+# Locks of projects nobody is using are dropped with their last reference
+_locks: "weakref.WeakValueDictionary[str, ProjectLock]" = weakref.WeakValueDictionary()
+_locks_guard = threading.Lock()
+
+
+def project_lock(project_id: Optional[str] = None) -> ProjectLock:
+    project_id = project_id or current_project_id()
+    with _locks_guard:
+        lock = _locks.get(project_id)
+        if lock is None:
+            lock = _locks[project_id] = ProjectLock(project_id)
+        return lock
@@ -0,0 +1,408 @@
+"""Retry, hedging, rate limiting and circuit breaking for proxy calls.
+
+``Resilience`` wraps a single-attempt send function. The endpoint-wide state
+lives in an ``Endpoint`` shared by every model pointed at the same URL, while
+retry and hedging policy stays per model:
+
+- a token bucket spaces out attempts client-side;
+- a circuit breaker fails fast with ``CircuitOpenError`` after repeated
+  failures, letting one probe through after ``reset_timeout``;
+- retryable statuses and transport errors are retried with exponential
+  backoff and full jitter, honouring ``Retry-After``;
+- optionally, once enough latency samples exist, a second (hedged) attempt
+  is started if the first has not answered by the observed p95.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(ValueError):
+    """Raised without calling the proxy while the circuit breaker is open."""
+
+
+class RetryableStatusError(Exception):
+    def __init__(self, response: Any):
+        super().__init__(f"Retryable HTTP status {response.status_code}")
+        self.response = response
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate`` tokens per second up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        delay = self._reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self) -> None:
+        delay = self._reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures -> half-open after ``reset_timeout``."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def before_call(self) -> bool:
+        """Raise if the call may not go through; True if it is the half-open probe."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probe_in_flight:
+                raise CircuitOpenError(
+                    f"Holistic AI Bedrock API circuit open after {self._failures} consecutive failures; "
+                    f"retrying after {self.reset_timeout:.0f}s"
+                )
+            self._probe_in_flight = True
+            return True
+
+    def end_probe(self) -> None:
+        """Let the next probe through if this one ended without a success or failure verdict."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _response_of(future: Any) -> Any:
+    """The response a finished attempt holds (returned or inside RetryableStatusError), if any."""
+    if future.cancelled():
+        return None
+    error = future.exception()
+    if error is None:
+        return future.result()
+    return error.response if isinstance(error, RetryableStatusError) else None
+
+
+def _close_result(future: Any) -> None:
+    response = _response_of(future)
+    if response is not None:
+        response.close()
+
+
+async def _aclose_result(task: Any) -> None:
+    response = _response_of(task)
+    if response is not None:
+        await response.aclose()
+
+
+class Endpoint:
+    """State shared by every caller of one endpoint: rate limit, breaker, latency and hedge pool."""
+
+    def __init__(
+        self,
+        rate_limit: Optional[float] = None,
+        rate_burst: Optional[float] = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.limiter = TokenBucket(rate_limit, rate_burst) if rate_limit else None
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency = LatencyTracker()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def hedge_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="bedrock-hedge")
+            return self._hedge_pool
+
+
+class Resilience:
+    """Retry/hedge policy of one model around a (possibly shared) ``Endpoint``.
+
+    Without ``endpoint`` the rate limit and breaker arguments build a private one.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        retry_statuses: Tuple[int, ...] = RETRY_STATUSES,
+        hedge: bool = False,
+        hedge_min_samples: int = 20,
+        rate_limit: Optional[float] = None,
+        rate_burst: Optional[float] = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        endpoint: Optional[Endpoint] = None,
+    ):
+        self.endpoint = endpoint or Endpoint(rate_limit, rate_burst, failure_threshold, reset_timeout)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.limiter = self.endpoint.limiter
+        self.breaker = self.endpoint.breaker
+        self.latency = self.endpoint.latency
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        # Full jitter: uniform in [0, min(max_delay, base * 2^attempt)]
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "p95_seconds": self.latency.percentile(0.95, self.hedge_min_samples),
+            "hedging": self.hedge,
+            "rate_limit": self.limiter.rate if self.limiter else None,
+        }
+
+    def _check(self, response: Any) -> Any:
+        if response.status_code in self.retry_statuses:
+            raise RetryableStatusError(response)
+        return response
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        return self.latency.percentile(0.95, self.hedge_min_samples)
+
+    # Sync ----------------------------------------------------------------
+
+    def _attempt(self, send: Callable[[], Any], record: bool = True) -> Any:
+        if self.limiter:
+            self.limiter.acquire()
+        started = time.perf_counter()
+        response = self._check(send())
+        if record:
+            self.latency.record(time.perf_counter() - started)
+        return response
+
+    def _hedged_attempt(self, send: Callable[[], Any], hedge: bool) -> Any:
+        delay = self._hedge_delay() if hedge else None
+        if delay is None:
+            return self._attempt(send, record=hedge)
+        pool = self.endpoint.hedge_pool()
+        primary = pool.submit(self._attempt, send)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        # Slower than p95: race a second attempt; the loser's response is closed
+        # when it arrives so its pooled connection is released
+        second = pool.submit(self._attempt, send)
+        pending = {primary, second}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in {primary, second} - {future}:
+                        loser.add_done_callback(_close_result)
+                    return future.result()
+                if pending:
+                    _close_result(future)
+                error = future.exception()
+        raise error
+
+    def call(
+        self, send: Callable[[], Any], is_transport_error: Callable[[BaseException], bool], hedge: bool = True
+    ) -> Any:
+        """Run send() with the full policy; returns the first non-retryable response.
+
+        Pass ``hedge=False`` for streamed requests: they are neither hedged nor
+        counted towards the p95, which is measured on complete responses.
+        """
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call()
+            try:
+                response = self._hedged_attempt(send, hedge)
+            except RetryableStatusError as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    return e.response
+                e.response.close()
+                time.sleep(self.backoff(attempt, e.response.headers.get("retry-after")))
+            except Exception as e:
+                if not is_transport_error(e):
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self.backoff(attempt))
+            else:
+                self.breaker.record_success()
+                return response
+            finally:
+                if probe:
+                    self.breaker.end_probe()
+            attempt += 1
+
+    # Async ---------------------------------------------------------------
+
+    async def _aattempt(self, send: Callable[[], Awaitable[Any]], record: bool = True) -> Any:
+        if self.limiter:
+            await self.limiter.aacquire()
+        started = time.perf_counter()
+        response = self._check(await send())
+        if record:
+            self.latency.record(time.perf_counter() - started)
+        return response
+
+    async def _ahedged_attempt(self, send: Callable[[], Awaitable[Any]], hedge: bool) -> Any:
+        delay = self._hedge_delay() if hedge else None
+        if delay is None:
+            return await self._aattempt(send, record=hedge)
+        primary = asyncio.ensure_future(self._aattempt(send))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        pending = {primary, asyncio.ensure_future(self._aattempt(send))}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        for loser in done - {task}:
+                            await _aclose_result(loser)
+                        return task.result()
+                    if pending:
+                        await _aclose_result(task)
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acall(
+        self,
+        send: Callable[[], Awaitable[Any]],
+        is_transport_error: Callable[[BaseException], bool],
+        hedge: bool = True,
+    ) -> Any:
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call()
+            try:
+                response = await self._ahedged_attempt(send, hedge)
+            except RetryableStatusError as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    return e.response
+                await e.response.aclose()
+                await asyncio.sleep(self.backoff(attempt, e.response.headers.get("retry-after")))
+            except Exception as e:
+                if not is_transport_error(e):
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+            else:
+                self.breaker.record_success()
+                return response
+            finally:
+                # A probe that raised something else or was cancelled must not
+                # keep the breaker closed to every later call
+                if probe:
+                    self.breaker.end_probe()
+            attempt += 1
+
+
+ENDPOINT_SETTINGS = ("rate_limit", "rate_burst", "failure_threshold", "reset_timeout")
+
+_endpoints: dict = {}
+_registry: dict = {}
+_registry_lock = threading.Lock()
+
+
+def get_resilience(endpoint: str, **config: Any) -> Resilience:
+    """Policy for one model configuration over the endpoint's shared ``Endpoint``.
+
+    The bucket, breaker and latency window are keyed by endpoint alone, so
+    models with different retry settings still share one rate limit and one
+    breaker; the first caller's endpoint settings create them. Retry and
+    hedging settings are kept per configuration.
+    """
+    shared = {k: config.pop(k) for k in ENDPOINT_SETTINGS if k in config}
+    key = (endpoint, tuple(sorted(config.items())))
+    with _registry_lock:
+        state = _endpoints.get(endpoint)
+        if state is None:
+            state = _endpoints[endpoint] = Endpoint(**shared)
+        resilience = _registry.get(key)
+        if resilience is None:
+            resilience = _registry[key] = Resilience(**config, endpoint=state)
+        return resilience
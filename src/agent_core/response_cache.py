@@ -0,0 +1,235 @@
+"""Opt-in response cache for Holistic AI Bedrock proxy calls.
+
+Responses are keyed by a canonical hash of the outgoing payload (credentials
+excluded) and kept in two tiers: a bounded in-memory LRU in front of a local
+SQLite file. Both tiers honour a TTL; the SQLite tier is also capped in bytes.
+Its size is tracked as a running total, re-read from the file every
+``_RESYNC_WRITES`` writes to pick up other processes sharing it, so a write
+costs no table scan. Disk hits refresh ``accessed_at`` (the LRU order) in
+batches: touches are buffered and written with the next ``set`` or every
+``_TOUCH_BATCH`` hits, so a read does not commit.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Payload fields that identify the caller rather than the request
+_CREDENTIAL_FIELDS = ("team_id", "api_token")
+
+_RESYNC_WRITES = 1000
+_TOUCH_BATCH = 64
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "HOLISTIC_AI_CACHE_PATH", os.path.join(os.getcwd(), ".cache", "bedrock_responses.sqlite")
+)
+
+
+def canonical_json(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + SQLite) cache of raw proxy responses."""
+
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_CACHE_PATH,
+        max_memory_entries: int = 256,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: float = 24 * 3600,
+    ):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        self._db = None
+        self._disk_bytes = 0
+        self._writes_since_sync = 0
+        self._touched: dict = {}
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses(created_at)")
+            self._db.commit()
+            self._sync_disk_bytes()
+
+    @staticmethod
+    def make_key(payload: dict) -> str:
+        """Hash model, messages, tools, response_format, temperature and max_tokens."""
+        keyed = {k: v for k, v in payload.items() if k not in _CREDENTIAL_FIELDS}
+        return hashlib.sha256(canonical_json(keyed).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    raw, created_at = row
+                    if now - created_at <= self.ttl_seconds:
+                        self._touched[key] = now
+                        if len(self._touched) >= _TOUCH_BATCH:
+                            self._flush_touches()
+                            self._db.commit()
+                        value = json.loads(raw)
+                        self._remember(key, created_at, value)
+                        self._counters["disk_hits"] += 1
+                        return value
+                    self._touched.pop(key, None)
+                    self._delete(key)
+                    self._db.commit()
+
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: dict) -> None:
+        now = time.time()
+        raw = canonical_json(value)
+        with self._lock:
+            self._remember(key, now, value)
+            self._counters["writes"] += 1
+            if self._db is not None:
+                self._touched.pop(key, None)
+                self._flush_touches()
+                self._delete(key)
+                self._db.execute(
+                    "INSERT INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, raw, len(raw), now, now),
+                )
+                self._disk_bytes += len(raw)
+                self._writes_since_sync += 1
+                if self._writes_since_sync >= _RESYNC_WRITES:
+                    self._sync_disk_bytes()
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _remember(self, key: str, created_at: float, value: dict) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _flush_touches(self) -> None:
+        if self._touched:
+            self._db.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _sync_disk_bytes(self) -> None:
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self._writes_since_sync = 0
+
+    def _delete(self, key: str) -> None:
+        row = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._disk_bytes -= row[0]
+
+    def _evict_disk(self, now: float) -> None:
+        # Both scans use an index and only touch the rows they remove
+        cutoff = now - self.ttl_seconds
+        expired, size = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created_at < ?", (cutoff,)
+        ).fetchone()
+        if expired:
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (cutoff,))
+            self._disk_bytes -= size
+            self._counters["evictions"] += expired
+
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        # Drop least recently used rows until back under the byte budget
+        cursor = self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC")
+        victims = []
+        for key, size in cursor:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            victims.append((key,))
+            self._disk_bytes -= size
+        cursor.close()
+        self._db.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._counters["evictions"] += len(victims)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+                self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["hits"] = stats["memory_hits"] + stats["disk_hits"]
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                count, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+                stats["disk_entries"] = count
+                stats["disk_bytes"] = size
+            return stats
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_response_cache() -> ResponseCache:
+    """Return the process-wide cache shared by models created with cache enabled."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                path=DEFAULT_CACHE_PATH,
+                max_memory_entries=int(os.getenv("HOLISTIC_AI_CACHE_MEMORY_ENTRIES", "256")),
+                max_disk_bytes=int(os.getenv("HOLISTIC_AI_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+                ttl_seconds=float(os.getenv("HOLISTIC_AI_CACHE_TTL", str(24 * 3600))),
+            )
+        return _default_cache
+
+
+def default_cache_stats() -> dict:
+    """Counters of the default cache, without creating it if no model enabled it."""
+    if _default_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **_default_cache.stats()}
@@ -0,0 +1,79 @@
+"""Vectorised skill-to-task similarity scoring (the spec's SimilarityScorerTool).
+
+Users are described by their CV / profile text and skills, tasks by their
+name, description and required skills. Both sides are embedded through the
+persistent embedding cache, so after a single CV or task edit only that one
+text reaches the encoder; the full users x tasks cosine matrix is then one
+matrix product and per-user rankings come from one argsort.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from agent_core.allocation import state_tasks, state_users
+from agent_core.embedding_cache import cached_embed
+
+USER_TEXT_FIELDS = ("cv", "profile", "bio", "summary", "experience")
+TASK_TEXT_FIELDS = ("description", "details", "deliverable")
+
+
+def _skills_text(value) -> str:
+    if isinstance(value, dict):
+        value = list(value)
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(s) for s in value)
+    return str(value or "")
+
+
+def user_text(user: dict) -> str:
+    parts = [str(user[f]) for f in USER_TEXT_FIELDS if user.get(f)]
+    skills = _skills_text(user.get("skills"))
+    if skills:
+        parts.append(f"Skills: {skills}")
+    return "\n".join(parts) or str(user.get("name", ""))
+
+
+def task_text(task: dict) -> str:
+    parts = [str(task.get("name", ""))]
+    parts += [str(task[f]) for f in TASK_TEXT_FIELDS if task.get(f)]
+    skills = _skills_text(task.get("skills") or task.get("required_skills"))
+    if skills:
+        parts.append(f"Requires: {skills}")
+    return "\n".join(p for p in parts if p)
+
+
+def cosine_matrix(user_vectors: np.ndarray, task_vectors: np.ndarray) -> np.ndarray:
+    """Users x tasks cosine similarity in one product (float32 accumulation)."""
+    users = np.asarray(user_vectors, dtype=np.float32)
+    tasks = np.asarray(task_vectors, dtype=np.float32)
+    users = users / np.maximum(np.linalg.norm(users, axis=1, keepdims=True), 1e-12)
+    tasks = tasks / np.maximum(np.linalg.norm(tasks, axis=1, keepdims=True), 1e-12)
+    return users @ tasks.T
+
+
+def rank_tasks(
+    users: Sequence[dict],
+    tasks: Sequence[dict],
+    top_k: Optional[int] = None,
+    embed: Callable[[List[str]], np.ndarray] = cached_embed,
+) -> Dict[str, List[dict]]:
+    """{user name: [{"task", "score"}, ...]} best match first, optionally the top_k only."""
+    if not users or not tasks:
+        return {}
+    vectors = embed([user_text(u) for u in users] + [task_text(t) for t in tasks])
+    scores = cosine_matrix(vectors[:len(users)], vectors[len(users):])
+    order = np.argsort(-scores, axis=1, kind="stable")
+    if top_k:
+        order = order[:, :top_k]
+    task_names = [str(t.get("name", i)) for i, t in enumerate(tasks)]
+    return {
+        user["name"]: [{"task": task_names[j], "score": round(float(scores[u, j]), 4)} for j in order[u]]
+        for u, user in enumerate(users)
+    }
+
+
+def rank_state(state: dict, top_k: Optional[int] = None, embed: Callable = cached_embed) -> Dict[str, List[dict]]:
+    """Rank project_state tasks for each of its users."""
+    tasks, _ = state_tasks(state)
+    return rank_tasks(state_users(state), tasks, top_k, embed)
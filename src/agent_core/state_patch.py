@@ -0,0 +1,179 @@
+"""Incremental updates to JSON state documents.
+
+Supports RFC 6902 JSON Patch operations (add, remove, replace, move, copy,
+test) and a shorthand field-path form, ``{"field": "tasks.intro.status",
+"value": "done"}``, which sets (adding if needed) one member by dotted path.
+``diff`` goes the other way, from two documents to the ops between them.
+"""
+
+import copy
+from typing import Any, List, Tuple
+
+
+class PatchError(ValueError):
+    """Raised when a patch cannot be applied to the document."""
+
+
+def escape_pointer_token(token: str) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def field_to_pointer(field: str) -> str:
+    return "".join("/" + escape_pointer_token(part) for part in field.split("."))
+
+
+def _parse_pointer(pointer: str) -> List[str]:
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [t.replace("~1", "/").replace("~0", "~") for t in pointer[1:].split("/")]
+
+
+def _resolve_parent(doc: Any, tokens: List[str]) -> Tuple[Any, str]:
+    target = doc
+    for token in tokens[:-1]:
+        target = _child(target, token)
+    return target, tokens[-1]
+
+
+def _child(target: Any, token: str) -> Any:
+    try:
+        if isinstance(target, list):
+            return target[int(token)]
+        return target[token]
+    except (KeyError, IndexError, ValueError, TypeError):
+        raise PatchError(f"Path segment {token!r} does not exist")
+
+
+def _get(doc: Any, pointer: str) -> Any:
+    target = doc
+    for token in _parse_pointer(pointer):
+        target = _child(target, token)
+    return target
+
+
+def _add(doc: Any, pointer: str, value: Any) -> Any:
+    tokens = _parse_pointer(pointer)
+    if not tokens:
+        return value
+    parent, last = _resolve_parent(doc, tokens)
+    if isinstance(parent, list):
+        if last == "-":
+            parent.append(value)
+        else:
+            try:
+                index = int(last)
+            except ValueError:
+                raise PatchError(f"Invalid list index {last!r}")
+            if not 0 <= index <= len(parent):
+                raise PatchError(f"List index {index} out of range")
+            parent.insert(index, value)
+    elif isinstance(parent, dict):
+        parent[last] = value
+    else:
+        raise PatchError(f"Cannot add member to {type(parent).__name__}")
+    return doc
+
+
+def _remove(doc: Any, pointer: str) -> Any:
+    tokens = _parse_pointer(pointer)
+    if not tokens:
+        raise PatchError("Cannot remove the document root")
+    parent, last = _resolve_parent(doc, tokens)
+    _child(parent, last)  # raises if missing
+    if isinstance(parent, list):
+        del parent[int(last)]
+    else:
+        del parent[last]
+    return doc
+
+
+def validate_ops(ops: List[dict]) -> List[dict]:
+    """Reject malformed entries before they reach a store."""
+    if not isinstance(ops, list):
+        raise PatchError("Patch must be a list of operations")
+    for op in ops:
+        if not isinstance(op, dict) or ("op" not in op and "field" not in op):
+            raise PatchError(f"Unrecognised patch entry: {op!r}")
+        if "field" in op and "value" not in op:
+            raise PatchError(f"Field update for {op['field']!r} has no value")
+    return ops
+
+
+def _expand_field(doc: Any, op: dict) -> List[dict]:
+    """Turn a field-path update into JSON Patch ops, creating missing parent objects."""
+    parts = op["field"].split(".")
+    expanded = []
+    target = doc
+    for depth, part in enumerate(parts[:-1]):
+        if isinstance(target, dict) and part not in target:
+            pointer = "".join("/" + escape_pointer_token(p) for p in parts[:depth + 1])
+            expanded.append({"op": "add", "path": pointer, "value": {}})
+            target = {}
+        else:
+            target = _child(target, part)
+    expanded.append({"op": "add", "path": field_to_pointer(op["field"]), "value": op["value"]})
+    return expanded
+
+
+def apply_patch(doc: Any, ops: List[dict]) -> Tuple[Any, List[dict]]:
+    """Apply ops to a copy of doc.
+
+    Returns the new document and the equivalent list of plain JSON Patch
+    operations (field-path entries expanded), suitable for a change log.
+    The input document is left untouched.
+    """
+    doc = copy.deepcopy(doc)
+    applied = []
+    for entry in validate_ops(ops):
+        for op in _expand_field(doc, entry) if "op" not in entry else [entry]:
+            doc = _apply_op(doc, op)
+            applied.append(op)
+    return doc, applied
+
+
+def diff(old: Any, new: Any, path: str = "") -> List[dict]:
+    """JSON Patch ops that turn old into new.
+
+    Objects are compared member by member; any other changed value (lists
+    included) is replaced whole.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [{"op": "remove", "path": f"{path}/{escape_pointer_token(k)}"} for k in old if k not in new]
+        for key, value in new.items():
+            pointer = f"{path}/{escape_pointer_token(key)}"
+            if key in old:
+                ops += diff(old[key], value, pointer)
+            else:
+                ops.append({"op": "add", "path": pointer, "value": value})
+        return ops
+    if type(old) is type(new) and old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def _apply_op(doc: Any, op: dict) -> Any:
+    kind = op.get("op")
+    path = op.get("path")
+    if path is None:
+        raise PatchError(f"Operation {kind!r} has no path")
+    if kind == "add":
+        return _add(doc, path, copy.deepcopy(op["value"]))
+    if kind == "remove":
+        return _remove(doc, path)
+    if kind == "replace":
+        _get(doc, path)  # must exist
+        if path == "":
+            return copy.deepcopy(op["value"])
+        return _add(_remove(doc, path), path, copy.deepcopy(op["value"]))
+    if kind == "move":
+        value = _get(doc, op["from"])
+        return _add(_remove(doc, op["from"]), path, value)
+    if kind == "copy":
+        return _add(doc, path, copy.deepcopy(_get(doc, op["from"])))
+    if kind == "test":
+        if _get(doc, path) != op.get("value"):
+            raise PatchError(f"Test failed at {path!r}")
+        return doc
+    raise PatchError(f"Unsupported patch operation: {kind!r}")
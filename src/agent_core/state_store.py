@@ -0,0 +1,505 @@
+"""Pluggable key-value store for project state and documents.
+
+Values are JSON documents addressed by ``(namespace, key)``. Two backends:
+
+- ``MemoryStateStore``: process-local dict, for tests and single-worker runs.
+- ``SQLiteStateStore``: durable SQLite file in WAL mode, shared by every
+  worker process on the host. Reads use per-thread connections and a
+  process-local cache; writes go through one writer thread that commits
+  queued operations in batches (group commit). The cache is an LRU over
+  namespaces (one per project) holding at most ``STATE_CACHE_NAMESPACES``;
+  a cold project is paged out of memory and re-read from SQLite on demand.
+  A commit drops only the keys it wrote. Every batch also bumps a commit
+  counter, so a commit made by another process (the counter moved past the
+  last one this process saw or made) clears the whole cache.
+
+Every value carries a monotonically increasing version. Writes can be
+made conditional on the current version (optimistic concurrency), and each
+write appends its JSON Patch operations to a change log so consumers can
+fetch "changes since version N". A whole-value ``put`` logs the diff from
+the previous value, or just ``{"op": "replace", "path": ""}`` (re-read the
+value) when the diff would be no smaller than the value. Only the last
+``STATE_CHANGES_KEEP`` versions of each key are kept.
+
+Select with STATE_STORE=sqlite|memory; STATE_DB_PATH sets the SQLite file.
+"""
+
+import atexit
+import copy
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from agent_core.state_patch import apply_patch, diff, validate_ops
+
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", os.path.join(os.getcwd(), ".state", "project_state.sqlite3"))
+STATE_CACHE_NAMESPACES = int(os.getenv("STATE_CACHE_NAMESPACES", "64"))
+STATE_CHANGES_KEEP = int(os.getenv("STATE_CHANGES_KEEP", "1000"))
+
+Namespace = Tuple[str, ...]
+
+
+def _ns(namespace: Namespace) -> str:
+    return "/".join(namespace)
+
+
+class VersionConflictError(Exception):
+    """Raised when a conditional write's expected version is not the current one."""
+
+    def __init__(self, expected: int, current: int):
+        super().__init__(f"Version conflict: expected {expected}, current is {current}")
+        self.expected = expected
+        self.current = current
+
+
+def _check_version(expected: Optional[int], current: int) -> None:
+    if expected is not None and expected != current:
+        raise VersionConflictError(expected, current)
+
+
+def _put_ops(old: Optional[dict], new: dict, encoded: Optional[str] = None) -> List[dict]:
+    """Change log entry for a whole-value write: the diff, unless it is as big as the value."""
+    ops = diff(old, new)
+    if len(json.dumps(ops)) >= len(encoded if encoded is not None else json.dumps(new)):
+        return [{"op": "replace", "path": ""}]
+    return ops
+
+
+class StateStore:
+    """Interface shared by the state store backends."""
+
+    def get(self, namespace: Namespace, key: str) -> Optional[dict]:
+        return self.get_versioned(namespace, key)[0]
+
+    def get_versioned(self, namespace: Namespace, key: str) -> Tuple[Optional[dict], int]:
+        """Return (value, version); version is 0 for a key never written."""
+        raise NotImplementedError
+
+    def put(self, namespace: Namespace, key: str, value: dict, expected_version: Optional[int] = None) -> int:
+        """Replace the whole value; returns the new version."""
+        raise NotImplementedError
+
+    def patch(
+        self, namespace: Namespace, key: str, ops: List[dict], expected_version: Optional[int] = None
+    ) -> Tuple[dict, int]:
+        """Apply JSON Patch / field-path ops atomically; returns (new value, new version)."""
+        raise NotImplementedError
+
+    def changes_since(self, namespace: Namespace, key: str, version: int) -> List[dict]:
+        """Change log entries with version > the given one, oldest first.
+
+        A root replace without a value stands for a full rewrite; entries older
+        than the last STATE_CHANGES_KEEP versions have been pruned.
+        """
+        raise NotImplementedError
+
+    def delete(self, namespace: Namespace, key: str) -> None:
+        raise NotImplementedError
+
+    def list_keys(self, namespace: Namespace) -> List[str]:
+        raise NotImplementedError
+
+    def list_versions(self, namespace: Namespace) -> Dict[str, int]:
+        """{key: version} for every key in the namespace, without reading the values."""
+        raise NotImplementedError
+
+    def list_namespaces(self, prefix: Namespace = ()) -> List[Namespace]:
+        """Namespaces holding at least one key, optionally under a prefix."""
+        raise NotImplementedError
+
+    def cache_stats(self) -> dict:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryStateStore(StateStore):
+    def __init__(self, changes_keep: int = STATE_CHANGES_KEEP):
+        self.changes_keep = changes_keep
+        self._data: dict = {}  # (namespace, key) -> (value, version)
+        self._changes: dict = {}  # (namespace, key) -> [change, ...]
+        self._lock = threading.Lock()
+
+    def get_versioned(self, namespace: Namespace, key: str) -> Tuple[Optional[dict], int]:
+        with self._lock:
+            value, version = self._data.get((_ns(namespace), key), (None, 0))
+            return copy.deepcopy(value), version
+
+    def _write(self, cache_key: tuple, value: dict, ops: List[dict], expected_version: Optional[int]) -> int:
+        _, current = self._data.get(cache_key, (None, 0))
+        _check_version(expected_version, current)
+        version = current + 1
+        self._data[cache_key] = (value, version)
+        changes = self._changes.setdefault(cache_key, [])
+        changes.append({"version": version, "ops": ops, "ts": time.time()})
+        del changes[:-self.changes_keep]
+        return version
+
+    def put(self, namespace: Namespace, key: str, value: dict, expected_version: Optional[int] = None) -> int:
+        value = copy.deepcopy(value)
+        cache_key = (_ns(namespace), key)
+        with self._lock:
+            old, _ = self._data.get(cache_key, (None, 0))
+            ops = copy.deepcopy(_put_ops(old, value))
+            return self._write(cache_key, value, ops, expected_version)
+
+    def patch(
+        self, namespace: Namespace, key: str, ops: List[dict], expected_version: Optional[int] = None
+    ) -> Tuple[dict, int]:
+        cache_key = (_ns(namespace), key)
+        validate_ops(ops)
+        with self._lock:
+            current, version = self._data.get(cache_key, (None, 0))
+            _check_version(expected_version, version)
+            value, applied = apply_patch(current if current is not None else {}, ops)
+            version = self._write(cache_key, value, applied, None)
+            return copy.deepcopy(value), version
+
+    def changes_since(self, namespace: Namespace, key: str, version: int) -> List[dict]:
+        with self._lock:
+            changes = self._changes.get((_ns(namespace), key), [])
+            return copy.deepcopy([c for c in changes if c["version"] > version])
+
+    def delete(self, namespace: Namespace, key: str) -> None:
+        with self._lock:
+            self._data.pop((_ns(namespace), key), None)
+            self._changes.pop((_ns(namespace), key), None)
+
+    def list_keys(self, namespace: Namespace) -> List[str]:
+        ns = _ns(namespace)
+        with self._lock:
+            return sorted(k for n, k in self._data if n == ns)
+
+    def list_versions(self, namespace: Namespace) -> Dict[str, int]:
+        ns = _ns(namespace)
+        with self._lock:
+            return {k: version for (n, k), (_, version) in self._data.items() if n == ns}
+
+    def list_namespaces(self, prefix: Namespace = ()) -> List[Namespace]:
+        with self._lock:
+            namespaces = {tuple(n.split("/")) for n, _ in self._data}
+        return sorted(n for n in namespaces if n[:len(prefix)] == tuple(prefix))
+
+
+class SQLiteStateStore(StateStore):
+    """SQLite (WAL) backend with batched single-writer commits and a read cache."""
+
+    def __init__(
+        self,
+        path: str = STATE_DB_PATH,
+        batch_size: int = 64,
+        flush_interval: float = 0.002,
+        cache_namespaces: int = STATE_CACHE_NAMESPACES,
+        changes_keep: int = STATE_CHANGES_KEEP,
+    ):
+        self.path = path
+        self.changes_keep = changes_keep
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_namespaces = cache_namespaces
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._local = threading.local()
+        # namespace -> {key: (value, version)}, least recently used first
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._evictions = 0
+        # Bumped when a namespace's entries are invalidated (and the epoch when
+        # all are); a read that started under an older value may have loaded a
+        # superseded row. Kept per namespace so one busy project does not stop
+        # the others from caching
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        # Last commit counter seen or written by this process, and the one the
+        # writer thread is committing right now
+        self._commits = 0
+        self._pending_commits: Optional[int] = None
+
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " version INTEGER NOT NULL DEFAULT 0,"
+            " updated_at REAL NOT NULL DEFAULT (julianday('now')),"
+            " PRIMARY KEY (namespace, key))"
+        )
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(kv)")]
+        if "version" not in columns:
+            conn.execute("ALTER TABLE kv ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS changes ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " version INTEGER NOT NULL,"
+            " ops TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key, version))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('commits', 0)")
+        conn.commit()
+        self._commits = conn.execute("SELECT value FROM meta WHERE name = 'commits'").fetchone()[0]
+        conn.close()
+
+        self._writes: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="state-store-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _check_external_writes(self, conn: sqlite3.Connection) -> None:
+        # A connection's data_version changes when any other connection commits,
+        # this process's writer included; the commit counter tells them apart
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == getattr(self._local, "data_version", None):
+            return
+        self._local.data_version = data_version
+        commits = conn.execute("SELECT value FROM meta WHERE name = 'commits'").fetchone()[0]
+        with self._cache_lock:
+            if commits > self._commits and commits != self._pending_commits:
+                self._commits = commits
+                self._invalidate_all()
+
+    def _invalidate_all(self) -> None:
+        self._cache.clear()
+        self._generations.clear()
+        self._epoch += 1
+
+    def _generation(self, ns: str) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(ns, 0)
+
+    def get_versioned(self, namespace: Namespace, key: str) -> Tuple[Optional[dict], int]:
+        ns = _ns(namespace)
+        conn = self._reader()
+        self._check_external_writes(conn)
+        with self._cache_lock:
+            entries = self._cache.get(ns)
+            if entries is not None:
+                self._cache.move_to_end(ns)
+                entry = entries.get(key)
+                if entry is not None:
+                    value, version = entry
+                    return copy.deepcopy(value), version
+            generation = self._generation(ns)
+
+        row = conn.execute(
+            "SELECT value, version FROM kv WHERE namespace = ? AND key = ?", (ns, key)
+        ).fetchone()
+        value, version = (json.loads(row[0]), row[1]) if row else (None, 0)
+        with self._cache_lock:
+            # A row loaded before an invalidation may already be superseded
+            if generation == self._generation(ns):
+                self._cache_put(ns, key, value, version)
+        return copy.deepcopy(value), version
+
+    def _cache_put(self, ns: str, key: str, value: Optional[dict], version: int) -> None:
+        entries = self._cache.get(ns)
+        if entries is None:
+            entries = self._cache[ns] = {}
+            while len(self._cache) > self.cache_namespaces:
+                # Page out the coldest project; SQLite already holds its state
+                self._cache.popitem(last=False)
+                self._evictions += 1
+        self._cache.move_to_end(ns)
+        entries[key] = (value, version)
+
+    def cache_stats(self) -> dict:
+        with self._cache_lock:
+            return {
+                "namespaces": len(self._cache),
+                "max_namespaces": self.cache_namespaces,
+                "entries": sum(len(e) for e in self._cache.values()),
+                "evictions": self._evictions,
+            }
+
+    def list_keys(self, namespace: Namespace) -> List[str]:
+        rows = self._reader().execute(
+            "SELECT key FROM kv WHERE namespace = ? ORDER BY key", (_ns(namespace),)
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def list_versions(self, namespace: Namespace) -> Dict[str, int]:
+        rows = self._reader().execute(
+            "SELECT key, version FROM kv WHERE namespace = ?", (_ns(namespace),)
+        ).fetchall()
+        return dict(rows)
+
+    def list_namespaces(self, prefix: Namespace = ()) -> List[Namespace]:
+        pattern = _ns(prefix).replace("%", "\\%").replace("_", "\\_") + "/%" if prefix else "%"
+        rows = self._reader().execute(
+            "SELECT DISTINCT namespace FROM kv WHERE namespace LIKE ? ESCAPE '\\' ORDER BY namespace", (pattern,)
+        ).fetchall()
+        return [tuple(r[0].split("/")) for r in rows]
+
+    def changes_since(self, namespace: Namespace, key: str, version: int) -> List[dict]:
+        rows = self._reader().execute(
+            "SELECT version, ops, created_at FROM changes"
+            " WHERE namespace = ? AND key = ? AND version > ? ORDER BY version",
+            (_ns(namespace), key, version),
+        ).fetchall()
+        return [{"version": v, "ops": json.loads(ops), "ts": ts} for v, ops, ts in rows]
+
+    def put(self, namespace: Namespace, key: str, value: dict, expected_version: Optional[int] = None) -> int:
+        return self._write(("put", _ns(namespace), key, value, expected_version))[1]
+
+    def patch(
+        self, namespace: Namespace, key: str, ops: List[dict], expected_version: Optional[int] = None
+    ) -> Tuple[dict, int]:
+        return self._write(("patch", _ns(namespace), key, validate_ops(ops), expected_version))
+
+    def delete(self, namespace: Namespace, key: str) -> None:
+        self._write(("delete", _ns(namespace), key, None, None))
+
+    def _write(self, op: tuple):
+        """Queue a write for the writer thread and wait until its batch commits."""
+        future: Future = Future()
+        self._writes.put((op, future))
+        return future.result()
+
+    def _apply(self, conn: sqlite3.Connection, op: tuple):
+        kind, ns, key, payload, expected_version = op
+        if kind == "delete":
+            conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (ns, key))
+            conn.execute("DELETE FROM changes WHERE namespace = ? AND key = ?", (ns, key))
+            return None
+
+        row = conn.execute(
+            "SELECT value, version FROM kv WHERE namespace = ? AND key = ?", (ns, key)
+        ).fetchone()
+        current_version = row[1] if row else 0
+        _check_version(expected_version, current_version)
+
+        current = json.loads(row[0]) if row else None
+        if kind == "put":
+            value = payload
+            encoded = json.dumps(value)
+            ops = _put_ops(current, value, encoded)
+        else:
+            value, ops = apply_patch(current if current is not None else {}, payload)
+            encoded = json.dumps(value)
+
+        version = current_version + 1
+        conn.execute(
+            "INSERT INTO kv (namespace, key, value, version) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(namespace, key) DO UPDATE SET"
+            " value = excluded.value, version = excluded.version, updated_at = julianday('now')",
+            (ns, key, encoded, version),
+        )
+        conn.execute(
+            "INSERT INTO changes (namespace, key, version, ops, created_at) VALUES (?, ?, ?, ?, ?)",
+            (ns, key, version, json.dumps(ops), time.time()),
+        )
+        if version > self.changes_keep:
+            conn.execute(
+                "DELETE FROM changes WHERE namespace = ? AND key = ? AND version <= ?",
+                (ns, key, version - self.changes_keep),
+            )
+        return value, version
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        while True:
+            item = self._writes.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._writes.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._writes.put(None)
+                    break
+                batch.append(item)
+
+            # One transaction per batch; a failed operation (conflict, bad patch)
+            # is rolled back to its savepoint without affecting the others
+            results = []
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                commits = conn.execute("SELECT value FROM meta WHERE name = 'commits'").fetchone()[0]
+                for op, _ in batch:
+                    conn.execute("SAVEPOINT op")
+                    try:
+                        results.append((True, self._apply(conn, op)))
+                        conn.execute("RELEASE op")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO op")
+                        conn.execute("RELEASE op")
+                        results.append((False, e))
+                conn.execute("UPDATE meta SET value = ? WHERE name = 'commits'", (commits + 1,))
+                with self._cache_lock:
+                    # Readers that notice this commit before it is recorded below
+                    # must not mistake it for another process's
+                    self._pending_commits = commits + 1
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                with self._cache_lock:
+                    self._pending_commits = None
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._cache_lock:
+                if commits != self._commits:
+                    # Another process committed since this one last looked
+                    self._invalidate_all()
+                else:
+                    for (_, ns, key, _, _), _ in batch:
+                        self._cache.get(ns, {}).pop(key, None)
+                        self._generations[ns] = self._generations.get(ns, 0) + 1
+                self._commits = commits + 1
+                self._pending_commits = None
+            for (_, future), (ok, result) in zip(batch, results):
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(result)
+        conn.close()
+
+    def close(self) -> None:
+        self._writes.put(None)
+        self._writer.join(timeout=5)
+
+
+_store: Optional[StateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """Return the process-wide store selected by STATE_STORE (default: sqlite)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = os.getenv("STATE_STORE", "sqlite")
+            if backend == "memory":
+                _store = MemoryStateStore()
+            elif backend == "sqlite":
+                _store = SQLiteStateStore(STATE_DB_PATH)
+            else:
+                raise ValueError(f"Unknown STATE_STORE backend: {backend}")
+            atexit.register(_store.close)
+        return _store
@@ -0,0 +1,142 @@
+"""Incremental parsing of streamed Holistic AI Bedrock proxy responses.
+
+The proxy streams Anthropic message events (``message_start``,
+``content_block_start``, ``content_block_delta``, ...) either as
+Server-Sent Events or as newline-delimited JSON. ``StreamAccumulator`` turns
+those events into ``AIMessageChunk``s as they arrive and rebuilds the final
+non-streamed response shape so it can be cached like any other.
+"""
+
+import json
+from typing import Iterable, Iterator, List, Optional
+
+from langchain_core.messages import AIMessageChunk
+
+
+def is_event_stream(content_type: str) -> bool:
+    content_type = (content_type or "").lower()
+    return "text/event-stream" in content_type or "ndjson" in content_type or "jsonl" in content_type
+
+
+def parse_stream_line(line: str, pending: List[str]) -> Optional[dict]:
+    """Feed one line of SSE or NDJSON; return an event once one is complete.
+
+    SSE ``data:`` lines are buffered in ``pending`` until the blank line that
+    terminates the event. Bare JSON lines (NDJSON) are returned immediately.
+    """
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    line = line.rstrip("\r")
+
+    if not line:
+        if not pending:
+            return None
+        data = "\n".join(pending)
+        pending.clear()
+        return _decode(data)
+    if line.startswith(":") or line.startswith("event:") or line.startswith("id:") or line.startswith("retry:"):
+        return None
+    if line.startswith("data:"):
+        pending.append(line[5:].lstrip(" "))
+        return None
+    return _decode(line)
+
+
+def iter_stream_events(lines: Iterable) -> Iterator[dict]:
+    pending: List[str] = []
+    for line in lines:
+        event = parse_stream_line(line, pending)
+        if event is not None:
+            yield event
+    if pending:
+        event = _decode("\n".join(pending))
+        if event is not None:
+            yield event
+
+
+def _decode(data: str) -> Optional[dict]:
+    if not data or data == "[DONE]":
+        return None
+    try:
+        event = json.loads(data)
+    except json.JSONDecodeError:
+        return None
+    return event if isinstance(event, dict) else None
+
+
+class StreamAccumulator:
+    """Convert proxy stream events into message chunks and a final result dict."""
+
+    def __init__(self):
+        self._blocks: dict = {}
+        self._partial_json: dict = {}
+        self.usage: dict = {}
+        self.stop_reason: Optional[str] = None
+
+    def feed(self, event: dict) -> Optional[AIMessageChunk]:
+        """Apply one event; return the chunk to emit for it, if any."""
+        event_type = event.get("type")
+
+        if event_type == "message_start":
+            self.usage.update(event.get("message", {}).get("usage") or {})
+            return None
+
+        if event_type == "content_block_start":
+            index = event.get("index", len(self._blocks))
+            block = dict(event.get("content_block") or {})
+            self._blocks[index] = block
+            if block.get("type") == "tool_use":
+                self._partial_json[index] = ""
+                return AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[{
+                        "name": block.get("name", ""),
+                        "args": "",
+                        "id": block.get("id", ""),
+                        "index": index,
+                    }],
+                )
+            text = block.get("text", "")
+            return AIMessageChunk(content=text) if text else None
+
+        if event_type == "content_block_delta":
+            index = event.get("index", 0)
+            delta = event.get("delta") or {}
+            if delta.get("type") == "input_json_delta":
+                partial = delta.get("partial_json", "")
+                self._partial_json[index] = self._partial_json.get(index, "") + partial
+                return AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[{"name": None, "args": partial, "id": None, "index": index}],
+                )
+            text = delta.get("text", "")
+            block = self._blocks.setdefault(index, {"type": "text", "text": ""})
+            block["text"] = block.get("text", "") + text
+            return AIMessageChunk(content=text) if text else None
+
+        if event_type == "content_block_stop":
+            index = event.get("index", 0)
+            block = self._blocks.get(index)
+            if block is not None and block.get("type") == "tool_use":
+                raw = self._partial_json.pop(index, "")
+                try:
+                    block["input"] = json.loads(raw) if raw else block.get("input", {})
+                except json.JSONDecodeError:
+                    block["input"] = {}
+            return None
+
+        if event_type == "message_delta":
+            self.usage.update(event.get("usage") or {})
+            self.stop_reason = (event.get("delta") or {}).get("stop_reason", self.stop_reason)
+            return None
+
+        return None
+
+    def result(self) -> dict:
+        """The equivalent non-streamed response body."""
+        result = {"content": [self._blocks[i] for i in sorted(self._blocks)]}
+        if self.usage:
+            result["usage"] = self.usage
+        if self.stop_reason:
+            result["stop_reason"] = self.stop_reason
+        return result
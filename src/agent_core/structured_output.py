@@ -0,0 +1,186 @@
+"""JSON schema cleaning and local repair of structured model output.
+
+``clean_json_schema`` turns a Pydantic JSON schema into the plain form tool
+definitions expect: ``$ref``s are resolved against ``$defs`` (recursively,
+through ``items``, ``anyOf`` and nested properties) and Pydantic-only keys are
+dropped, so ``team_summary: List[UserTasks]`` keeps its full shape.
+
+``repair_args`` fixes the mistakes models make most often in tool arguments
+(nested objects or arrays sent as JSON strings, code-fenced JSON, trailing
+commas, the whole answer wrapped in one extra key) before validation, so a
+re-ask is only needed when the output is actually wrong.
+"""
+
+import json
+import re
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+# Keys kept when cleaning; everything else (title, $defs, discriminator...) is dropped
+SCHEMA_KEYS = (
+    "type", "description", "enum", "const", "format",
+    "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum",
+    "minLength", "maxLength", "pattern", "minItems", "maxItems",
+)
+
+_FENCE = re.compile(r"^\s*```(?:json)?\s*(.*?)\s*```\s*$", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def clean_json_schema(schema: Dict[str, Any], defs: Optional[Dict[str, Any]] = None, _seen: tuple = ()) -> dict:
+    """Recursively inline ``$ref``s and keep only standard JSON schema keys."""
+    if defs is None:
+        defs = schema.get("$defs", schema.get("definitions", {}))
+
+    ref = schema.get("$ref")
+    if ref:
+        name = ref.rsplit("/", 1)[-1]
+        if name in _seen or name not in defs:
+            # Self-referencing model: stop inlining at the cycle
+            return {"type": "object"}
+        resolved = clean_json_schema(defs[name], defs, _seen + (name,))
+        if "description" in schema:
+            resolved["description"] = schema["description"]
+        return resolved
+
+    cleaned = {key: schema[key] for key in SCHEMA_KEYS if key in schema}
+    if "properties" in schema:
+        cleaned["properties"] = {
+            key: clean_json_schema(value, defs, _seen) for key, value in schema["properties"].items()
+        }
+        cleaned.setdefault("type", "object")
+    if "required" in schema:
+        cleaned["required"] = list(schema["required"])
+    if "items" in schema:
+        cleaned["items"] = clean_json_schema(schema["items"], defs, _seen)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            cleaned[key] = [clean_json_schema(option, defs, _seen) for option in schema[key]]
+    if isinstance(schema.get("additionalProperties"), dict):
+        cleaned["additionalProperties"] = clean_json_schema(schema["additionalProperties"], defs, _seen)
+    elif "additionalProperties" in schema:
+        cleaned["additionalProperties"] = schema["additionalProperties"]
+    return cleaned
+
+
+def model_schema(schema: Type[BaseModel]) -> dict:
+    """Cleaned JSON schema for a Pydantic model."""
+    return clean_json_schema(schema.model_json_schema())
+
+
+def loads_lenient(text: str) -> Any:
+    """``json.loads`` that tolerates code fences, surrounding prose and trailing commas."""
+    text = text.strip()
+    match = _FENCE.match(text)
+    if match:
+        text = match.group(1)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if starts:
+        start = min(starts)
+        end = max(text.rfind("}"), text.rfind("]"))
+        if end > start:
+            text = text[start:end + 1]
+    return json.loads(_TRAILING_COMMA.sub(r"\1", text))
+
+
+def _types(schema: dict) -> set:
+    declared = schema.get("type")
+    types = set(declared) if isinstance(declared, list) else {declared} if declared else set()
+    for option in schema.get("anyOf", []) + schema.get("oneOf", []):
+        types |= _types(option)
+    return types
+
+
+def _object_schema(schema: dict) -> Optional[dict]:
+    if "properties" in schema:
+        return schema
+    for option in schema.get("anyOf", []) + schema.get("oneOf", []):
+        if "properties" in option:
+            return option
+    return None
+
+
+def _array_items(schema: dict) -> Optional[dict]:
+    if "items" in schema:
+        return schema["items"]
+    for option in schema.get("anyOf", []) + schema.get("oneOf", []):
+        if "items" in option:
+            return option["items"]
+    return None
+
+
+def repair_value(value: Any, schema: dict) -> Any:
+    """Coerce ``value`` towards ``schema`` where the intent is unambiguous."""
+    types = _types(schema)
+    if isinstance(value, str) and types & {"object", "array"} and "string" not in types:
+        try:
+            value = loads_lenient(value)
+        except (json.JSONDecodeError, ValueError):
+            return value
+
+    if isinstance(value, dict):
+        object_schema = _object_schema(schema)
+        if object_schema is not None:
+            return repair_args(value, object_schema)
+    elif isinstance(value, list):
+        items = _array_items(schema)
+        if items is not None:
+            return [repair_value(item, items) for item in value]
+        if "object" in types and len(value) == 1 and isinstance(value[0], dict):
+            return repair_value(value[0], schema)
+    return value
+
+
+def repair_args(args: Any, schema: dict) -> Any:
+    """Repair a tool-call argument object against its (cleaned) input schema."""
+    if isinstance(args, str):
+        try:
+            args = loads_lenient(args)
+        except (json.JSONDecodeError, ValueError):
+            return args
+    if not isinstance(args, dict):
+        return args
+    properties = schema.get("properties", {})
+    if not properties:
+        return args
+
+    # The whole answer wrapped in one unexpected key, e.g. {"ProjectOutputModel": {...}}
+    if len(args) == 1 and not set(args) & set(properties):
+        (inner,) = args.values()
+        if isinstance(inner, (dict, str)):
+            unwrapped = repair_args(inner, schema)
+            if isinstance(unwrapped, dict) and set(unwrapped) & set(properties):
+                return unwrapped
+
+    return {
+        key: repair_value(value, properties[key]) if key in properties else value
+        for key, value in args.items()
+    }
+
+
+def validation_feedback(error: ValidationError) -> str:
+    """Compact list of validation errors for a re-ask message."""
+    lines = []
+    for item in error.errors():
+        location = ".".join(str(part) for part in item["loc"]) or "(root)"
+        lines.append(f"- {location}: {item['msg']}")
+    return "The output did not match the schema:\n" + "\n".join(lines)
+
+
+def parse_structured(schema: Type[BaseModel], data: Any, json_schema: Optional[dict] = None) -> BaseModel:
+    """Repair ``data`` (dict or JSON text) locally and validate it against ``schema``.
+
+    Raises ``pydantic.ValidationError`` if it still does not validate, or
+    ``ValueError`` if text output is not JSON at all.
+    """
+    if isinstance(data, str):
+        try:
+            data = loads_lenient(data)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Failed to parse JSON from structured output: {e}") from e
+    return schema.model_validate(repair_args(data, json_schema or model_schema(schema)))
@@ -0,0 +1,330 @@
+"""Task dependency graph and critical-path scheduling (the spec's
+DependencyInferTool / GraphValidatorTool, with the checks done in code).
+
+Dependencies are stored in project_state as ``task_graph.dependencies``, a
+{task: [prerequisite, ...]} mapping; a task's own ``depends_on`` list is
+merged in. A task can start once all its prerequisites are finished.
+Durations are the remaining work: ``duration`` (or ``effort`` / hours) scaled
+by the fraction not yet done, so finished tasks take no time.
+
+``TaskGraph`` stores the graph as index lists in topological order. Building
+it is O(V + E) (Kahn's algorithm; a cycle is reported with its tasks) and so
+is the first schedule: ``head`` is each task's earliest start, ``tail`` the
+longest path from its start to the end of the project. Then
+
+    latest start = makespan - tail,  slack = makespan - head - tail
+
+and a task is critical when its slack is zero. ``set_duration`` updates one
+task and repairs head forwards and tail backwards from it, visiting only the
+tasks whose values actually change.
+
+``ScheduleMonitor`` keeps each project's graph, so a ``/progress-update``
+that changes one task's status or duration is an incremental update; any
+other change to project_state rebuilds the graph.
+"""
+
+import heapq
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from agent_core.allocation import state_tasks
+from agent_core.progress import parse_progress
+
+DURATION_FIELDS = ("duration", "effort", "estimated_hours", "hours")
+DEPENDENCY_FIELDS = ("depends_on", "dependencies", "after")
+
+_EPS = 1e-9
+
+
+def _names(value) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return []
+
+
+def task_dependencies(state: dict, tasks: Optional[List[dict]] = None) -> Dict[str, List[str]]:
+    """{task: prerequisites} from ``task_graph.dependencies`` and the tasks' own fields."""
+    if tasks is None:
+        tasks, _ = state_tasks(state)
+    graph = state.get("task_graph") or {}
+    stored = graph.get("dependencies", {}) if isinstance(graph, dict) else {}
+    dependencies = {}
+    for task in tasks:
+        name = str(task.get("name"))
+        prerequisites = list(_names(stored.get(name)))
+        for field in DEPENDENCY_FIELDS:
+            prerequisites += _names(task.get(field))
+        dependencies[name] = list(dict.fromkeys(p for p in prerequisites if p != name))
+    return dependencies
+
+
+def task_duration(task: dict) -> float:
+    """Remaining duration: the task's full duration times the fraction not done."""
+    duration = 1.0
+    for key in DURATION_FIELDS:
+        value = task.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0:
+            duration = float(value)
+            break
+    done = parse_progress(task) or 0.0
+    return duration * (1.0 - done)
+
+
+class TaskGraph:
+    """A dependency DAG with earliest/latest start times and per-task slack."""
+
+    def __init__(self, dependencies: Dict[str, List[str]], durations: Dict[str, float]):
+        self.names = list(dependencies)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        n = len(self.names)
+        self.missing: Dict[str, List[str]] = {}
+        self.preds: List[List[int]] = [[] for _ in range(n)]
+        self.succs: List[List[int]] = [[] for _ in range(n)]
+        for name, prerequisites in dependencies.items():
+            v = self.index[name]
+            for prerequisite in prerequisites:
+                u = self.index.get(prerequisite)
+                if u is None:
+                    self.missing.setdefault(name, []).append(prerequisite)
+                    continue
+                self.preds[v].append(u)
+                self.succs[u].append(v)
+        self.deps = {name: tuple(prerequisites) for name, prerequisites in dependencies.items()}
+        # Plain lists: the sweeps below index single elements, where numpy is slow
+        self.duration = [float(durations.get(name, 1.0)) for name in self.names]
+        self.order, self.cycle = self._topological_order()
+        self.position = [0] * n
+        for i, v in enumerate(self.order):
+            self.position[v] = i
+        self.head = [0.0] * n
+        self.tail = [0.0] * n
+        if self.cycle is None:
+            self._schedule()
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TaskGraph":
+        tasks, _ = state_tasks(state)
+        return cls(
+            task_dependencies(state, tasks),
+            {str(t.get("name")): task_duration(t) for t in tasks},
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def valid(self) -> bool:
+        return self.cycle is None
+
+    # Construction ------------------------------------------------------------
+
+    def _topological_order(self):
+        indegree = [len(p) for p in self.preds]
+        order = [v for v, d in enumerate(indegree) if d == 0]
+        for v in order:  # grows while iterating: Kahn's queue
+            for w in self.succs[v]:
+                indegree[w] -= 1
+                if indegree[w] == 0:
+                    order.append(w)
+        if len(order) == len(self.names):
+            return order, None
+        # Every task left over has a prerequisite that is also left over, so
+        # walking prerequisites from any of them must close a cycle
+        v = next(v for v, d in enumerate(indegree) if d > 0)
+        seen: Dict[int, int] = {}
+        path = []
+        while v not in seen:
+            seen[v] = len(path)
+            path.append(v)
+            v = next(u for u in self.preds[v] if indegree[u] > 0)
+        cycle = path[seen[v]:][::-1]
+        return order, [self.names[u] for u in cycle + cycle[:1]]
+
+    def _schedule(self) -> None:
+        head, tail, duration = self.head, self.tail, self.duration
+        for v in self.order:
+            head[v] = max([head[u] + duration[u] for u in self.preds[v]], default=0.0)
+        for v in reversed(self.order):
+            tail[v] = duration[v] + max([tail[w] for w in self.succs[v]], default=0.0)
+
+    # Incremental updates ------------------------------------------------------
+
+    def set_duration(self, name: str, duration: float) -> int:
+        """Change one task's duration; returns how many tasks had to be revisited."""
+        v = self.index[name]
+        if abs(self.duration[v] - duration) <= _EPS:
+            return 0
+        self.duration[v] = duration
+        if not self.valid:
+            return 0
+        return self._repair_head(v) + self._repair_tail(v)
+
+    def _repair_head(self, v: int) -> int:
+        # Successors in topological order; a task whose earliest start does not
+        # move stops the propagation along its branch
+        heap = [(self.position[w], w) for w in set(self.succs[v])]
+        heapq.heapify(heap)
+        queued = {w for _, w in heap}
+        visited = 0
+        while heap:
+            _, w = heapq.heappop(heap)
+            visited += 1
+            head = max((self.head[u] + self.duration[u] for u in self.preds[w]), default=0.0)
+            if abs(head - self.head[w]) <= _EPS:
+                continue
+            self.head[w] = head
+            for x in self.succs[w]:
+                if x not in queued:
+                    queued.add(x)
+                    heapq.heappush(heap, (self.position[x], x))
+        return visited
+
+    def _repair_tail(self, v: int) -> int:
+        heap = [(-self.position[v], v)]
+        queued = {v}
+        visited = 0
+        while heap:
+            _, w = heapq.heappop(heap)
+            visited += 1
+            tail = self.duration[w] + max((self.tail[x] for x in self.succs[w]), default=0.0)
+            if abs(tail - self.tail[w]) <= _EPS:
+                continue
+            self.tail[w] = tail
+            for u in self.preds[w]:
+                if u not in queued:
+                    queued.add(u)
+                    heapq.heappush(heap, (-self.position[u], u))
+        return visited
+
+    # Results ------------------------------------------------------------------
+
+    @property
+    def makespan(self) -> float:
+        return max(map(sum, zip(self.head, self.tail)), default=0.0) if self.valid else 0.0
+
+    def slack(self) -> np.ndarray:
+        return self.makespan - np.asarray(self.head) - np.asarray(self.tail)
+
+    def critical_path(self) -> List[str]:
+        """One longest chain of zero-slack tasks from a start task to an end task."""
+        if not len(self) or not self.valid:
+            return []
+        slack = self.slack()
+        critical = slack <= _EPS * max(1.0, self.makespan)
+        v = next((v for v in self.order if critical[v] and self.head[v] <= _EPS), None)
+        path = []
+        while v is not None:
+            path.append(self.names[v])
+            finish = self.head[v] + self.duration[v]
+            v = next(
+                (w for w in self.succs[v] if critical[w] and abs(self.head[w] - finish) <= _EPS * max(1.0, finish)),
+                None,
+            )
+        return path
+
+    def schedule(self, limit: Optional[int] = None) -> List[dict]:
+        """Per-task start windows and slack, least slack first."""
+        if not self.valid:
+            return []
+        slack = self.slack()
+        makespan = self.makespan
+        ranked = np.lexsort((np.asarray(self.head), slack))
+        if limit:
+            ranked = ranked[:limit]
+        return [
+            {
+                "task": self.names[v],
+                "duration": round(float(self.duration[v]), 3),
+                "earliest_start": round(float(self.head[v]), 3),
+                "latest_start": round(makespan - float(self.tail[v]), 3),
+                "slack": round(float(slack[v]), 3),
+                "critical": bool(slack[v] <= _EPS * max(1.0, makespan)),
+            }
+            for v in ranked
+        ]
+
+    def report(self, limit: Optional[int] = None) -> dict:
+        if not self.valid:
+            return {"valid": False, "cycle": self.cycle, "missing": self.missing, "tasks": len(self)}
+        return {
+            "valid": True,
+            "tasks": len(self),
+            "missing": self.missing,
+            "makespan": round(self.makespan, 3),
+            "critical_path": self.critical_path(),
+            "schedule": self.schedule(limit),
+        }
+
+
+class ScheduleMonitor:
+    """Per-project task graphs kept up to date incrementally where possible."""
+
+    def __init__(self):
+        self._graphs: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        project_id: str,
+        state: dict,
+        version: int,
+        changed_tasks: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+    ) -> dict:
+        """The project's schedule at ``version``.
+
+        ``changed_tasks`` names the tasks written since the previous observed
+        version; when only their status or duration changed, just those
+        durations are updated and the schedule repaired around them.
+        """
+        tasks, _ = state_tasks(state)
+        with self._lock:
+            previous_version, graph = self._graphs.get(project_id, (None, None))
+            changed = None
+            if graph is not None and previous_version == version:
+                changed = []
+            elif graph is not None and changed_tasks is not None and previous_version == version - 1:
+                changed = self._changed_durations(graph, state, tasks, changed_tasks)
+
+            if changed is None:
+                graph = TaskGraph(
+                    task_dependencies(state, tasks),
+                    {str(t.get("name")): task_duration(t) for t in tasks},
+                )
+                visited = len(graph)
+            else:
+                visited = sum(graph.set_duration(name, duration) for name, duration in changed)
+            if previous_version is None or version >= previous_version:
+                self._graphs[project_id] = (version, graph)
+            report = graph.report(limit)
+
+        report.update({"version": version, "evaluated": visited, "incremental": changed is not None})
+        return report
+
+    @staticmethod
+    def _changed_durations(graph: TaskGraph, state: dict, tasks: List[dict], changed_tasks: Iterable[str]):
+        """(name, duration) updates for changed_tasks, or None if the graph itself changed."""
+        if len(tasks) != len(graph):
+            return None
+        by_name = {str(t.get("name")): t for t in tasks}
+        updates = []
+        for name in set(changed_tasks):
+            task = by_name.get(name)
+            if task is None or name not in graph.index:
+                return None
+            if tuple(task_dependencies(state, [task])[name]) != graph.deps[name]:
+                return None
+            updates.append((name, task_duration(task)))
+        return updates
+
+    def forget(self, project_id: str) -> None:
+        with self._lock:
+            self._graphs.pop(project_id, None)
+
+
+# Shared by the API routes and the task_slack tool
+monitor = ScheduleMonitor()
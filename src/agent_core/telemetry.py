@@ -0,0 +1,318 @@
+"""Tracing spans, local span exporters and Prometheus-format metrics.
+
+Spans wrap the hot paths (LLM calls, tool invocations, document loaders,
+embedding batches, HTTP handlers). Each finished span is handed to the
+configured exporters and recorded in the ``span_duration_seconds`` histogram,
+so ``/metrics`` shows where time goes without any external collector.
+
+Exporters are chosen with ``TRACE_EXPORTERS`` (comma separated):
+``ring`` (default, in-memory ring buffer of ``TRACE_RING_SIZE`` spans),
+``jsonl`` (append to ``TRACE_FILE``) or ``none``. Custom exporters are any
+object with an ``export(span_dict)`` method passed to ``add_exporter``.
+"""
+
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(".cache", "traces.jsonl"))
+TRACE_RING_SIZE = int(os.getenv("TRACE_RING_SIZE", "2000"))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+# Metrics ---------------------------------------------------------------------
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._values: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {state[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {state[-2]}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, key)} {state[-1]}")
+        return lines
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time (queue depths, pool sizes)."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name, self.help, self.read = name, help, read
+
+    def render(self) -> List[str]:
+        try:
+            value = float(self.read())
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_add(self, name: str, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_add(name, lambda: Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_add(name, lambda: Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> Gauge:
+        with self._lock:
+            gauge = self._metrics[name] = Gauge(name, help, read)
+            return gauge
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+span_duration = metrics.histogram(
+    "span_duration_seconds", "Duration of traced operations", ("span",)
+)
+span_errors = metrics.counter("span_errors_total", "Traced operations that raised", ("span",))
+
+
+# Exporters -------------------------------------------------------------------
+
+class RingBufferExporter:
+    """Keeps the most recent spans in memory."""
+
+    def __init__(self, size: int = TRACE_RING_SIZE):
+        self._spans: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def export(self, span: dict) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, limit: Optional[int] = None, name: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            spans = [s for s in self._spans if name is None or s["name"] == name]
+        return spans[-limit:] if limit else spans
+
+
+class JsonlExporter:
+    """Appends one JSON line per span to a local file."""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, span: dict) -> None:
+        line = json.dumps(span, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+_exporters: List[Any] = []
+_exporters_lock = threading.Lock()
+
+
+def _default_exporters() -> List[Any]:
+    exporters = []
+    for kind in os.getenv("TRACE_EXPORTERS", "ring").split(","):
+        kind = kind.strip()
+        if kind == "ring":
+            exporters.append(RingBufferExporter())
+        elif kind == "jsonl":
+            exporters.append(JsonlExporter())
+    return exporters
+
+
+_exporters.extend(_default_exporters())
+
+
+def add_exporter(exporter: Any) -> None:
+    with _exporters_lock:
+        _exporters.append(exporter)
+
+
+def set_exporters(exporters: List[Any]) -> None:
+    with _exporters_lock:
+        _exporters[:] = exporters
+
+
+def ring_buffer() -> Optional[RingBufferExporter]:
+    """The first configured ring-buffer exporter, if any."""
+    with _exporters_lock:
+        return next((e for e in _exporters if isinstance(e, RingBufferExporter)), None)
+
+
+# Spans -----------------------------------------------------------------------
+
+class Span:
+    def __init__(self, name: str, attributes: Optional[dict] = None, parent: Optional["Span"] = None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+            span_errors.inc(span=self.name)
+        span_duration.observe(self.duration, span=self.name)
+        record = self.to_dict()
+        with _exporters_lock:
+            exporters = list(_exporters)
+        for exporter in exporters:
+            try:
+                exporter.export(record)
+            except Exception:
+                pass
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": None if self.duration is None else self.duration * 1000,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def start_span(name: str, **attributes: Any) -> Span:
+    """A span that is not made current; call ``end()`` yourself (generators, callbacks)."""
+    return Span(name, attributes, _current_span.get())
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """Trace the enclosed block; nested spans become its children."""
+    current = start_span(name, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def traced(name: Optional[str] = None, **attributes: Any) -> Callable:
+    """Decorator form of ``span`` for sync and async functions."""
+
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def trace_tools(*tools: Any) -> None:
+    """Wrap each LangChain tool's function in a ``tool.<name>`` span."""
+    for t in tools:
+        if getattr(t, "func", None) is not None:
+            t.func = traced(f"tool.{t.name}")(t.func)
+        if getattr(t, "coroutine", None) is not None:
+            t.coroutine = traced(f"tool.{t.name}")(t.coroutine)
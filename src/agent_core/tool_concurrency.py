@@ -0,0 +1,231 @@
+"""Concurrent execution of the tool calls in one model turn.
+
+The agent graph dispatches every tool call of a turn as its own branch, and
+the branches run concurrently. ``ToolConcurrencyMiddleware`` makes that safe:
+
+- tools declared with ``parallel_safe(...)`` run freely, bounded by an
+  optional per-tool limit (e.g. document parsing by the ingest worker count);
+- every other tool (``set_state``, ``patch_state``, ``ask_user``...) is
+  sequenced: within a turn it waits until the sequenced calls *before* it in
+  the model's ``tool_calls`` order have finished, so state writes apply in the
+  order the model issued them regardless of thread scheduling;
+- a parallel-safe call joins the sequence when the turn also holds a call that
+  writes what it reads (or reads what it writes), per the ``reads``/``writes``
+  resources declared with ``parallel_safe``. Undeclared tools count as writing
+  everything, so ``get_state`` after ``set_state`` in one turn sees the write.
+
+A multi-file intake turn therefore takes max(tool time) instead of the sum.
+Turn bookkeeping is dropped when the last sequenced call finishes, or at the
+next model call (or the end of the run) for calls that never ran.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import AIMessage
+
+logger = logging.getLogger(__name__)
+
+PARALLEL_SAFE = "parallel_safe"
+MAX_CONCURRENCY = "max_concurrency"
+READS = "reads"
+WRITES = "writes"
+ALL_RESOURCES = "*"
+
+DEFAULT_TOOL_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "8"))
+ORDER_TIMEOUT_SECONDS = float(os.getenv("TOOL_ORDER_TIMEOUT", "120"))
+
+
+def parallel_safe(
+    *tools: Any,
+    max_concurrency: Optional[int] = None,
+    reads: Iterable[str] = (),
+    writes: Iterable[str] = (),
+) -> None:
+    """Declare tools safe to run concurrently with other calls of the same turn.
+
+    ``reads`` / ``writes`` name the shared resources (e.g. "state",
+    "documents") the tools touch; calls that conflict on one run in order.
+    """
+    for t in tools:
+        t.metadata = {**(t.metadata or {}), PARALLEL_SAFE: True, READS: tuple(reads), WRITES: tuple(writes)}
+        if max_concurrency is not None:
+            t.metadata[MAX_CONCURRENCY] = max_concurrency
+
+
+def is_parallel_safe(tool: Any) -> bool:
+    return bool(tool is not None and (tool.metadata or {}).get(PARALLEL_SAFE))
+
+
+def _resources(tool: Any) -> Tuple[Set[str], Set[str]]:
+    """(reads, writes) of a tool; undeclared tools write every resource."""
+    if not is_parallel_safe(tool):
+        return set(), {ALL_RESOURCES}
+    return set(tool.metadata.get(READS, ())), set(tool.metadata.get(WRITES, ()))
+
+
+def _conflicts(reads: Set[str], writes: Set[str], other_reads: Set[str], other_writes: Set[str]) -> bool:
+    if ALL_RESOURCES in other_writes:
+        return bool(reads or writes)
+    return bool(reads & other_writes or writes & other_reads)
+
+
+class _Turn:
+    """Completion events for the sequenced calls of one AI message."""
+
+    def __init__(self, call_ids: List[str], make_event: Callable[[], Any]):
+        self.call_ids = call_ids
+        self.events = {call_id: make_event() for call_id in call_ids}
+        self.remaining = len(call_ids)
+
+    def predecessors(self, call_id: str) -> list:
+        return [self.events[c] for c in self.call_ids[:self.call_ids.index(call_id)]]
+
+
+class ToolConcurrencyMiddleware(AgentMiddleware):
+    """Per-tool concurrency limits and deterministic ordering of unsafe tools."""
+
+    def __init__(
+        self,
+        default_limit: int = DEFAULT_TOOL_CONCURRENCY,
+        order_timeout: float = ORDER_TIMEOUT_SECONDS,
+    ):
+        super().__init__()
+        self.default_limit = default_limit
+        self.order_timeout = order_timeout
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._async_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._turns: Dict[str, _Turn] = {}
+
+    def _limit(self, tool: Any) -> int:
+        return (tool.metadata or {}).get(MAX_CONCURRENCY) or self.default_limit
+
+    def _sequenced_ids(self, request: Any) -> List[str]:
+        """Ids of the calls that must run in order in the AI message that issued this call.
+
+        Unsafe calls are always in the list; parallel-safe ones only when they
+        conflict with another call of the turn.
+        """
+        call_id = request.tool_call["id"]
+        messages = request.state.get("messages", []) if isinstance(request.state, dict) else []
+        tools = {t.name: t for t in (request.runtime.tools if request.runtime else [])}
+        for message in reversed(messages):
+            if isinstance(message, AIMessage) and any(c["id"] == call_id for c in message.tool_calls):
+                calls = [(c["id"], *_resources(tools.get(c["name"]))) for c in message.tool_calls]
+                sequenced = []
+                for i, (cid, reads, writes) in enumerate(calls):
+                    others = calls[:i] + calls[i + 1:]
+                    other_reads = set().union(*(r for _, r, _ in others))
+                    other_writes = set().union(*(w for _, _, w in others))
+                    if ALL_RESOURCES in writes or _conflicts(reads, writes, other_reads, other_writes):
+                        sequenced.append(cid)
+                return sequenced
+        return [] if is_parallel_safe(request.tool) else [call_id]
+
+    def _enter_turn(self, call_ids: List[str], make_event: Callable[[], Any]) -> _Turn:
+        key = "|".join(call_ids)
+        with self._lock:
+            turn = self._turns.get(key)
+            if turn is None:
+                turn = self._turns[key] = _Turn(call_ids, make_event)
+            return turn
+
+    def _exit_turn(self, turn: _Turn, call_id: str) -> None:
+        turn.events[call_id].set()
+        with self._lock:
+            turn.remaining -= 1
+            if turn.remaining == 0:
+                self._turns = {k: v for k, v in self._turns.items() if v is not turn}
+
+    def _end_turns(self, state: Any) -> None:
+        """Forget turns of this conversation whose remaining calls will never run."""
+        if not self._turns or not isinstance(state, dict):
+            return
+        ended = {c["id"] for m in state.get("messages", []) if isinstance(m, AIMessage) for c in m.tool_calls}
+        with self._lock:
+            self._turns = {k: v for k, v in self._turns.items() if ended.isdisjoint(v.call_ids)}
+
+    # A model call (or the end of the run) means every earlier turn is over
+
+    def before_model(self, state: Any, runtime: Any) -> None:
+        self._end_turns(state)
+
+    async def abefore_model(self, state: Any, runtime: Any) -> None:
+        self._end_turns(state)
+
+    def after_agent(self, state: Any, runtime: Any) -> None:
+        self._end_turns(state)
+
+    async def aafter_agent(self, state: Any, runtime: Any) -> None:
+        self._end_turns(state)
+
+    # Sync ----------------------------------------------------------------
+
+    def _semaphore(self, tool: Any) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(tool.name)
+            if semaphore is None:
+                semaphore = self._semaphores[tool.name] = threading.BoundedSemaphore(self._limit(tool))
+            return semaphore
+
+    def wrap_tool_call(self, request: Any, handler: Callable[[Any], Any]) -> Any:
+        if request.tool is None:
+            return handler(request)
+        call_id = request.tool_call["id"]
+        call_ids = self._sequenced_ids(request)
+        limit = self._semaphore(request.tool) if is_parallel_safe(request.tool) else nullcontext()
+        if call_id not in call_ids:
+            with limit:
+                return handler(request)
+
+        turn = self._enter_turn(call_ids, threading.Event)
+        try:
+            for event in turn.predecessors(call_id):
+                if not event.wait(self.order_timeout):
+                    logger.warning("Tool call %s ran before an earlier call of its turn finished", call_id)
+                    break
+            with limit:
+                return handler(request)
+        finally:
+            self._exit_turn(turn, call_id)
+
+    # Async ---------------------------------------------------------------
+
+    def _async_semaphore(self, tool: Any) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            per_loop = self._async_semaphores.setdefault(loop, {})
+            semaphore = per_loop.get(tool.name)
+            if semaphore is None:
+                semaphore = per_loop[tool.name] = asyncio.Semaphore(self._limit(tool))
+            return semaphore
+
+    async def awrap_tool_call(self, request: Any, handler: Callable[[Any], Awaitable[Any]]) -> Any:
+        if request.tool is None:
+            return await handler(request)
+        call_id = request.tool_call["id"]
+        call_ids = self._sequenced_ids(request)
+        limit = self._async_semaphore(request.tool) if is_parallel_safe(request.tool) else nullcontext()
+        if call_id not in call_ids:
+            async with limit:
+                return await handler(request)
+
+        turn = self._enter_turn(call_ids, asyncio.Event)
+        try:
+            for event in turn.predecessors(call_id):
+                try:
+                    await asyncio.wait_for(event.wait(), self.order_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning("Tool call %s ran before an earlier call of its turn finished", call_id)
+                    break
+            async with limit:
+                return await handler(request)
+        finally:
+            self._exit_turn(turn, call_id)
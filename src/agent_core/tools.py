@@ -1,71 +1,258 @@
 import os
+import threading
 from langchain_core.tools import tool
-from langgraph.store.memory import InMemoryStore
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    UnstructuredFileLoader,
-    JSONLoader,
-    CSVLoader,
-    Docx2txtLoader,
-    TextLoader,
-)
-from langchain_huggingface import HuggingFaceEmbeddings
+from agent_core.allocation import AllocationError, allocate, fairness_of_state
+from agent_core.context_compaction import references as context_references
+from agent_core.embedding_cache import cached_embed
+from agent_core.embedding_worker import get_embedding_worker
+from agent_core.ingest import INGEST_WORKERS, get_loader_for_file, ingest_files, parse_document
+from agent_core.parse_cache import get_parse_cache
+from agent_core.progress import monitor as progress_monitor
+from agent_core.projects import DEFAULT_PROJECT_ID, current_project_id, project_namespace
+from agent_core.similarity import rank_state
+from agent_core.state_patch import PatchError, escape_pointer_token
+from agent_core.state_store import VersionConflictError, get_state_store
+from agent_core.task_graph import TaskGraph, monitor as schedule_monitor
+from agent_core.telemetry import trace_tools
+from agent_core.tool_concurrency import parallel_safe
+from agent_core.vector_index import VectorIndex, chunk_text
 
 UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", os.path.join(os.getcwd(), "src/uploads"))
 
-emb = HuggingFaceEmbeddings(model_name="sentence-transformers/all-mpnet-base-v2")
+def project_upload_folder(project_id: str = None) -> str:
+    """Uploads of the default project stay at the top level; others get a subfolder."""
+    project_id = project_id or current_project_id()
+    if project_id == DEFAULT_PROJECT_ID:
+        return UPLOAD_FOLDER
+    return os.path.join(UPLOAD_FOLDER, "projects", project_id)
 
 def embed(texts: list[str]) -> list[list[float]]:
-    return emb.embed_documents(texts)
-
-store = InMemoryStore(index={"embed": embed, "dims": 2})
-namespace = ("project", "supervisor")
+    return cached_embed(texts).astype("float32").tolist()
+
+# Documents are retrieved through the chunk index below; the store only holds values.
+# Every store key lives in the active project's namespace (see agent_core.projects)
+store = get_state_store()
+document_index = VectorIndex()
+
+def index_document(file_name: str, content: str, sha256: str = None, project_id: str = None) -> int:
+    """Chunk, embed and index a document once per content version; returns its chunk count."""
+    project_id = project_id or current_project_id()
+    if sha256:
+        indexed = document_index.count({"project_id": project_id, "file_name": file_name, "sha256": sha256})
+        if indexed:
+            return indexed
+    document_index.delete({"project_id": project_id, "file_name": file_name})
+    chunks = chunk_text(content)
+    if not chunks:
+        return 0
+    vectors = cached_embed(chunks)
+    document_index.add(
+        [f"{project_id}/{file_name}#{i}" for i in range(len(chunks))],
+        vectors,
+        [
+            {"project_id": project_id, "file_name": file_name, "sha256": sha256, "chunk": i, "text": chunk}
+            for i, chunk in enumerate(chunks)
+        ],
+    )
+    return len(chunks)
+
+STATE_KEY = "project_state"
+
+def get_state_versioned(project_id: str = None) -> tuple[dict, int]:
+    state, version = store.get_versioned(project_namespace(project_id), STATE_KEY)
+    return state or {}, version
+
+def patch_state_ops(ops: list[dict], expected_version: int = None, project_id: str = None) -> tuple[dict, int]:
+    """Apply JSON Patch / field-path ops to project_state; raises on conflict or bad paths."""
+    return store.patch(project_namespace(project_id), STATE_KEY, ops, expected_version=expected_version)
+
+def state_changes_since(version: int, project_id: str = None) -> list[dict]:
+    return store.changes_since(project_namespace(project_id), STATE_KEY, version)
+
+# The chunk index lives in process memory. Per project, remember which stored
+# document versions this process has indexed, so documents loaded before a
+# restart or by another worker are indexed on the next search (their chunk
+# vectors come from the embedding cache, so nothing is re-encoded)
+_indexed_versions: dict[str, dict[str, int]] = {}
+_index_sync_locks: dict[str, threading.Lock] = {}
+
+def sync_document_index(project_id: str = None) -> int:
+    """Index stored documents that are new or changed since this process last looked; returns how many."""
+    project_id = project_id or current_project_id()
+    namespace = project_namespace(project_id)
+    with _index_sync_locks.setdefault(project_id, threading.Lock()):
+        versions = store.list_versions(namespace)
+        seen = _indexed_versions.setdefault(project_id, {})
+        for file_name in [f for f in seen if f not in versions]:
+            document_index.delete({"project_id": project_id, "file_name": file_name})
+            del seen[file_name]
+        indexed = 0
+        for file_name, version in versions.items():
+            if file_name == STATE_KEY or seen.get(file_name) == version:
+                continue
+            value = store.get(namespace, file_name)
+            if isinstance(value, dict) and isinstance(value.get("content"), str):
+                sha256 = (value.get("metadata") or {}).get("sha256")
+                index_document(file_name, value["content"], sha256, project_id)
+                indexed += 1
+            seen[file_name] = version
+        return indexed
+
+def list_projects() -> list[str]:
+    return [ns[1] for ns in store.list_namespaces(("project",)) if len(ns) == 2]
 
 @tool
 def get_state() -> dict:
     """Load the current project state from memory."""
-    state = store.get(namespace, "project_state")
+    state = store.get(project_namespace(), STATE_KEY)
     return state or {}
 
 @tool
 def set_state(state: dict) -> str:
     """Persist the project state."""
-    store.put(namespace, "project_state", state)
+    store.put(project_namespace(), STATE_KEY, state)
     return "STATE_UPDATED"
 
 @tool
-def list_uploaded_files() -> list[str]:
-    """Return list of uploaded files available for processing."""
+def patch_state(ops: list[dict]) -> dict:
+    """
+    Update part of the project state without resending all of it.
+    ops is a list of JSON Patch operations ({"op": "replace", "path": "/tasks/intro/status", "value": "done"})
+    or field updates ({"field": "tasks.intro.status", "value": "done"}).
+    Prefer this over set_state for small changes.
+    """
     try:
-        files = [
-            os.path.join(UPLOAD_FOLDER, f)
-            for f in os.listdir(UPLOAD_FOLDER)
-            if os.path.isfile(os.path.join(UPLOAD_FOLDER, f))
-        ]
-        return files
-    except Exception as e:
-        return [f"ERROR: {str(e)}"]
-
-def get_loader_for_file(file_path: str):
-    ext = os.path.splitext(file_path)[1].lower()
+        _, version = patch_state_ops(ops)
+        return {"status": "STATE_UPDATED", "version": version}
+    except (PatchError, VersionConflictError) as e:
+        return {"status": "ERROR", "message": str(e)}
 
-    if ext == ".pdf":
-        return PyPDFLoader(file_path)
+@tool
+def allocate_tasks(
+    skill_weight: float = 1.0,
+    preference_weight: float = 1.0,
+    deadline_weight: float = 0.5,
+    fairness_tolerance: float = 0.25,
+) -> dict:
+    """
+    Assign every task in project_state to a team member and save the plan.
+    Uses the tasks (skills, effort, deadline) and users (skills, preferences,
+    capacity) already in project_state, so persist those first. Writes
+    assigned_to on each task and the full plan under assignment_plan.
+    Weights trade off skill fit, stated preferences and deadline urgency;
+    fairness_tolerance is how far above the mean workload anyone may go.
+    """
+    try:
+        state, version = get_state_versioned()
+        plan = allocate(state, skill_weight, preference_weight, deadline_weight, fairness_tolerance)
+        tasks_key = plan.pop("tasks_key")
+        task_assignments = plan.pop("task_assignments")
+        tasks = state[tasks_key]
+        keys = list(tasks) if isinstance(tasks, dict) else None
+        ops = [{"op": "add", "path": "/assignment_plan", "value": plan}]
+        for index, user in task_assignments:
+            token = escape_pointer_token(keys[index]) if keys else str(index)
+            task = tasks[keys[index]] if keys else tasks[index]
+            if isinstance(task, dict):
+                ops.append({"op": "add", "path": f"/{tasks_key}/{token}/assigned_to", "value": user})
+        _, version = patch_state_ops(ops, expected_version=version)
+    except (AllocationError, PatchError, VersionConflictError) as e:
+        return {"status": "ERROR", "message": str(e)}
+    return {
+        "status": "STATE_UPDATED",
+        "version": version,
+        "assignments": plan["assignments"],
+        "loads": plan["loads"],
+        "fairness": plan["fairness"],
+    }
 
-    if ext in [".txt", ".md"]:
-        return TextLoader(file_path)
+@tool
+def check_fairness(tolerance: float = 0.25) -> dict:
+    """
+    Report workload balance of the current task assignments (assigned_to) in
+    project_state: per-user load and task count, whether anyone is above the
+    fairness limit, and which tasks are unassigned.
+    """
+    try:
+        return fairness_of_state(get_state_versioned()[0], tolerance)
+    except AllocationError as e:
+        return {"status": "ERROR", "message": str(e)}
 
-    if ext in [".doc", ".docx"]:
-        return Docx2txtLoader(file_path)
+@tool
+def check_progress() -> dict:
+    """
+    Compare actual vs expected progress of every task in project_state.
+    Returns the deviating tasks (blocked, overdue, behind schedule or at risk)
+    with their actual and expected completion and days left.
+    """
+    state, version = get_state_versioned()
+    report = progress_monitor.observe(current_project_id(), state, version)
+    return {"version": version, "deviations": report["deviations"]}
 
-    if ext == ".json":
-        return JSONLoader(file_path)
+@tool
+def set_task_dependencies(dependencies: dict[str, list[str]]) -> dict:
+    """
+    Save the task dependency graph: {task: [tasks that must finish before it
+    starts]}, replacing any saved before. Every name must be a task in
+    project_state. Rejected without saving if the dependencies form a cycle.
+    """
+    try:
+        state, version = get_state_versioned()
+        graph = TaskGraph.from_state({**state, "task_graph": {"dependencies": dependencies}})
+        if not graph.valid:
+            return {"status": "ERROR", "message": "Dependencies form a cycle", "cycle": graph.cycle}
+        unknown = sorted(set(dependencies) - set(graph.index))
+        if unknown or graph.missing:
+            return {"status": "ERROR", "message": "Unknown tasks", "unknown": unknown, "missing": graph.missing}
+        ops = [{"op": "add", "path": "/task_graph", "value": {"dependencies": dependencies}}]
+        _, version = patch_state_ops(ops, expected_version=version)
+    except (PatchError, VersionConflictError) as e:
+        return {"status": "ERROR", "message": str(e)}
+    return {"status": "STATE_UPDATED", "version": version, "critical_path": graph.critical_path()}
 
-    if ext == ".csv":
-        return CSVLoader(file_path)
+@tool
+def task_slack(limit: int = 20) -> dict:
+    """
+    Schedule the tasks in project_state by their dependencies and remaining
+    duration. Returns the critical path, the project length and, least slack
+    first, each task's earliest and latest start and its slack (how long it
+    can slip without delaying the project). limit=0 lists every task.
+    """
+    state, version = get_state_versioned()
+    return schedule_monitor.observe(current_project_id(), state, version, limit=limit or None)
 
-    return UnstructuredFileLoader(file_path)
+@tool
+def rank_tasks_for_users(top_k: int = 5) -> dict:
+    """
+    Rank the tasks in project_state for each user by how well the task text
+    matches the user's CV / profile and skills (embedding cosine similarity).
+    Saves the ranked task names as ai_rankings, which allocate_tasks uses as
+    preferences when a user has not stated any.
+    """
+    try:
+        state, version = get_state_versioned()
+        ranked = rank_state(state, top_k=top_k or None)
+        if not ranked:
+            return {"status": "ERROR", "message": "project_state needs tasks and users to rank"}
+        rankings = {user: [hit["task"] for hit in hits] for user, hits in ranked.items()}
+        _, version = patch_state_ops([{"op": "add", "path": "/ai_rankings", "value": rankings}], expected_version=version)
+    except (PatchError, VersionConflictError) as e:
+        return {"status": "ERROR", "message": str(e)}
+    return {"status": "STATE_UPDATED", "version": version, "rankings": ranked}
 
+@tool
+def list_uploaded_files() -> list[str]:
+    """Return list of uploaded files available for processing."""
+    try:
+        folder = project_upload_folder()
+        files = [
+            os.path.join(folder, f)
+            for f in os.listdir(folder)
+            if not f.startswith(".") and os.path.isfile(os.path.join(folder, f))
+        ]
+        return files
+    except Exception as e:
+        return [f"ERROR: {str(e)}"]
 
 @tool
 def load_document_to_memory(file_path: str) -> dict:
@@ -76,29 +263,21 @@ def load_document_to_memory(file_path: str) -> dict:
     try:
         file_name = os.path.basename(file_path)
 
-        existing_item = store.get(namespace, file_name)
-
-        if existing_item is not None:
-            stored_value = existing_item.value
-            return {
-                "status": "ALREADY_EXISTS",
-                "file_name": file_name,
-                "content": stored_value.get("content", "")
-            }
+        content, sha256, cache_hit = get_parse_cache().load(file_path, parse_document)
 
-        loader = get_loader_for_file(file_path)
-        docs = loader.load()
+        stored_value = store.get(project_namespace(), file_name)
 
-        content = "\n".join(d.page_content for d in docs)
+        if stored_value is not None:
+            if stored_value.get("metadata", {}).get("sha256") == sha256:
+                # Restarted process: the durable store has it but the chunk index may not
+                index_document(file_name, content, sha256)
+                return {
+                    "status": "ALREADY_EXISTS",
+                    "file_name": file_name,
+                    "content": stored_value.get("content", "")
+                }
 
-        store.put(namespace, file_name, {
-            "content": content,
-            "metadata": {
-                "file_path": file_path,
-                "file_name": file_name,
-                "length": len(content),
-            }
-        })
+        _store_document(file_path, content, sha256, cache_hit)
 
         return {
             "status": "DOCUMENT_SAVED",
@@ -109,6 +288,60 @@ def load_document_to_memory(file_path: str) -> dict:
     except Exception as e:
         return {"status": "ERROR", "message": str(e)}
 
+def _store_document(file_path: str, content: str, sha256: str, cache_hit: bool, project_id: str = None) -> int:
+    file_name = os.path.basename(file_path)
+    chunks = index_document(file_name, content, sha256, project_id)
+    store.put(project_namespace(project_id), file_name, {
+        "content": content,
+        "metadata": {
+            "file_path": file_path,
+            "file_name": file_name,
+            "length": len(content),
+            "sha256": sha256,
+            "parse_cache_hit": cache_hit,
+            "chunks": chunks,
+        }
+    })
+    return chunks
+
+def ingest_documents(file_paths: list[str], project_id: str = None):
+    """Parse files in parallel and store each one; yields per-file results as they complete."""
+    # Resolved now: the generator body may run later on another thread
+    return _ingest_documents(file_paths, project_id or current_project_id())
+
+def _ingest_documents(file_paths: list[str], project_id: str):
+    for result in ingest_files(file_paths):
+        if result["status"] != "OK":
+            yield result
+            continue
+
+        stored_value = store.get(project_namespace(project_id), result["file_name"])
+        if stored_value is not None and stored_value.get("metadata", {}).get("sha256") == result["sha256"]:
+            result["status"] = "ALREADY_EXISTS"
+            result["chunks"] = index_document(result["file_name"], result["content"], result["sha256"], project_id)
+        else:
+            result["chunks"] = _store_document(
+                result["file_path"], result["content"], result["sha256"], result["cache_hit"], project_id
+            )
+            result["status"] = "DOCUMENT_SAVED"
+        yield result
+
+@tool
+def load_documents_to_memory(file_paths: list[str]) -> list[dict]:
+    """
+    Load many documents at once (e.g. the output of list_uploaded_files).
+    Files and PDF pages are parsed in parallel; use this instead of calling
+    load_document_to_memory once per file. Returns per-file status and chunk
+    counts, not content: use search_documents to read relevant passages.
+    """
+    try:
+        return [
+            {k: v for k, v in result.items() if k not in ("file_path", "elapsed_ms", "cache_hit", "content")}
+            for result in ingest_documents(file_paths)
+        ]
+    except Exception as e:
+        return [{"status": "ERROR", "message": str(e)}]
+
 @tool
 def get_document_from_memory(file_name: str) -> dict:
     """
@@ -116,18 +349,15 @@ def get_document_from_memory(file_name: str) -> dict:
     Returns content + metadata in a stable format.
     """
     try:
-        item = store.get(namespace, file_name)
+        data = store.get(project_namespace(), file_name)
 
-        if item is None:
+        if data is None:
             return {
                 "status": "NOT_FOUND",
                 "file_name": file_name,
                 "content": ""
             }
 
-        # item.value is the actual stored dictionary
-        data = item.value
-
         return {
             "status": "OK",
             "file_name": file_name,
@@ -144,9 +374,44 @@ def save_document_to_memory(file_name: str, content: str) -> str:
     """
     Store document content manually (used if agent generates a micro-action).
     """
-    store.put(namespace, file_name, {"content": content})
+    index_document(file_name, content)
+    store.put(project_namespace(), file_name, {"content": content})
     return "DOCUMENT_SAVED"
 
+@tool
+def search_documents(query: str, k: int = 5, file_name: str = None) -> list[dict]:
+    """
+    Return the k passages from loaded documents most relevant to the query.
+    Optionally restrict the search to one file_name.
+    Prefer this over get_document_from_memory to keep prompts small.
+    """
+    try:
+        sync_document_index()
+        query_vector = get_embedding_worker().embed([query])[0]
+        where = {"project_id": current_project_id()}
+        if file_name:
+            where["file_name"] = file_name
+        return [
+            {
+                "file_name": hit["file_name"],
+                "chunk": hit["chunk"],
+                "score": round(hit["score"], 4),
+                "text": hit["text"],
+            }
+            for hit in document_index.search(query_vector, k=k, where=where)
+        ]
+    except Exception as e:
+        return [{"status": "ERROR", "message": str(e)}]
+
+@tool
+def recall_tool_result(ref: str) -> str:
+    """
+    Return the full text of an earlier tool result that was elided from the
+    conversation to save context (the reference looks like 'ref_...').
+    """
+    content = context_references.get(ref)
+    return content if content is not None else f"NOT_FOUND: {ref}"
+
 @tool
 def ask_user(message: str):
     """
@@ -176,3 +441,20 @@ def corrective_action():
     """
     return None
 
+# Read-only (or per-file) tools may run concurrently within one turn; the rest
+# (set_state, patch_state, save_document_to_memory, ask_user...) run in call order.
+# check_progress and task_slack update the shared progress / schedule monitors,
+# so they stay sequenced too. Readers of state or documents still wait for a
+# write to them issued earlier in the same turn
+parallel_safe(get_state, check_fairness, reads=("state",))
+parallel_safe(get_document_from_memory, search_documents, reads=("documents",))
+parallel_safe(list_uploaded_files, recall_tool_result)
+parallel_safe(
+    load_document_to_memory, load_documents_to_memory, max_concurrency=INGEST_WORKERS, writes=("documents",)
+)
+
+trace_tools(
+    get_state, set_state, patch_state, allocate_tasks, check_fairness, check_progress, set_task_dependencies,
+    task_slack, rank_tasks_for_users, list_uploaded_files, load_document_to_memory, load_documents_to_memory,
+    get_document_from_memory, save_document_to_memory, search_documents, recall_tool_result, ask_user, micro_action, corrective_action,
+)
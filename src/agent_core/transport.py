@@ -0,0 +1,91 @@
+"""Shared HTTP transports for the Holistic AI Bedrock proxy.
+
+Every chat model talks to the same proxy host, so connections are pooled per
+process instead of per call: a ``requests.Session`` backs the sync path and an
+``httpx.AsyncClient`` backs the async path (HTTP/2 when ``h2`` is installed).
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+from typing import Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = int(os.getenv("HOLISTIC_AI_POOL_SIZE", "20"))
+
+_lock = threading.Lock()
+_sync_sessions: dict = {}
+# Async clients are bound to the loop that created them, so keep one set per loop.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def httpx_available() -> bool:
+    return importlib.util.find_spec("httpx") is not None
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def get_sync_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Return the process-wide keep-alive session for the given pool size."""
+    with _lock:
+        session = _sync_sessions.get(pool_size)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sync_sessions[pool_size] = session
+        return session
+
+
+def get_async_client(pool_size: int = DEFAULT_POOL_SIZE, http2: bool = True) -> Optional[Any]:
+    """Return the keep-alive ``httpx.AsyncClient`` for the running loop.
+
+    Returns None when httpx is not installed; callers then fall back to the
+    pooled sync session in a worker thread.
+    """
+    if not httpx_available():
+        return None
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    use_http2 = http2 and http2_available()
+    key = (pool_size, use_http2)
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                http2=use_http2,
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                ),
+            )
+            clients[key] = client
+        return client
+
+
+def close_transports() -> None:
+    """Close the pooled sync sessions."""
+    with _lock:
+        sessions = list(_sync_sessions.values())
+        _sync_sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+async def aclose_transports() -> None:
+    """Close the async clients owned by the running loop and the sync sessions."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = list(_async_clients.pop(loop, {}).values())
+    for client in clients:
+        await client.aclose()
+    close_transports()
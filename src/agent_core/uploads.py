@@ -0,0 +1,138 @@
+"""Streaming, content-addressed storage for uploaded files.
+
+Uploads are copied to a temp file in fixed-size chunks while their SHA-256 is
+computed, then atomically renamed into the upload folder. A hidden index maps
+content hashes to stored names, so re-uploading identical bytes (under any
+name) is reported as a duplicate instead of being written again.
+``UploadWriter`` does the same for a body fed in chunks (the API's
+multipart stream), so the size cap is enforced while the upload arrives.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import BinaryIO
+
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+INDEX_FILE = ".upload_index.json"
+
+_index_lock = threading.Lock()
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size cap."""
+
+
+def _load_index(folder: str) -> dict:
+    try:
+        with open(os.path.join(folder, INDEX_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_index(folder: str, index: dict) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".index-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(folder, INDEX_FILE))
+
+
+def _target_name(folder: str, filename: str, digest: str) -> str:
+    name = os.path.basename(filename) or digest
+    if not os.path.exists(os.path.join(folder, name)):
+        return name
+    # Same name, different content: keep both, disambiguated by hash prefix
+    stem, ext = os.path.splitext(name)
+    return f"{stem}-{digest[:8]}{ext}"
+
+
+class UploadWriter:
+    """Incremental form of ``store_upload`` for bodies that arrive in pieces.
+
+    Feed chunks to ``write`` (which enforces the size cap as they arrive), then
+    ``commit`` under the upload's name, or ``abort`` to discard it.
+    """
+
+    def __init__(self, folder: str, max_bytes: int = MAX_UPLOAD_BYTES):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        fd, self._tmp_path = tempfile.mkstemp(dir=folder, prefix=".upload-")
+        self._out = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLargeError(f"Upload exceeds {self.max_bytes} bytes")
+        self._digest.update(chunk)
+        self._out.write(chunk)
+
+    def abort(self) -> None:
+        self._out.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def commit(self, filename: str) -> dict:
+        """Store the upload; return where it is stored and whether it was a duplicate."""
+        folder = self.folder
+        try:
+            self._out.flush()
+            os.fsync(self._out.fileno())
+            self._out.close()
+
+            sha256 = self._digest.hexdigest()
+            with _index_lock:
+                index = _load_index(folder)
+                existing = index.get(sha256)
+                if existing and os.path.isfile(os.path.join(folder, existing)):
+                    os.remove(self._tmp_path)
+                    return {
+                        "filename": existing,
+                        "stored_at": os.path.join(folder, existing),
+                        "sha256": sha256,
+                        "size": self.size,
+                        "duplicate": True,
+                    }
+
+                name = _target_name(folder, filename, sha256)
+                os.replace(self._tmp_path, os.path.join(folder, name))
+                index[sha256] = name
+                _write_index(folder, index)
+        except BaseException:
+            self.abort()
+            raise
+
+        return {
+            "filename": name,
+            "stored_at": os.path.join(folder, name),
+            "sha256": sha256,
+            "size": self.size,
+            "duplicate": False,
+        }
+
+
+def store_upload(
+    source: BinaryIO,
+    filename: str,
+    folder: str,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict:
+    """Stream source into folder; return where it is stored and whether it was a duplicate."""
+    writer = UploadWriter(folder, max_bytes)
+    try:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit(filename)
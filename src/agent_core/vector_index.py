@@ -0,0 +1,147 @@
+"""Chunking and a flat NumPy vector index for retrieval over ingested documents.
+
+Vectors are L2-normalised on insert so search is a single matrix-vector
+product (cosine similarity). Each row carries a metadata dict; searches can be
+restricted with equality filters on it.
+"""
+
+import re
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+CHUNK_SIZE = 1200
+CHUNK_OVERLAP = 200
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into ~chunk_size character windows, preferring paragraph and word breaks."""
+    text = text.strip()
+    if not text:
+        return []
+    if len(text) <= chunk_size:
+        return [text]
+
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            window = text[start:end]
+            # Break at the last paragraph, else sentence/word boundary in the second half
+            for pattern in (r"\n\s*\n", r"[.!?]\s", r"\s"):
+                breaks = [m.end() for m in re.finditer(pattern, window) if m.end() > chunk_size // 2]
+                if breaks:
+                    end = start + breaks[-1]
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+
+def _matches(metadata: dict, where: Optional[dict]) -> bool:
+    if not where:
+        return True
+    for key, expected in where.items():
+        value = metadata.get(key)
+        if isinstance(expected, (list, tuple, set)):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+    return True
+
+
+class VectorIndex:
+    """In-memory exact (flat) cosine-similarity index with metadata filters."""
+
+    def __init__(self, dim: Optional[int] = None, initial_capacity: int = 1024):
+        self.dim = dim
+        self._vectors: Optional[np.ndarray] = None
+        self._capacity = initial_capacity
+        self._size = 0
+        self._ids: List[str] = []
+        self._metadata: List[dict] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _ensure_capacity(self, extra: int, dim: int) -> None:
+        if self._vectors is None:
+            self.dim = self.dim or dim
+            self._capacity = max(self._capacity, extra)
+            self._vectors = np.zeros((self._capacity, self.dim), dtype=np.float32)
+        if dim != self.dim:
+            raise ValueError(f"Expected {self.dim}-dim vectors, got {dim}")
+        if self._size + extra > self._capacity:
+            while self._size + extra > self._capacity:
+                self._capacity *= 2
+            grown = np.zeros((self._capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+
+    def add(self, ids: List[str], vectors, metadatas: List[dict]) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids) or len(ids) != len(metadatas):
+            raise ValueError("ids, vectors and metadatas must have matching lengths")
+        if not len(ids):
+            return
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self._lock:
+            self._ensure_capacity(len(ids), vectors.shape[1])
+            self._vectors[self._size:self._size + len(ids)] = vectors
+            self._size += len(ids)
+            self._ids.extend(ids)
+            self._metadata.extend(dict(m) for m in metadatas)
+
+    def delete(self, where: dict) -> int:
+        """Remove every row whose metadata matches where; returns the number removed."""
+        with self._lock:
+            keep = [i for i, m in enumerate(self._metadata) if not _matches(m, where)]
+            removed = self._size - len(keep)
+            if removed:
+                self._vectors[:len(keep)] = self._vectors[keep]
+                self._ids = [self._ids[i] for i in keep]
+                self._metadata = [self._metadata[i] for i in keep]
+                self._size = len(keep)
+            return removed
+
+    def count(self, where: Optional[dict] = None) -> int:
+        with self._lock:
+            return sum(1 for m in self._metadata if _matches(m, where))
+
+    def search(self, query_vector, k: int = 5, where: Optional[dict] = None) -> List[dict]:
+        """Return up to k rows by descending cosine similarity."""
+        query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        with self._lock:
+            if not self._size:
+                return []
+            if where:
+                rows = np.fromiter(
+                    (i for i, m in enumerate(self._metadata) if _matches(m, where)), dtype=np.intp
+                )
+                if not len(rows):
+                    return []
+                scores = self._vectors[rows] @ query
+            else:
+                rows = None
+                scores = self._vectors[:self._size] @ query
+
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            hits = []
+            for position in top:
+                row = int(rows[position]) if rows is not None else int(position)
+                hits.append({"id": self._ids[row], "score": float(scores[position]), **self._metadata[row]})
+            return hits
@@ -0,0 +1,120 @@
+"""Local stand-in for the Holistic AI Bedrock proxy.
+
+Serves the same ``content`` / ``tool_use`` response shapes that
+``HolisticAIBedrockChat`` parses, as plain JSON or, when the request sets
+``"stream": true``, as Anthropic-style Server-Sent Events. Point the client at
+it to work offline:
+
+    uvicorn api.fake_proxy:app --port 8001
+    HOLISTIC_AI_API_ENDPOINT=http://127.0.0.1:8001/invoke uvicorn api.main:app
+
+Responses come from a script: a JSON list of response bodies, where the Nth
+assistant turn of a conversation receives the Nth entry (the last entry repeats).
+"""
+
+import asyncio
+import json
+import os
+import uuid
+from typing import List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_SCRIPT = [{"content": [{"type": "text", "text": "NO_ACTION"}]}]
+
+
+def load_script(path: Optional[str]) -> List[dict]:
+    if not path:
+        return DEFAULT_SCRIPT
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _turn_index(messages: List[dict]) -> int:
+    return sum(1 for m in messages if m.get("role") == "assistant")
+
+
+def _with_tool_ids(body: dict) -> dict:
+    blocks = []
+    for block in body.get("content", []):
+        if block.get("type") == "tool_use" and not block.get("id"):
+            block = {**block, "id": f"toolu_{uuid.uuid4().hex[:24]}"}
+        blocks.append(block)
+    return {**body, "content": blocks}
+
+
+def _usage(payload: dict, body: dict) -> dict:
+    # Rough 4-characters-per-token estimate, enough for accounting in tests
+    return {
+        "input_tokens": len(json.dumps(payload.get("messages", []))) // 4,
+        "output_tokens": len(json.dumps(body.get("content", []))) // 4,
+    }
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def _stream_events(body: dict, usage: dict, token_delay: float):
+    yield _sse({"type": "message_start", "message": {"usage": {"input_tokens": usage["input_tokens"]}}})
+    for index, block in enumerate(body.get("content", [])):
+        if block.get("type") == "tool_use":
+            start = {"type": "tool_use", "id": block["id"], "name": block.get("name", ""), "input": {}}
+            yield _sse({"type": "content_block_start", "index": index, "content_block": start})
+            raw = json.dumps(block.get("input", {}))
+            for i in range(0, len(raw), 16):
+                await asyncio.sleep(token_delay)
+                delta = {"type": "input_json_delta", "partial_json": raw[i:i + 16]}
+                yield _sse({"type": "content_block_delta", "index": index, "delta": delta})
+        else:
+            yield _sse({"type": "content_block_start", "index": index, "content_block": {"type": "text", "text": ""}})
+            for word in block.get("text", "").split(" "):
+                await asyncio.sleep(token_delay)
+                delta = {"type": "text_delta", "text": word + " "}
+                yield _sse({"type": "content_block_delta", "index": index, "delta": delta})
+        yield _sse({"type": "content_block_stop", "index": index})
+    stop_reason = "tool_use" if any(b.get("type") == "tool_use" for b in body.get("content", [])) else "end_turn"
+    yield _sse({
+        "type": "message_delta",
+        "delta": {"stop_reason": stop_reason},
+        "usage": {"output_tokens": usage["output_tokens"]},
+    })
+    yield _sse({"type": "message_stop"})
+
+
+def create_app(
+    script: Optional[List[dict]] = None,
+    latency_ms: Optional[float] = None,
+    token_delay_ms: Optional[float] = None,
+) -> FastAPI:
+    """Build a fake proxy app; unset arguments fall back to FAKE_PROXY_* env vars."""
+    script = script or load_script(os.getenv("FAKE_PROXY_SCRIPT"))
+    latency = (latency_ms if latency_ms is not None else float(os.getenv("FAKE_PROXY_LATENCY_MS", "0"))) / 1000
+    token_delay = (
+        token_delay_ms if token_delay_ms is not None else float(os.getenv("FAKE_PROXY_TOKEN_DELAY_MS", "0"))
+    ) / 1000
+
+    fake = FastAPI(title="Fake Holistic AI Bedrock Proxy")
+    fake.state.requests = 0
+
+    @fake.post("/invoke")
+    async def invoke(request: Request):
+        payload = await request.json()
+        fake.state.requests += 1
+
+        turn = _turn_index(payload.get("messages", []))
+        body = _with_tool_ids(script[min(turn, len(script) - 1)])
+        usage = _usage(payload, body)
+
+        if latency:
+            await asyncio.sleep(latency)
+
+        if payload.get("stream"):
+            return StreamingResponse(_stream_events(body, usage, token_delay), media_type="text/event-stream")
+        return JSONResponse({**body, "usage": usage})
+
+    return fake
+
+
+app = create_app()
@@ -1,80 +1,540 @@
-import os
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import APIRouter, Body, Depends, FastAPI, Header, Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from langchain_core.messages import AIMessageChunk, ToolMessage
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
 from agent_core.models import ProjectOutputModel
-from agent_core.agent import build_agent
-from agent_core.tools import set_state, get_state
+from agent_core.agent import get_agent, invalidate_agent_cache
+from agent_core.tools import (
+    get_state_versioned,
+    ingest_documents,
+    list_projects,
+    list_uploaded_files,
+    patch_state_ops,
+    project_upload_folder,
+    state_changes_since,
+    store,
+)
+from agent_core.state_patch import PatchError, escape_pointer_token
+from agent_core.state_store import VersionConflictError
+from agent_core.ingest import shutdown_ingest_pool
+from agent_core.uploads import MAX_UPLOAD_BYTES, UploadTooLargeError, UploadWriter
+from agent_core.jobs import JobManager, QueueFullError, SUCCEEDED, raise_if_cancelled
+from agent_core.progress import deviation_prompt, monitor as progress_monitor
+from agent_core.task_graph import monitor as schedule_monitor
+from agent_core.embedding_cache import embedding_cache_stats
+from agent_core.embedding_worker import embedding_worker_stats
+from agent_core.response_cache import default_cache_stats
+from agent_core.transport import aclose_transports
+from agent_core.telemetry import metrics, ring_buffer, span
+from agent_core.projects import (
+    DEFAULT_PROJECT_ID,
+    InvalidProjectError,
+    project_lock,
+    project_run_config,
+    project_scope,
+    validate_project_id,
+)
 
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Project Supervisor Agent API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the agent before the first request instead of during it
+    try:
+        get_agent()
+    except ValueError as e:
+        # Missing credentials: the first request will report the error
+        logger.warning("Agent not prebuilt at startup: %s", e)
+    yield
+    jobs.shutdown()
+    shutdown_ingest_pool()
+    await aclose_transports()
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", os.path.join(os.getcwd(), "src/uploads"))
-    os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+app = FastAPI(title="Project Supervisor Agent API", lifespan=lifespan)
+jobs = JobManager()
 
-    content = await file.read()
+# Project-scoped routes are served both at the top level (the default project,
+# or ?project_id=) and under /projects/{project_id}; see the include_router calls at the end
+project_routes = APIRouter()
 
-    filepath = f"uploads/{file.filename}"
-    with open(filepath, "wb") as f:
-        f.write(content)
+def project_id_param(project_id: str = DEFAULT_PROJECT_ID) -> str:
+    try:
+        return validate_project_id(project_id)
+    except InvalidProjectError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+http_duration = metrics.histogram(
+    "http_request_duration_seconds", "Handler latency", ("method", "route", "status")
+)
+http_errors = metrics.counter("http_errors_total", "Responses with status >= 500", ("method", "route"))
+metrics.gauge("agent_jobs_queue_depth", "Agent jobs waiting for a worker", lambda: jobs.queue_depth())
+metrics.gauge("agent_jobs_running", "Agent jobs currently running", lambda: jobs.stats()["running"])
+metrics.gauge(
+    "embedding_queue_depth", "Embedding requests waiting for a batch",
+    lambda: embedding_worker_stats().get("queue_depth", 0),
+)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    with span("http.request", method=request.method, path=request.url.path) as s:
+        response = await call_next(request)
+        # The route template is known once routing has run; project routes
+        # report their path relative to the /projects/{project_id} prefix
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", request.url.path)
+        if "project_id" in request.scope.get("path_params", {}) and "{project_id}" not in route_path:
+            route_path = "/projects/{project_id}" + route_path
+        s.set(route=route_path, status=response.status_code)
+    http_duration.observe(s.duration, method=request.method, route=route_path, status=response.status_code)
+    if response.status_code >= 500:
+        http_errors.inc(method=request.method, route=route_path)
+    return response
+
+# Room for the multipart boundaries and part headers around the file itself
+UPLOAD_FRAMING_BYTES = 64 * 1024
+
+async def _receive_upload(request: Request, folder: str, max_bytes: int = MAX_UPLOAD_BYTES) -> dict:
+    """Stream the "file" part of a multipart body into folder as it arrives.
+
+    A File(...) parameter would have Starlette spool the whole body before the
+    handler runs; parsing request.stream() here stops reading as soon as the
+    file passes max_bytes.
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    if b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+
+    part = {"headers": {}, "field": b"", "value": b"", "file": False}
+    pending = []  # file bytes parsed from the current network chunk
+    upload = {"writer": None, "filename": None, "done": False}
+
+    def on_part_begin():
+        part.update(headers={}, file=False)
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part.update(field=b"", value=b"")
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        if options.get(b"name") != b"file" or upload["filename"] is not None:
+            return
+        upload["filename"] = options.get(b"filename", b"").decode("utf-8", "replace")
+        part["file"] = True
+
+    def on_part_data(data, start, end):
+        if part["file"]:
+            pending.append(data[start:end])
+
+    def on_part_end():
+        if part["file"]:
+            upload["done"] = True
+            part["file"] = False
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    writer = None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if upload["filename"] == "":
+                raise HTTPException(status_code=400, detail="Upload has no filename")
+            if pending:
+                if writer is None:
+                    writer = await run_in_threadpool(UploadWriter, folder, max_bytes)
+                data = b"".join(pending)
+                pending.clear()
+                await run_in_threadpool(writer.write, data)
+            if upload["done"]:
+                break  # anything after the file part is not needed
+        if upload["filename"] is None:
+            raise HTTPException(status_code=400, detail="Upload has no file part")
+        if not upload["done"]:
+            raise HTTPException(status_code=400, detail="Upload body ended before the file did")
+        if writer is None:
+            writer = await run_in_threadpool(UploadWriter, folder, max_bytes)
+        stored = await run_in_threadpool(writer.commit, upload["filename"])
+        writer = None
+        return stored
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except FormParserError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+    finally:
+        if writer is not None:
+            await run_in_threadpool(writer.abort)
+
+@project_routes.post(
+    "/upload",
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {"file": {"type": "string", "format": "binary"}},
+        "required": ["file"],
+    }}}}},
+)
+async def upload_file(request: Request, project_id: str = Depends(project_id_param)):
+    """Store a multipart "file" upload, deduplicated by content hash.
+
+    Bodies whose Content-Length already exceeds MAX_UPLOAD_BYTES are refused
+    before anything is read; otherwise the cap is enforced while streaming.
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > MAX_UPLOAD_BYTES + UPLOAD_FRAMING_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+    stored = await _receive_upload(request, project_upload_folder(project_id), MAX_UPLOAD_BYTES)
 
     return {
         "status": "success",
-        "filename": file.filename,
-        "stored_at": filepath
+        **stored,
     }
 
-@app.post("/run-agent", response_model=ProjectOutputModel)
-async def run_agent():
-    agent = build_agent()
+@project_routes.post("/ingest")
+async def ingest(
+    file_paths: list[str] = Body(default=None, embed=True), project_id: str = Depends(project_id_param)
+):
+    """Parse and store files in parallel, streaming one NDJSON line per file as it completes."""
+    if file_paths is None:
+        with project_scope(project_id):
+            file_paths = list_uploaded_files.invoke({})
+
+    def lines():
+        for result in ingest_documents(file_paths, project_id):
+            result.pop("content", None)
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _run_agent_cycle(prompt: str, project_id: str = DEFAULT_PROJECT_ID):
+    """Run one agent cycle synchronously (called on the job worker pool).
+
+    Cycles of the same project run one at a time; other projects proceed in parallel.
+    Cancelling the job (or its timeout) stops the cycle between graph steps,
+    so it frees its worker and the project lock instead of running on.
+    """
+    agent = get_agent()
+    lock = project_lock(project_id)
+    while not lock.acquire(timeout=0.1):
+        raise_if_cancelled()
+    try:
+        with project_scope(project_id):
+            result = None
+            for result in agent.stream(
+                {"messages": [{"role": "user", "content": prompt}]},
+                config=project_run_config(project_id),
+                stream_mode="values",
+            ):
+                raise_if_cancelled()
+    finally:
+        lock.release()
+
+    structured = result.get("structured_response") if isinstance(result, dict) else None
+    if isinstance(structured, ProjectOutputModel):
+        return structured.model_dump()
+
+    if _final_text(result) == "NO_ACTION":
+        return "NO_ACTION"
+
+    raise ValueError("Unexpected agent output")
+
+def _final_text(result) -> Optional[str]:
+    """Text of the agent's last message, or None."""
+    messages = result.get("messages") if isinstance(result, dict) else None
+    if not messages:
+        return None
+    content = messages[-1].content
+    if isinstance(content, list):
+        content = "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+        )
+    return content.strip().strip('"').strip()
 
-    result = agent.invoke({"input": "Run agent cycle"})
+def _submit_agent_cycle(prompt: str, project_id: str, deviations: list = ()):
+    """Queue a cycle for the claimed deviations; unless it succeeds they are flagged again."""
+    def on_finish(job):
+        if job.status != SUCCEEDED:
+            progress_monitor.release(project_id, deviations)
 
-    if isinstance(result, ProjectOutputModel):
-        return result
+    try:
+        return jobs.submit(_run_agent_cycle, prompt, project_id, kind="agent_cycle", on_finish=on_finish)
+    except QueueFullError as e:
+        progress_monitor.release(project_id, deviations)
+        raise HTTPException(status_code=429, detail=str(e))
 
-    if isinstance(result, str) and result == "NO_ACTION":
-        raise HTTPException(status_code=200, detail="NO_ACTION")
+@project_routes.post("/run-agent", status_code=202)
+async def run_agent(force: bool = False, project_id: str = Depends(project_id_param)):
+    """
+    Queue an agent cycle. Once the project is planned, the progress engine
+    checks it first and the LLM only runs for newly flagged deviations;
+    otherwise this answers NO_ACTION (200) straight away. force=true always runs.
+    """
+    prompt = "Run agent cycle"
+    if not force:
+        state, version = await run_in_threadpool(get_state_versioned, project_id)
+        if state:
+            report = progress_monitor.observe(project_id, state, version)
+            flagged = progress_monitor.claim(project_id, report["flagged"])
+            if not flagged:
+                return JSONResponse(content={
+                    "status": "NO_ACTION", "version": version, "deviations": report["deviations"],
+                })
+            return _submit_agent_cycle(deviation_prompt(flagged), project_id, flagged).to_dict()
+    return _submit_agent_cycle(prompt, project_id).to_dict()
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if not job.finished:
+        return JSONResponse(status_code=202, content=job.to_dict())
+    if job.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=job.to_dict())
+    return {"job_id": job.id, "status": job.status, "result": job.result}
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+def _sse(event: dict) -> str:
+    return f"data: {json.dumps(event, default=str)}\n\n"
+
+async def _agent_events(prompt: str, project_id: str = DEFAULT_PROJECT_ID):
+    """Forward model tokens and tool events from one agent cycle as SSE."""
+    agent = get_agent()
+    try:
+        async with project_lock(project_id):
+            async for mode, data in agent.astream(
+                {"messages": [{"role": "user", "content": prompt}]},
+                config=project_run_config(project_id),
+                stream_mode=["messages", "updates"],
+            ):
+                if mode == "messages":
+                    chunk, metadata = data
+                    if not isinstance(chunk, AIMessageChunk):
+                        continue
+                    if chunk.content:
+                        yield _sse({"type": "token", "text": chunk.content, "node": metadata.get("langgraph_node")})
+                    for tool_chunk in chunk.tool_call_chunks:
+                        yield _sse({**tool_chunk, "type": "tool_call_delta"})
+                elif mode == "updates":
+                    for node, update in data.items():
+                        if not isinstance(update, dict):
+                            continue
+                        for message in update.get("messages", []):
+                            if isinstance(message, ToolMessage):
+                                yield _sse({
+                                    "type": "tool_result",
+                                    "name": message.name,
+                                    "tool_call_id": message.tool_call_id,
+                                    "content": str(message.content),
+                                })
+                            elif getattr(message, "tool_calls", None):
+                                for tool_call in message.tool_calls:
+                                    yield _sse({**tool_call, "type": "tool_call"})
+                        if update.get("structured_response") is not None:
+                            yield _sse({"type": "final", "output": update["structured_response"].model_dump()})
+    except Exception as e:
+        yield _sse({"type": "error", "message": str(e)})
+    yield _sse({"type": "done"})
+
+@project_routes.post("/run-agent/stream")
+async def run_agent_stream(project_id: str = Depends(project_id_param)):
+    return StreamingResponse(_agent_events("Run agent cycle", project_id), media_type="text/event-stream")
+
+def _etag(version: int) -> str:
+    return f'"{version}"'
+
+def _if_match_version(if_match: Optional[str]) -> Optional[int]:
+    """Parse an If-Match header ("3", W/"3" or *) into an expected state version."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid If-Match header: {if_match}")
+
+@project_routes.get("/project-state")
+async def get_project_state(project_id: str = Depends(project_id_param)):
+    state, version = await run_in_threadpool(get_state_versioned, project_id)
+    return JSONResponse(content=state, headers={"ETag": _etag(version)})
+
+@project_routes.patch("/project-state")
+async def patch_project_state(
+    ops: list[dict], if_match: Optional[str] = Header(default=None), project_id: str = Depends(project_id_param)
+):
+    """
+    Apply JSON Patch operations or field updates, e.g.
+    [{"op": "replace", "path": "/tasks/intro/status", "value": "done"},
+     {"field": "tasks.intro.owner", "value": "sam"}]
+    Send If-Match with the ETag from GET /project-state to reject concurrent edits.
+    """
+    try:
+        _, version = await run_in_threadpool(patch_state_ops, ops, _if_match_version(if_match), project_id)
+    except VersionConflictError as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    except PatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content={"status": "updated", "version": version}, headers={"ETag": _etag(version)})
 
-    raise HTTPException(status_code=500, detail="Unexpected agent output")
+@project_routes.get("/project-state/changes")
+async def get_project_state_changes(since: int = 0, project_id: str = Depends(project_id_param)):
+    """Patches applied after version `since`. truncated means older entries were
+    pruned from the log, so the client should re-read the whole state."""
+    _, version = await run_in_threadpool(get_state_versioned, project_id)
+    changes = await run_in_threadpool(state_changes_since, since, project_id)
+    truncated = since < version and (not changes or changes[0]["version"] > since + 1)
+    return {"version": version, "changes": changes, "truncated": truncated}
 
-@app.get("/project-state")
-async def get_project_state():
-    state = get_state.invoke({})
-    return JSONResponse(content=state)
+@project_routes.get("/task-graph")
+async def get_task_graph(limit: int = 0, project_id: str = Depends(project_id_param)):
+    """Critical path, project length and per-task earliest/latest start and slack."""
+    state, version = await run_in_threadpool(get_state_versioned, project_id)
+    return await run_in_threadpool(schedule_monitor.observe, project_id, state, version, None, limit or None)
 
-@app.get("/project-summary", response_model=ProjectOutputModel)
-async def get_project_summary():
-    state = get_state.invoke({})
+def _summarise_project(project_id: str):
+    """Ask the agent for the structured summary, serialised with the project's other cycles."""
+    agent = get_agent()
+    with project_scope(project_id), project_lock(project_id):
+        return agent.invoke(
+            {"messages": [{"role": "user", "content": "Summarise current project state"}]},
+            config=project_run_config(project_id),
+        )
+
+@project_routes.get("/project-summary", response_model=ProjectOutputModel)
+async def get_project_summary(project_id: str = Depends(project_id_param)):
+    state, _ = await run_in_threadpool(get_state_versioned, project_id)
     if not state:
         raise HTTPException(status_code=404, detail="Project state is empty")
 
-    agent = build_agent()
-    summary = agent.invoke({"input": "Summarise current project state"})
+    summary = await run_in_threadpool(_summarise_project, project_id)
+
+    if isinstance(summary, dict) and summary.get("structured_response") is not None:
+        summary = summary["structured_response"]
 
     if isinstance(summary, ProjectOutputModel):
         return summary
 
     raise HTTPException(status_code=500, detail="Unexpected structured summary output")
 
-@app.post("/progress-update")
-async def progress_update(progress: dict):
+@app.post("/agent-cache/invalidate")
+async def invalidate_agents(model_name: str = None):
+    return {"invalidated": invalidate_agent_cache(model_name)}
+
+@app.get("/projects")
+async def projects():
+    """Projects with stored state or documents, and the hot-state cache occupancy."""
+    return {"projects": await run_in_threadpool(list_projects), "state_cache": store.cache_stats()}
+
+@app.get("/llm-cache/stats")
+async def llm_cache_stats():
+    return default_cache_stats()
+
+@app.get("/jobs")
+async def jobs_stats():
+    return jobs.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/traces")
+async def recent_traces(limit: int = 100, name: str = None):
+    """Most recent spans from the in-memory exporter (TRACE_EXPORTERS includes "ring")."""
+    buffer = ring_buffer()
+    if buffer is None:
+        raise HTTPException(status_code=404, detail="Ring buffer exporter not enabled")
+    return buffer.spans(limit=limit, name=name)
+
+@app.get("/embeddings/stats")
+async def embeddings_stats():
+    return {**embedding_worker_stats(), "caches": embedding_cache_stats()}
+
+@project_routes.post("/progress-update")
+async def progress_update(
+    progress: dict, if_match: Optional[str] = Header(default=None), project_id: str = Depends(project_id_param)
+):
     """
     Example request:
     {
         "task_name": "data_preprocessing",
-        "progress": "60%"
+        "progress": "60%",
+        "duration": 3
     }
+    duration (the task's new estimate) is optional.
     """
 
-    state = get_state.invoke({})
-
     task_name = progress.get("task_name")
-    if not state or "tasks" not in state or task_name not in state["tasks"]:
+    if not isinstance(task_name, str):
         raise HTTPException(status_code=400, detail="Invalid task")
+    duration = progress.get("duration")
+    if duration is not None and (isinstance(duration, bool) or not isinstance(duration, (int, float)) or duration < 0):
+        raise HTTPException(status_code=400, detail="Invalid duration")
+
+    task_path = f"/tasks/{escape_pointer_token(task_name)}"
+    ops = []
+    if "progress" in progress or duration is None:
+        ops.append({"op": "replace", "path": f"{task_path}/status", "value": progress.get("progress", "updated")})
+    if duration is not None:
+        ops.append({"op": "add", "path": f"{task_path}/duration", "value": duration})
+    try:
+        state, version = await run_in_threadpool(patch_state_ops, ops, _if_match_version(if_match), project_id)
+    except VersionConflictError as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    except PatchError:
+        raise HTTPException(status_code=400, detail="Invalid task")
+
+    # Only this task changed, so the progress engine re-evaluates just it and
+    # the schedule is repaired around its new duration; an agent cycle is
+    # queued only when a new deviation is flagged
+    report = progress_monitor.observe(project_id, state, version, changed_tasks=[task_name])
+    schedule = schedule_monitor.observe(project_id, state, version, changed_tasks=[task_name], limit=5)
+    flagged = progress_monitor.claim(project_id, report["flagged"])
+    job = _submit_agent_cycle(deviation_prompt(flagged), project_id, flagged) if flagged else None
 
-    state["tasks"][task_name]["status"] = progress.get("progress", "updated")
-    set_state.invoke({"state": state})
+    return JSONResponse(
+        content={
+            "status": "updated",
+            "version": version,
+            "changes": ops,
+            "deviations": report["deviations"],
+            "flagged": report["flagged"],
+            "schedule": schedule,
+            "agent_job": job.to_dict() if job else None,
+        },
+        headers={"ETag": _etag(version)},
+    )
 
-    return {"status": "updated", "state": state}
\ No newline at end of file
+app.include_router(project_routes)
+app.include_router(project_routes, prefix="/projects/{project_id}")
@@ -0,0 +1,50 @@
+"""Per-request agent construction overhead: build_agent() vs the cached get_agent().
+
+Run from src/:
+
+    python -m benchmarks.agent_build --iterations 50
+
+No network calls are made; dummy credentials are used when none are set.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+
+def _time_calls(fn, iterations: int) -> dict:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def run(iterations: int = 50) -> dict:
+    os.environ.setdefault("HOLISTIC_AI_TEAM_ID", "benchmark")
+    os.environ.setdefault("HOLISTIC_AI_API_TOKEN", "benchmark")
+
+    from agent_core.agent import build_agent, get_agent, invalidate_agent_cache
+
+    invalidate_agent_cache()
+    results = {"build_agent": _time_calls(build_agent, iterations)}
+    get_agent()  # warm the cache, as app startup does
+    results["get_agent"] = _time_calls(get_agent, iterations)
+    results["saved_per_request_ms"] = results["build_agent"]["p50_ms"] - results["get_agent"]["p50_ms"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations), indent=2))
@@ -0,0 +1,339 @@
+"""Offline benchmark suite: agent latency, API throughput, ingestion, embeddings.
+
+Run from src/:
+
+    python -m benchmarks.suite                       # everything, default sizes
+    python -m benchmarks.suite --only ingestion embeddings
+    python -m benchmarks.suite --baseline .cache/benchmarks/<old>.json
+
+Everything runs locally. The app under test talks to ``api.fake_proxy`` on a
+local port, replaying a scripted tool sequence (get_state -> set_state ->
+ProjectOutputModel) with ``--proxy-latency-ms`` per call. State, parse cache
+and uploads live in a temporary directory. Results are written as JSON
+(default ``.cache/benchmarks/<commit>-<timestamp>.json``); ``--baseline``
+prints the relative change of every timing against an earlier result file.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.server import free_port, serve
+from benchmarks.synthetic import SyntheticEncoder, lorem, write_docx, write_pdf
+
+PLAN = {
+    "project_title": "Benchmark Project",
+    "deadline": "2025-06-01",
+    "team_summary": [
+        {
+            "user": f"member{i}",
+            "expertise": "analysis",
+            "assigned_tasks": [
+                {
+                    "name": f"task{i}-{j}",
+                    "description": lorem(20, i * 10 + j),
+                    "deadline": "2025-05-01",
+                    "status": "todo",
+                    "assigned_to": f"member{i}",
+                }
+                for j in range(3)
+            ],
+        }
+        for i in range(4)
+    ],
+}
+
+AGENT_SCRIPT = [
+    {"content": [{"type": "tool_use", "name": "get_state", "input": {}}]},
+    {"content": [{"type": "tool_use", "name": "set_state", "input": {"state": PLAN}}]},
+    {"content": [{"type": "tool_use", "name": "ProjectOutputModel", "input": PLAN}]},
+]
+
+
+def summarize(samples_ms: List[float]) -> dict:
+    ordered = sorted(samples_ms)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": ordered[len(ordered) // 2],
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max_ms": ordered[-1],
+    }
+
+
+def _wait_for_job(client, job_id: str, poll_s: float = 0.005) -> dict:
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed", "cancelled", "timed_out"):
+            return job
+        time.sleep(poll_s)
+
+
+def bench_run_agent(app_url: str, iterations: int, fake) -> dict:
+    """End-to-end latency of POST /run-agent until its job has finished."""
+    import httpx
+
+    samples = []
+    failures = 0
+    calls_before = fake.state.requests
+    with httpx.Client(base_url=app_url, timeout=60) as client:
+        for _ in range(iterations):
+            started = time.perf_counter()
+            job = client.post("/run-agent?force=true").json()
+            job = _wait_for_job(client, job["job_id"])
+            samples.append((time.perf_counter() - started) * 1000)
+            failures += job["status"] != "succeeded"
+    return {
+        **summarize(samples),
+        "failures": failures,
+        "proxy_calls_per_run": (fake.state.requests - calls_before) / iterations,
+    }
+
+
+def bench_http_throughput(app_url: str, requests: int, concurrency: int, agent_runs: int) -> dict:
+    """Requests/s for a cheap read endpoint and agent jobs/s under concurrent clients."""
+    import httpx
+
+    async def hammer(path: str) -> dict:
+        latencies: List[float] = []
+        queue = list(range(requests))
+
+        async with httpx.AsyncClient(base_url=app_url, timeout=60) as client:
+            async def worker():
+                while queue:
+                    queue.pop()
+                    started = time.perf_counter()
+                    response = await client.get(path)
+                    response.raise_for_status()
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+        return {"requests_per_s": requests / elapsed, **summarize(latencies)}
+
+    async def agent_jobs() -> dict:
+        async with httpx.AsyncClient(base_url=app_url, timeout=60) as client:
+            started = time.perf_counter()
+            job_ids = []
+            for _ in range(agent_runs):
+                response = await client.post("/run-agent?force=true")
+                if response.status_code == 202:
+                    job_ids.append(response.json()["job_id"])
+            pending = set(job_ids)
+            while pending:
+                for job_id in list(pending):
+                    job = (await client.get(f"/jobs/{job_id}")).json()
+                    if job["status"] not in ("queued", "running"):
+                        pending.discard(job_id)
+                await asyncio.sleep(0.01)
+            elapsed = time.perf_counter() - started
+        return {"submitted": len(job_ids), "rejected": agent_runs - len(job_ids), "jobs_per_s": len(job_ids) / elapsed}
+
+    return {
+        "concurrency": concurrency,
+        "get_project_state": asyncio.run(hammer("/project-state")),
+        "run_agent_jobs": asyncio.run(agent_jobs()),
+    }
+
+
+def bench_ingestion(workdir: str, pdfs: int, pages: int, docx: int) -> dict:
+    """Cold (parse) and warm (parse cache) throughput of ingest_files over synthetic files."""
+    from agent_core.ingest import ingest_files, shutdown_ingest_pool
+
+    folder = os.path.join(workdir, "ingest")
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(pdfs):
+        paths.append(os.path.join(folder, f"brief{i}.pdf"))
+        write_pdf(paths[-1], pages=pages, seed=i)
+    for i in range(docx):
+        paths.append(os.path.join(folder, f"notes{i}.docx"))
+        write_docx(paths[-1], seed=i)
+    total_bytes = sum(os.path.getsize(p) for p in paths)
+
+    def run() -> dict:
+        started = time.perf_counter()
+        results = list(ingest_files(paths))
+        elapsed = time.perf_counter() - started
+        ok = [r for r in results if r["status"] == "OK"]
+        return {
+            "seconds": elapsed,
+            "files_per_s": len(ok) / elapsed,
+            "mb_per_s": total_bytes / elapsed / 1e6,
+            "errors": len(results) - len(ok),
+            "cache_hits": sum(1 for r in ok if r.get("cache_hit")),
+            "chars": sum(len(r["content"]) for r in ok),
+        }
+
+    try:
+        cold = run()
+        warm = run()
+    finally:
+        shutdown_ingest_pool()
+    return {"files": len(paths), "pdf_pages": pdfs * pages, "bytes": total_bytes, "cold": cold, "warm": warm}
+
+
+def bench_embeddings(texts: int, concurrency: int, batch_per_call: int) -> dict:
+    """Texts/s through the batching worker from concurrent callers."""
+    from agent_core.embedding_worker import DEFAULT_BACKEND, DEFAULT_MODEL, EmbeddingWorker, load_encoder
+
+    try:
+        encoder, kind = load_encoder(DEFAULT_MODEL, DEFAULT_BACKEND), DEFAULT_MODEL
+    except Exception:
+        # No model available offline: measure the batching path with a synthetic encoder
+        encoder, kind = SyntheticEncoder(), "synthetic"
+
+    worker = EmbeddingWorker(encoder=encoder)
+    corpus = [lorem(60, i) for i in range(texts)]
+    calls = [corpus[i:i + batch_per_call] for i in range(0, texts, batch_per_call)]
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def caller(chunk: List[List[str]]) -> None:
+        for batch in chunk:
+            started = time.perf_counter()
+            worker.embed(batch)
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    worker.embed(corpus[:1])  # load/warm the encoder outside the timing
+    threads = [threading.Thread(target=caller, args=(calls[i::concurrency],)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    stats = worker.stats()
+    worker.close()
+    return {
+        "encoder": kind,
+        "texts": texts,
+        "concurrency": concurrency,
+        "texts_per_s": texts / elapsed,
+        "call_latency": summarize(latencies),
+        "worker": {k: v for k, v in stats.items() if isinstance(v, (int, float))},
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(baseline: dict, current: dict, prefix: str = "") -> List[str]:
+    """Relative change of every numeric *_ms / *_per_s / seconds leaf present in both."""
+    lines = []
+    for key, value in current.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and isinstance(old, dict):
+            lines.extend(compare(old, value, path + "."))
+        elif (
+            isinstance(value, (int, float)) and isinstance(old, (int, float)) and old
+            and (key.endswith("_ms") or key.endswith("_per_s") or key == "seconds")
+        ):
+            better = value > old if key.endswith("_per_s") else value < old
+            lines.append(f"{path}: {old:.2f} -> {value:.2f} ({(value - old) / old:+.1%}{'' if better else ' worse'})")
+    return lines
+
+
+BENCHMARKS = ("run_agent", "http", "ingestion", "embeddings")
+
+
+def main(argv: List[str] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="*", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--iterations", type=int, default=20, help="sequential /run-agent runs")
+    parser.add_argument("--proxy-latency-ms", type=float, default=50)
+    parser.add_argument("--requests", type=int, default=500, help="read requests for the throughput test")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--agent-runs", type=int, default=16, help="concurrent /run-agent submissions")
+    parser.add_argument("--pdfs", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--docx", type=int, default=8)
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="agent-bench-")
+    proxy_port = free_port()
+    # Must be set before agent_core is imported: endpoints and paths are read at import time
+    os.environ.update({
+        "HOLISTIC_AI_API_ENDPOINT": f"http://127.0.0.1:{proxy_port}/invoke",
+        "HOLISTIC_AI_TEAM_ID": "benchmark",
+        "HOLISTIC_AI_API_TOKEN": "benchmark",
+        "HOLISTIC_AI_RESPONSE_CACHE": "0",
+        "STATE_DB_PATH": os.path.join(workdir, "state.sqlite3"),
+        "PARSE_CACHE_DIR": os.path.join(workdir, "parsed"),
+        "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+        "TRACE_EXPORTERS": os.getenv("TRACE_EXPORTERS", "none"),
+        "HF_HUB_OFFLINE": "1",
+    })
+    os.makedirs(os.environ["UPLOAD_FOLDER"], exist_ok=True)
+
+    results: Dict[str, object] = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+    }
+
+    def timed(name: str, fn: Callable[[], dict]) -> None:
+        print(f"running {name}...", file=sys.stderr)
+        results[name] = fn()
+
+    try:
+        if {"run_agent", "http"} & set(args.only):
+            from api.fake_proxy import create_app
+            from api.main import app
+
+            fake = create_app(AGENT_SCRIPT, latency_ms=args.proxy_latency_ms)
+            with serve(fake, proxy_port), serve(app) as app_url:
+                if "run_agent" in args.only:
+                    timed("run_agent", lambda: bench_run_agent(app_url, args.iterations, fake))
+                if "http" in args.only:
+                    timed("http", lambda: bench_http_throughput(app_url, args.requests, args.concurrency, args.agent_runs))
+        if "ingestion" in args.only:
+            timed("ingestion", lambda: bench_ingestion(workdir, args.pdfs, args.pages, args.docx))
+        if "embeddings" in args.only:
+            timed("embeddings", lambda: bench_embeddings(args.texts, args.concurrency, 8))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(".cache", "benchmarks", f"{results['commit']}-{int(time.time())}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"results written to {output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nvs {args.baseline} ({baseline.get('commit')}):", file=sys.stderr)
+        for line in compare({k: baseline.get(k) for k in BENCHMARKS}, {k: results.get(k) for k in BENCHMARKS}):
+            print("  " + line, file=sys.stderr)
+    return results
+
+
+if __name__ == "__main__":
+    main()
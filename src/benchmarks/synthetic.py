@@ -0,0 +1,123 @@
+"""Offline fixtures for the benchmarks: synthetic PDF/DOCX files and an encoder.
+
+The PDF and DOCX writers only use the standard library. They produce minimal
+but valid files that pypdf and docx2txt extract text from, so ingestion is
+measured through the same loaders as real uploads.
+"""
+
+import hashlib
+import random
+import zipfile
+from typing import List
+
+import numpy as np
+
+WORDS = (
+    "project deliverable deadline milestone report analysis design prototype "
+    "evaluation interview survey dataset model results discussion conclusion "
+    "team member review feedback schedule requirement scope risk budget"
+).split()
+
+
+def lorem(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: int = 10, words_per_page: int = 300, seed: int = 0) -> None:
+    """Write a text PDF with one Helvetica content stream per page."""
+    objects: List[bytes] = []
+    page_ids = [3 + 2 * i for i in range(pages)]
+    font_id = 3 + 2 * pages
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode())
+    for i in range(pages):
+        words = lorem(words_per_page, seed * 10007 + i).split()
+        lines = [" ".join(words[j:j + 12]) for j in range(0, len(words), 12)]
+        ops = ["BT", "/F1 10 Tf", "14 TL", "50 780 Td"]
+        ops += [f"({_pdf_escape(line)}) '" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {page_ids[i] + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(bytes(out))
+
+
+def write_docx(path: str, paragraphs: int = 50, words_per_paragraph: int = 60, seed: int = 0) -> None:
+    """Write a minimal WordprocessingML document."""
+    body = "".join(
+        f"<w:p><w:r><w:t>{lorem(words_per_paragraph, seed * 10007 + i)}</w:t></w:r></w:p>"
+        for i in range(paragraphs)
+    )
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f"<w:body>{body}</w:body></w:document>"
+    )
+    content_types = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/word/document.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+        "</Types>"
+    )
+    rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="word/document.xml"/></Relationships>'
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", content_types)
+        z.writestr("_rels/.rels", rels)
+        z.writestr("word/document.xml", document)
+
+
+class SyntheticEncoder:
+    """Hashing bag-of-words encoder with the sentence-transformers ``encode`` API.
+
+    Used when no embedding model is available offline; it exercises the
+    batching worker with a deterministic, CPU-bound projection.
+    """
+
+    def __init__(self, dimension: int = 768, seed: int = 0):
+        self._dimension = dimension
+        self._projection = np.random.default_rng(seed).standard_normal((4096, dimension)).astype(np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    def encode(self, texts, batch_size: int = 32, normalize_embeddings: bool = True, convert_to_numpy: bool = True, **_):
+        counts = np.zeros((len(texts), self._projection.shape[0]), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                bucket = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), "little") % 4096
+                counts[row, bucket] += 1
+        vectors = counts @ self._projection
+        if normalize_embeddings:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Keep the API's module-level stores out of the working tree; set before any
+# test module imports agent_core.tools
+os.environ.setdefault("STATE_STORE", "memory")
+os.environ.setdefault("UPLOAD_FOLDER", tempfile.mkdtemp(prefix="uploads-"))
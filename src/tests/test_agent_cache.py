@@ -0,0 +1,57 @@
+import logging
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent_core.agent as agent_module
+import api.main as main
+from agent_core.jobs import JobManager
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    built = []
+
+    def build_agent(model_name, tools):
+        built.append(model_name)
+        return object()
+
+    monkeypatch.setattr(agent_module, "build_agent", build_agent)
+    monkeypatch.setattr(agent_module, "_agent_cache", {})
+    return built
+
+
+def test_agent_is_built_once_per_model_and_tool_set(builds):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(agent_module.get_agent("m"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert builds == ["m"] and len(set(map(id, results))) == 1
+    assert agent_module.get_agent("m", tools=agent_module.TOOLS[:2]) is not results[0]
+    assert builds == ["m", "m"]
+
+
+def test_invalidation_drops_only_the_named_model(builds):
+    first = agent_module.get_agent("m")
+    agent_module.get_agent("other")
+    assert agent_module.invalidate_agent_cache("m") == 1
+    assert agent_module.get_agent("m") is not first
+    assert agent_module.invalidate_agent_cache() == 2
+
+
+def test_lifespan_prebuilds_the_agent_and_shuts_pools_down(monkeypatch, caplog):
+    def missing_credentials():
+        raise ValueError("HOLISTIC_AI_TEAM_ID and HOLISTIC_AI_API_TOKEN not set.")
+
+    jobs = JobManager(max_workers=1)
+    monkeypatch.setattr(main, "get_agent", missing_credentials)
+    monkeypatch.setattr(main, "jobs", jobs)
+    with caplog.at_level(logging.WARNING, logger="api.main"):
+        with TestClient(main.app) as client:
+            assert client.get("/jobs").status_code == 200
+    assert "Agent not prebuilt at startup" in caplog.text
+    with pytest.raises(RuntimeError):
+        jobs.submit(lambda: None)
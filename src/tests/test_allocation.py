@@ -0,0 +1,106 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from agent_core.allocation import (
+    AllocationError,
+    _successive_shortest_paths,
+    allocate,
+    build_cost_matrix,
+    capacities,
+    load_limit,
+    solve_assignment,
+    state_users,
+)
+
+
+def brute_force(cost, capacity):
+    n_users, n_tasks = cost.shape
+    best = None
+    for assignment in itertools.product(range(n_users), repeat=n_tasks):
+        if (np.bincount(assignment, minlength=n_users) > capacity).any():
+            continue
+        total = cost[list(assignment), np.arange(n_tasks)].sum()
+        best = total if best is None else min(best, total)
+    return best
+
+
+def objective(cost, assignment):
+    return cost[assignment, np.arange(cost.shape[1])].sum()
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_capacitated_solver_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n_users, n_tasks = rng.integers(2, 4), rng.integers(2, 7)
+    cost = rng.random((n_users, n_tasks))
+    if seed % 3 == 0:
+        cost = np.round(cost * 3)  # ties
+    capacity = rng.integers(1, n_tasks + 1, size=n_users)
+    capacity[rng.integers(n_users)] += max(0, n_tasks - capacity.sum())
+
+    for solver in (_successive_shortest_paths, solve_assignment):
+        assignment = solver(cost, capacity)
+        assert (np.bincount(assignment, minlength=n_users) <= capacity).all()
+        assert objective(cost, assignment) == pytest.approx(brute_force(cost, capacity))
+
+
+def random_state(seed):
+    rng = np.random.default_rng(seed)
+    skills = ["api", "ui", "data"]
+    users = [{"name": f"u{i}", "skills": {s: int(rng.integers(0, 4)) for s in skills}} for i in range(3)]
+    tasks = [
+        {"name": f"t{j}", "skills": [skills[rng.integers(3)]], "effort": int(rng.integers(1, 6))}
+        for j in range(rng.integers(4, 8))
+    ]
+    return {"tasks": tasks, "users": users}
+
+
+def brute_force_fair(state):
+    """Cheapest plan within capacity, and cheapest that is also fair."""
+    users, tasks = state_users(state), state["tasks"]
+    cost = build_cost_matrix(users, tasks)["cost"]
+    effort = np.array([t["effort"] for t in tasks], dtype=float)
+    capacity, limit = capacities(users, len(tasks)), load_limit(effort, len(users))
+    best = best_fair = np.inf
+    for assignment in itertools.product(range(len(users)), repeat=len(tasks)):
+        if (np.bincount(assignment, minlength=len(users)) > capacity).any():
+            continue
+        total = objective(cost, list(assignment))
+        best = min(best, total)
+        if (np.bincount(assignment, weights=effort, minlength=len(users)) <= limit + 1e-9).all():
+            best_fair = min(best_fair, total)
+    return best, best_fair
+
+
+def test_allocate_is_optimal_or_close_to_the_cheapest_fair_plan():
+    gaps = []
+    for seed in range(60):
+        state = random_state(seed)
+        plan = allocate(state)
+        best, best_fair = brute_force_fair(state)
+        assert plan["fairness"]["fair"]
+        if plan["reoptimisations"] == 0:
+            assert plan["objective"] == pytest.approx(best)
+        else:
+            gaps.append((plan["objective"] - best_fair) / abs(best_fair))
+    assert gaps, "no instance exercised re-optimisation"
+    assert max(gaps) <= 0.1
+    assert np.median(gaps) < 1e-9
+
+
+def test_insufficient_capacity_is_an_error():
+    with pytest.raises(AllocationError):
+        solve_assignment(np.zeros((2, 5)), np.array([1, 1]))
+
+
+def test_allocate_reports_assignments_per_task_index():
+    state = {
+        "tasks": [{"name": "t"}, {"name": "t"}, {"name": "t2"}],
+        "users": [{"name": "u1"}, {"name": "u2"}],
+    }
+    plan = allocate(state)
+    assert [index for index, _ in plan["task_assignments"]] == [0, 1, 2]
+    assert {user for _, user in plan["task_assignments"]} <= {"u1", "u2"}
+    assert plan["fairness"]["fair"]
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from agent_core.streaming import StreamAccumulator, iter_stream_events
+from api.fake_proxy import create_app
+from benchmarks.suite import compare, summarize
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = [
+    {"content": [{"type": "tool_use", "name": "get_state", "input": {}}]},
+    {"content": [{"type": "text", "text": "All tasks are assigned"}]},
+]
+
+
+def conversation(turns):
+    messages = [{"role": "user", "content": "plan"}]
+    for _ in range(turns):
+        messages += [{"role": "assistant", "content": "..."}, {"role": "user", "content": "..."}]
+    return {"messages": messages}
+
+
+def test_fake_proxy_replays_the_script_per_assistant_turn():
+    fake = create_app(script=SCRIPT, latency_ms=0, token_delay_ms=0)
+    client = TestClient(fake)
+    first, second, later = (client.post("/invoke", json=conversation(n)).json() for n in (0, 1, 5))
+
+    (tool_use,) = first["content"]
+    assert tool_use["name"] == "get_state" and tool_use["id"].startswith("toolu_")
+    assert second["content"] == later["content"] == SCRIPT[1]["content"]  # the last entry repeats
+    assert first["usage"]["input_tokens"] > 0 and first["usage"]["output_tokens"] > 0
+    assert fake.state.requests == 3
+
+
+def test_fake_proxy_streams_events_that_rebuild_the_response():
+    client = TestClient(create_app(script=SCRIPT, latency_ms=0, token_delay_ms=0))
+    plain = client.post("/invoke", json=conversation(1)).json()
+    streamed = client.post("/invoke", json={**conversation(1), "stream": True})
+    assert streamed.headers["content-type"].startswith("text/event-stream")
+
+    accumulator = StreamAccumulator()
+    for event in iter_stream_events(streamed.iter_lines()):
+        accumulator.feed(event)
+    result = accumulator.result()
+    assert result["content"][0]["text"].strip() == plain["content"][0]["text"]
+    assert result["stop_reason"] == "end_turn" and result["usage"] == plain["usage"]
+
+
+def test_summarize_and_compare():
+    stats = summarize([float(ms) for ms in range(100, 0, -1)])
+    assert stats == {"n": 100, "mean_ms": 50.5, "p50_ms": 51.0, "p95_ms": 96.0, "max_ms": 100.0}
+
+    baseline = {"run_agent": {"p50_ms": 100.0, "n": 20}, "embeddings": {"texts_per_s": 200.0, "seconds": 2.0}}
+    current = {"run_agent": {"p50_ms": 50.0, "n": 40}, "embeddings": {"texts_per_s": 100.0, "seconds": 2.0}, "http": {}}
+    assert compare(baseline, current) == [
+        "run_agent.p50_ms: 100.00 -> 50.00 (-50.0%)",
+        "embeddings.texts_per_s: 200.00 -> 100.00 (-50.0% worse)",
+        "embeddings.seconds: 2.00 -> 2.00 (+0.0% worse)",
+    ]
+
+
+def test_suite_runs_offline_and_compares_against_a_baseline(tmp_path):
+    # A subprocess, since the suite points agent_core at its own paths through os.environ
+    output = tmp_path / "run.json"
+    command = [
+        sys.executable, "-m", "benchmarks.suite", "--only", "run_agent", "embeddings",
+        "--iterations", "2", "--proxy-latency-ms", "0", "--texts", "40", "--concurrency", "2",
+    ]
+    subprocess.run(command + ["--output", str(output)], cwd=SRC, check=True, capture_output=True, timeout=300)
+    results = json.loads(output.read_text())
+    assert results["run_agent"]["n"] == 2 and results["run_agent"]["failures"] == 0
+    assert results["run_agent"]["proxy_calls_per_run"] == 3  # get_state -> set_state -> ProjectOutputModel
+    assert results["embeddings"]["texts_per_s"] > 0
+    assert "http" not in results and "ingestion" not in results
+
+    rerun = subprocess.run(
+        command + ["--output", str(tmp_path / "rerun.json"), "--baseline", str(output)],
+        cwd=SRC, check=True, capture_output=True, text=True, timeout=300,
+    )
+    assert "run_agent.p50_ms:" in rerun.stderr and "embeddings.texts_per_s:" in rerun.stderr
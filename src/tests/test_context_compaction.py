@@ -0,0 +1,70 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import agent_core.tools as tools
+from agent_core.context_compaction import ContextCompactor, ReferenceStore
+from agent_core.holistic_ai_bedrock import HolisticAIBedrockChat
+
+
+def tool_turn(call_id, content):
+    return [
+        {"role": "assistant", "content": [{"type": "tool_use", "id": call_id, "name": "load", "input": {}}]},
+        {"role": "user", "content": [{"type": "tool_result", "tool_use_id": call_id, "content": content}]},
+    ]
+
+
+def results(messages):
+    return [m["content"][0]["content"] for m in messages if m["role"] == "user" and isinstance(m["content"], list)]
+
+
+def test_repeated_results_keep_only_the_latest_copy():
+    document = "x" * 800
+    messages = tool_turn("t1", document) + tool_turn("t2", "short") + tool_turn("t3", document)
+    _, stats = ContextCompactor(budget_tokens=10 ** 6).compact(messages)
+    first, short, last = results(messages)
+    assert "Duplicate of the later tool result for t3" in first
+    assert (short, last, stats["deduplicated"], stats["elided"]) == ("short", document, 1, 0)
+
+
+def test_oldest_large_results_are_elided_until_under_budget():
+    store = ReferenceStore()
+    documents = [chr(ord("a") + i) * 4000 for i in range(6)]
+    messages = [{"role": "user", "content": "start"}]
+    for i, document in enumerate(documents):
+        messages += tool_turn(f"t{i}", document)
+    compactor = ContextCompactor(budget_tokens=4500, keep_recent=3, reference_store=store)
+    _, stats = compactor.compact(messages)
+    contents = results(messages)
+    assert stats["tokens_after"] <= 4500 < stats["tokens_before"]
+    assert contents[3:] == documents[3:]  # the most recent results are never elided
+    assert all(c.startswith("[Elided") for c in contents[:2]) and contents[2] == documents[2]
+    ref = contents[0].split("reference ")[1].split(".")[0]
+    assert store.get(ref) == documents[0]
+    assert [m.get("content")[0]["tool_use_id"] for m in messages[2::2]] == [f"t{i}" for i in range(6)]
+
+
+def test_elided_results_can_be_recalled_through_the_tool():
+    messages = [{"role": "user", "content": "start"}] + tool_turn("t0", "y" * 5000) + tool_turn("t1", "done")
+    ContextCompactor(budget_tokens=100, keep_recent=1).compact(messages)
+    ref = results(messages)[0].split("reference ")[1].split(".")[0]
+    assert tools.recall_tool_result.invoke({"ref": ref}) == "y" * 5000
+
+    small = ReferenceStore(max_entries=1)
+    old = small.put("one")
+    small.put("two")
+    assert small.get(old) is None
+
+
+def test_payload_is_compacted_before_sending():
+    model = HolisticAIBedrockChat(team_id="team", api_token="token", context_budget_tokens=1500)
+    history = [HumanMessage(content="go")]
+    for i in range(5):
+        history += [
+            AIMessage(content="", tool_calls=[{"name": "load", "args": {}, "id": f"t{i}"}]),
+            ToolMessage(content=str(i) * 3000, tool_call_id=f"t{i}"),
+        ]
+    payload, _ = model._build_payload(history)
+    sent = [b["content"] for m in payload["messages"] if isinstance(m["content"], list) for b in m["content"]
+            if b.get("type") == "tool_result"]
+    assert sent[0].startswith("[Elided") and sent[-1] == "4" * 3000
+    unbounded = HolisticAIBedrockChat(team_id="team", api_token="token", context_budget_tokens=None)
+    assert "[Elided" not in str(unbounded._build_payload(history)[0])
@@ -0,0 +1,54 @@
+import numpy as np
+
+from agent_core.embedding_cache import EmbeddingCache
+
+
+def encoder(calls):
+    def encode(texts):
+        calls.extend(texts)
+        return np.array([[len(t), sum(map(ord, t)) % 251, 1.0, 2.0] for t in texts], dtype=np.float32)
+    return encode
+
+
+def test_reopened_cache_serves_vectors_without_encoding(tmp_path):
+    calls = []
+    texts = ["alpha", "beta", "alpha", "gamma"]
+    first = EmbeddingCache("model", root=str(tmp_path)).embed(texts, encoder(calls))
+    assert calls == ["alpha", "beta", "gamma"]
+
+    calls.clear()
+    reopened = EmbeddingCache("model", root=str(tmp_path))
+    assert len(reopened) == 3
+    assert np.array_equal(reopened.embed(texts, encoder(calls)), first)
+    assert calls == []
+
+
+def test_instances_sharing_a_directory_do_not_overwrite_each_other(tmp_path):
+    encode = encoder([])
+    a = EmbeddingCache("model", root=str(tmp_path))
+    b = EmbeddingCache("model", root=str(tmp_path))
+    vector_a = a.embed(["A"], encode)
+    vector_b = b.embed(["B"], encode)
+    late = EmbeddingCache("model", root=str(tmp_path))
+    late.embed(["C"], encode)
+
+    calls = []
+    reopened = EmbeddingCache("model", root=str(tmp_path))
+    assert np.array_equal(reopened.embed(["A", "B"], encoder(calls)), np.vstack([vector_a, vector_b]))
+    assert calls == []
+    assert len(reopened) == 3
+
+
+def test_growth_past_initial_capacity(tmp_path):
+    texts = [f"text {i}" for i in range(3000)]
+    encode = encoder([])
+    EmbeddingCache("model", root=str(tmp_path)).embed(texts, encode)
+    reopened = EmbeddingCache("model", root=str(tmp_path))
+    assert np.array_equal(reopened.embed(texts, encoder([])), encode(texts).astype(np.float16))
+
+
+def test_models_are_kept_apart(tmp_path):
+    EmbeddingCache("one", root=str(tmp_path)).embed(["x"], encoder([]))
+    calls = []
+    EmbeddingCache("two", root=str(tmp_path)).embed(["x"], encoder(calls))
+    assert calls == ["x"]
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from agent_core.embedding_worker import EmbeddingWorker, load_encoder
+from benchmarks.synthetic import SyntheticEncoder
+
+
+class RecordingEncoder(SyntheticEncoder):
+    def __init__(self, fail=False):
+        super().__init__(dimension=16)
+        self.batches = []
+        self.fail = fail
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError("model crashed")
+        return super().encode(texts, **kwargs)
+
+
+@pytest.fixture
+def encoder():
+    return RecordingEncoder()
+
+
+@pytest.fixture
+def worker(encoder):
+    worker = EmbeddingWorker(encoder=encoder, max_batch_size=8, max_wait_ms=200)
+    yield worker
+    worker.close()
+
+
+def test_concurrent_requests_are_coalesced_and_split_back(worker, encoder):
+    texts = [[f"task {i} text {j}" for j in range(2)] for i in range(4)]
+    results = [None] * len(texts)
+    barrier = threading.Barrier(len(texts))
+
+    def call(i):
+        barrier.wait()
+        results[i] = worker.embed(texts[i], timeout=5)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(texts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(encoder.batches) == 1 and len(encoder.batches[0]) == 8
+    reference = SyntheticEncoder(dimension=16)
+    for request, vectors in zip(texts, results):
+        assert vectors.dtype == np.float16 and vectors.shape == (2, 16)
+        np.testing.assert_allclose(vectors, reference.encode(request), atol=1e-3)
+    assert worker.stats()["avg_batch_size"] == 8
+
+
+def test_batches_respect_the_size_cap_without_splitting_requests(worker, encoder):
+    futures = [worker.submit([f"text {i}-{j}" for j in range(3)]) for i in range(4)]
+    assert [f.result(timeout=5).shape[0] for f in futures] == [3, 3, 3, 3]
+    assert all(len(batch) <= 8 and len(batch) % 3 == 0 for batch in encoder.batches)
+
+
+def test_empty_and_async_requests(worker):
+    assert worker.embed([]).shape == (0, 0)
+    assert asyncio.run(worker.aembed(["one text"])).shape == (1, 16)
+    assert worker.dimension == 16
+
+
+def test_encoder_errors_fail_the_batch_and_the_worker_keeps_going():
+    encoder = RecordingEncoder(fail=True)
+    worker = EmbeddingWorker(encoder=encoder, max_wait_ms=50)
+    try:
+        futures = [worker.submit(["a"]), worker.submit(["b"])]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="model crashed"):
+                future.result(timeout=5)
+        encoder.fail = False
+        assert worker.embed(["a"], timeout=5).shape == (1, 16)
+    finally:
+        worker.close()
+
+
+def test_unknown_backend_is_rejected():
+    pytest.importorskip("sentence_transformers")
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        load_encoder("any", "tpu")
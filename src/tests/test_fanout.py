@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+
+from agent_core.fanout import afan_out, afan_out_pairs, fan_out, fan_out_pairs, item_key
+from agent_core.holistic_ai_bedrock import HolisticAIBedrockChat
+
+USERS = [{"name": "ana", "cv": "python"}, {"name": "ben", "cv": "design"}, {"name": "cy", "cv": "FAIL"}]
+
+
+class Peak:
+    def __init__(self):
+        self.running = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.running -= 1
+
+
+def extractor(peak):
+    def extract(prompt):
+        with peak:
+            time.sleep(0.05)
+        if "FAIL" in prompt:
+            raise ValueError("unreadable CV")
+        return prompt.upper()
+
+    return RunnableLambda(extract)
+
+
+def test_results_are_keyed_and_failures_isolated():
+    peak = Peak()
+    result = fan_out(extractor(peak), USERS, lambda u: f"skills: {u['cv']}", max_concurrency=2)
+    assert result.results == {"ana": "SKILLS: PYTHON", "ben": "SKILLS: DESIGN"}
+    assert isinstance(result.errors["cy"], ValueError)
+    assert peak.peak == 2
+
+
+def test_pairs_and_async_fan_out():
+    tasks = [{"id": 1}, {"id": 2}]
+    pairs = fan_out_pairs(RunnableLambda(lambda p: p), USERS[:2], tasks, lambda u, t: f"{u['name']}:{t['id']}")
+    assert pairs.results == {("ana", 1): "ana:1", ("ana", 2): "ana:2", ("ben", 1): "ben:1", ("ben", 2): "ben:2"}
+
+    async def run():
+        single = await afan_out(extractor(Peak()), USERS, lambda u: u["cv"])
+        both = await afan_out_pairs(RunnableLambda(lambda p: p), USERS[:1], tasks, lambda u, t: t["id"])
+        return single, both
+
+    single, both = asyncio.run(run())
+    assert single.results["ben"] == "DESIGN" and set(single.errors) == {"cy"}
+    assert both.results == {("ana", 1): 1, ("ana", 2): 2}
+
+
+def test_duplicate_keys_and_empty_input():
+    with pytest.raises(ValueError, match="Duplicate fan-out key"):
+        fan_out(RunnableLambda(str), [{"name": "a"}, {"name": "a"}], str)
+    assert fan_out(RunnableLambda(str), [], str) == ({}, {})
+    assert item_key({"user": "u"}) == "u" and item_key("plain") == "plain"
+
+
+class SlowChat(HolisticAIBedrockChat):
+    def __init__(self, **kwargs):
+        super().__init__(team_id="team", api_token="token", **kwargs)
+        object.__setattr__(self, "peak", Peak())
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        with self.peak:
+            time.sleep(0.05)
+        if messages[-1].content == "boom":
+            raise ValueError("proxy error")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=messages[-1].content))])
+
+
+def test_model_batch_is_bounded_by_its_max_concurrency():
+    model = SlowChat(max_concurrency=3)
+    outputs = model.batch([str(i) for i in range(8)] + ["boom"], return_exceptions=True)
+    assert [o.content for o in outputs[:8]] == [str(i) for i in range(8)]
+    assert isinstance(outputs[8], ValueError)
+    assert model.peak.peak == 3
+    assert model.batch([]) == []
+
+    override = SlowChat(max_concurrency=3)
+    override.batch([str(i) for i in range(6)], {"max_concurrency": 1})
+    assert override.peak.peak == 1
@@ -0,0 +1,59 @@
+import pytest
+
+import agent_core.ingest as ingest
+import agent_core.parse_cache as parse_cache
+from agent_core.ingest import ingest_files, parse_document, parse_pdf_pages, shutdown_ingest_pool
+from agent_core.parse_cache import ParseCache
+from benchmarks.synthetic import write_pdf
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ParseCache(root=str(tmp_path / "parsed"))
+    monkeypatch.setattr(parse_cache, "_parse_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def files(tmp_path):
+    pdf = tmp_path / "spec.pdf"
+    write_pdf(str(pdf), pages=5, words_per_page=40)
+    notes = tmp_path / "notes.txt"
+    notes.write_text("meeting notes")
+    return str(pdf), str(notes)
+
+
+@pytest.fixture
+def pool():
+    yield
+    shutdown_ingest_pool()
+
+
+def test_pdf_pages_are_extracted_per_range(files):
+    pdf, _ = files
+    pages = parse_pdf_pages(pdf, 0, 5)
+    assert len(pages) == 5 and all(pages)
+    assert parse_pdf_pages(pdf, 1, 3) == pages[1:3]
+    assert parse_pdf_pages(pdf, 4, 10) == pages[4:]
+    assert parse_document(pdf) == "\n".join(pages)
+
+
+def test_split_pdf_matches_the_single_file_parse_and_is_cached(cache, files, pool):
+    pdf, notes = files
+    results = {r["file_name"]: r for r in ingest_files([pdf, notes, pdf + ".missing"], pages_per_task=2)}
+    assert results["spec.pdf"]["content"] == parse_document(pdf)
+    assert results["notes.txt"]["content"] == "meeting notes"
+    assert results["spec.pdf.missing"]["status"] == "ERROR"
+    assert not results["spec.pdf"]["cache_hit"]
+
+    again = list(ingest_files([pdf]))
+    assert again[0]["cache_hit"] and again[0]["content"] == results["spec.pdf"]["content"]
+
+
+def test_single_file_and_bulk_parses_share_cache_entries(cache, files, pool, monkeypatch):
+    # Both paths must use the same extractor, whose output the cache key assumes
+    monkeypatch.setattr(ingest, "PyPDFLoader", None)
+    pdf, _ = files
+    text, _, hit = cache.load(pdf, parse_document)
+    (bulk,) = ingest_files([pdf], pages_per_task=1)
+    assert not hit and bulk["cache_hit"] and bulk["content"] == text
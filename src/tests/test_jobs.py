@@ -0,0 +1,80 @@
+import threading
+import time
+
+from agent_core.jobs import CANCELLED, FAILED, RUNNING, SUCCEEDED, TIMED_OUT, JobManager, raise_if_cancelled
+
+
+def wait_finished(job, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return job
+
+
+def cooperative(steps=200):
+    for _ in range(steps):
+        raise_if_cancelled()
+        time.sleep(0.005)
+    return "done"
+
+
+def test_cancel_reports_cancelled_only_once_the_work_stopped():
+    jobs = JobManager(max_workers=1)
+    release = threading.Event()
+
+    def work():
+        release.wait(1)
+        raise_if_cancelled()
+        return "done"
+
+    job = jobs.submit(work)
+    while job.status != RUNNING:
+        time.sleep(0.005)
+    jobs.cancel(job.id)
+    assert job.status == RUNNING and job.to_dict()["cancel_requested"]
+    release.set()
+    assert wait_finished(job).status == CANCELLED
+    assert job.result is None
+
+
+def test_timeout_stops_a_cooperative_job():
+    jobs = JobManager(max_workers=1, default_timeout=0.05)
+    job = wait_finished(jobs.submit(cooperative))
+    assert job.status == TIMED_OUT
+    assert job.finished_at - job.started_at < 0.5
+
+
+
+def test_on_finish_runs_for_every_outcome():
+    jobs = JobManager(max_workers=1)
+    seen = []
+    blocker = threading.Event()
+    running = jobs.submit(blocker.wait, 1, on_finish=lambda j: seen.append(j.status))
+    queued = jobs.submit(lambda: "never", on_finish=lambda j: seen.append(j.status))
+    jobs.cancel(queued.id)
+    blocker.set()
+    wait_finished(running)
+    failing = jobs.submit(lambda: 1 / 0, on_finish=lambda j: seen.append(j.status))
+    failing.future.result(timeout=2)  # _run returns once the callback has run
+    assert failing.status == FAILED
+    assert seen == [CANCELLED, SUCCEEDED, FAILED]
+
+
+def test_on_finish_runs_outside_the_manager_lock():
+    jobs = JobManager(max_workers=1)
+    follow_ups = []
+
+    def resubmit(job):
+        follow_ups.append(jobs.submit(lambda: "next"))
+
+    first = jobs.submit(lambda: "first", on_finish=resubmit)
+    first.future.result(timeout=2)
+    assert wait_finished(follow_ups[0]).result == "next"
+
+    queued_behind = threading.Event()
+    blocker = jobs.submit(queued_behind.wait, 1)
+    cancelled = jobs.submit(lambda: None, on_finish=lambda j: follow_ups.append(jobs.stats()))
+    jobs.cancel(cancelled.id)
+    queued_behind.set()
+    wait_finished(blocker)
+    assert follow_ups[-1]["jobs"]["cancelled"] == 1
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+import agent_core.parse_cache as parse_cache
+from agent_core.parse_cache import ParseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ParseCache(root=str(tmp_path / "parsed"))
+
+
+@pytest.fixture
+def doc(tmp_path):
+    path = tmp_path / "brief.txt"
+    path.write_text("brief")
+    return path
+
+
+def counting_parser(calls):
+    def parse(path):
+        calls.append(path)
+        with open(path, encoding="utf-8") as f:
+            return f.read().upper()
+
+    return parse
+
+
+def test_second_load_is_served_from_the_cache(cache, doc):
+    calls = []
+    text, digest, hit = cache.load(str(doc), counting_parser(calls))
+    again = cache.load(str(doc), counting_parser(calls))
+    assert (text, hit) == ("BRIEF", False) and again == ("BRIEF", digest, True)
+    assert len(calls) == 1
+
+
+def test_blobs_survive_a_restart_and_follow_content_not_name(cache, doc, tmp_path):
+    cache.load(str(doc), counting_parser([]))
+    copy = tmp_path / "copy.txt"
+    copy.write_text("brief")
+    calls = []
+    assert ParseCache(root=cache.root).load(str(copy), counting_parser(calls))[2]
+    assert calls == []
+
+
+def test_changed_file_is_reparsed(cache, doc):
+    cache.load(str(doc), counting_parser([]))
+    doc.write_text("revised brief")
+    os.utime(doc, ns=(1, 1))
+    text, _, hit = cache.load(str(doc), counting_parser([]))
+    assert (text, hit) == ("REVISED BRIEF", False)
+
+
+def test_unchanged_file_is_not_rehashed(cache, doc, monkeypatch):
+    digest = cache.file_digest(str(doc))
+    monkeypatch.setattr(parse_cache, "sha256_file", lambda path: pytest.fail("rehashed"))
+    assert cache.file_digest(str(doc)) == digest
+    assert ParseCache(root=cache.root).file_digest(str(doc)) == digest
+
+
+def test_loader_version_and_empty_text(cache):
+    cache.put("abc", "")
+    assert cache.get("abc") == ""
+    assert ParseCache(root=cache.root, loader_version="other").get("abc") is None
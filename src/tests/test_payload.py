@@ -0,0 +1,59 @@
+import json
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.tools import tool
+
+from agent_core.holistic_ai_bedrock import HolisticAIBedrockChat
+from agent_core.payload import PayloadBuilder, dumps
+
+
+@tool
+def lookup(name: str) -> str:
+    """Look up a task."""
+    return name
+
+
+@tool
+def assign(task: str, user: str) -> str:
+    """Assign a task."""
+    return task
+
+
+MESSAGES = [SystemMessage(content="You supervise projects."), HumanMessage(content="hi")]
+
+
+def chat(**kwargs):
+    return HolisticAIBedrockChat(team_id="team", api_token="token", **kwargs)
+
+
+def test_prompt_caching_is_off_by_default_and_keeps_the_plain_format():
+    model = chat().bind_tools([lookup, assign])
+    payload, _ = model._build_payload(MESSAGES)
+    assert payload["messages"][0] == {"role": "user", "content": "System: You supervise projects."}
+    assert [t["name"] for t in payload["tools"]] == ["lookup", "assign"]
+    assert "cache_control" not in json.dumps(payload)
+
+
+def test_prompt_caching_marks_the_end_of_the_static_prefix():
+    model = chat(prompt_caching=True).bind_tools([lookup, assign])
+    payload, _ = model._build_payload(MESSAGES)
+    assert payload["messages"][0]["content"] == [
+        {"type": "text", "text": "System: You supervise projects.", "cache_control": {"type": "ephemeral"}}
+    ]
+    assert "cache_control" not in payload["tools"][0]
+    assert payload["tools"][1]["cache_control"] == {"type": "ephemeral"}
+
+
+def test_static_prefix_is_built_once_per_bound_model():
+    model = chat().bind_tools([lookup])
+    first, _ = model._build_payload(MESSAGES)
+    second, _ = model._build_payload(MESSAGES + [HumanMessage(content="again")])
+    assert first["tools"] is second["tools"]
+    assert first["messages"][0] is second["messages"][0]
+
+
+def test_builder_skips_non_tools_and_serialises_compactly():
+    builder = PayloadBuilder([lookup, object()])
+    assert [d["name"] for d in builder.tool_definitions] == ["lookup"]
+    assert builder.input_schemas["lookup"]["properties"] == {"name": {"type": "string"}}
+    assert dumps({"a": [1, 2]}) == b'{"a":[1,2]}'
@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+
+from agent_core.progress import ProgressMonitor, Thresholds, evaluate_task
+
+TODAY = date(2026, 3, 10)
+
+
+def day(offset):
+    return (TODAY + timedelta(days=offset)).isoformat()
+
+
+def state(**statuses):
+    return {"tasks": {name: {"status": s, "start": day(-5), "deadline": day(5)} for name, s in statuses.items()}}
+
+
+def test_deviation_kinds():
+    thresholds = Thresholds()
+    assert evaluate_task({"name": "a", "status": "10%", "start": day(-5), "deadline": day(5)}, TODAY, thresholds)["kind"] == "behind"
+    assert evaluate_task({"name": "a", "status": "90%", "deadline": day(-1)}, TODAY, thresholds)["kind"] == "overdue"
+    assert evaluate_task({"name": "a", "status": "blocked"}, TODAY, thresholds)["kind"] == "blocked"
+    assert evaluate_task({"name": "a", "status": "done", "deadline": day(-1)}, TODAY, thresholds) is None
+    assert evaluate_task({"name": "a", "status": "50%", "start": day(-5), "deadline": day(5)}, TODAY, thresholds) is None
+
+
+def test_incremental_update_evaluates_only_the_changed_task():
+    monitor = ProgressMonitor()
+    monitor.observe("p", state(a="50%", b="50%"), 1, today=TODAY)
+    changed = state(a="10%", b="50%")
+    report = monitor.observe("p", changed, 2, changed_tasks=["a"], today=TODAY)
+    assert report["incremental"] and report["evaluated"] == 1
+    assert [d["task"] for d in report["flagged"]] == ["a"]
+
+
+def test_claimed_deviations_stay_flagged_until_claimed_and_are_released_on_failure():
+    monitor = ProgressMonitor()
+    flagged = monitor.observe("p", state(a="10%"), 1, today=TODAY)["flagged"]
+    assert monitor.observe("p", state(a="10%"), 1, today=TODAY)["flagged"] == flagged  # not yet claimed
+
+    assert monitor.claim("p", flagged) == flagged
+    assert monitor.claim("p", flagged) == []  # a concurrent caller gets nothing
+    assert monitor.observe("p", state(a="10%"), 1, today=TODAY)["flagged"] == []
+
+    monitor.release("p", flagged)
+    assert monitor.observe("p", state(a="10%"), 1, today=TODAY)["flagged"] == flagged
+
+
+def test_resolved_deviation_is_flagged_again_when_it_returns():
+    monitor = ProgressMonitor()
+    monitor.claim("p", monitor.observe("p", state(a="10%"), 1, today=TODAY)["flagged"])
+    monitor.observe("p", state(a="60%"), 2, changed_tasks=["a"], today=TODAY)
+    assert monitor.observe("p", state(a="10%"), 3, changed_tasks=["a"], today=TODAY)["flagged"]
@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent_core.projects import (
+    DEFAULT_PROJECT_ID,
+    InvalidProjectError,
+    current_project_id,
+    project_lock,
+    project_namespace,
+    project_run_config,
+    project_scope,
+    validate_project_id,
+)
+
+
+@pytest.mark.parametrize("project_id", ["", "../etc", "a/b", "-lead", "x" * 65, None])
+def test_unsafe_project_ids_are_rejected(project_id):
+    with pytest.raises(InvalidProjectError):
+        validate_project_id(project_id)
+
+
+def test_scope_selects_the_namespace():
+    assert current_project_id() == DEFAULT_PROJECT_ID
+    with project_scope("team-1"):
+        assert project_namespace() == ("project", "team-1")
+        with project_scope(None):
+            assert current_project_id() == "team-1"
+    assert current_project_id() == DEFAULT_PROJECT_ID
+
+
+def test_run_config_keeps_other_configurable_keys():
+    config = project_run_config("team-1", {"configurable": {"thread_id": "t"}, "tags": ["x"]})
+    assert config == {"configurable": {"thread_id": "t", "project_id": "team-1"}, "tags": ["x"]}
+
+
+def test_lock_is_shared_per_project():
+    assert project_lock("a") is project_lock("a")
+    assert project_lock("a") is not project_lock("b")
+
+
+def test_projects_lock_independently():
+    lock_a, lock_b = project_lock("a"), project_lock("b")
+    with lock_a:
+        assert not lock_a.acquire(timeout=0.01)
+        assert lock_b.acquire(timeout=0.01)
+        lock_b.release()
+
+
+def test_async_lock_waits_without_blocking_the_loop():
+    lock = project_lock("async")
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.005)
+
+    async def scenario():
+        holder = threading.Thread(target=lambda: (lock.acquire(), time.sleep(0.05), lock.release()))
+        holder.start()
+        while not lock.locked():
+            await asyncio.sleep(0.001)
+        tick = asyncio.ensure_future(ticker())
+        async with lock:
+            assert len(ticks) == 5  # the loop kept running while the lock was held elsewhere
+        await tick
+        holder.join()
+
+    asyncio.run(scenario())
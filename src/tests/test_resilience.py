@@ -0,0 +1,141 @@
+import asyncio
+import time
+
+import pytest
+
+from agent_core.resilience import CircuitBreaker, CircuitOpenError, Resilience, get_resilience
+
+
+class TransportError(Exception):
+    pass
+
+
+class Response:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.headers = {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+
+def is_transport(error):
+    return isinstance(error, TransportError)
+
+
+def failing():
+    raise TransportError()
+
+
+def open_breaker(resilience):
+    with pytest.raises(TransportError):
+        resilience.call(failing, is_transport)
+    assert resilience.breaker.state == "open"
+
+
+def test_breaker_opens_after_threshold_and_closes_after_successful_probe():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_probe_that_raises_a_non_transport_error_is_released():
+    resilience = Resilience(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    open_breaker(resilience)
+    time.sleep(0.06)
+
+    def bug():
+        raise KeyError("not a transport error")
+
+    with pytest.raises(KeyError):
+        resilience.call(bug, is_transport)
+    assert resilience.call(Response, is_transport).status_code == 200
+    assert resilience.breaker.state == "closed"
+
+
+def test_cancelled_async_probe_is_released():
+    resilience = Resilience(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    open_breaker(resilience)
+    time.sleep(0.06)
+
+    async def scenario():
+        async def slow():
+            await asyncio.sleep(1)
+            return Response()
+
+        async def ok():
+            return Response()
+
+        probe = asyncio.ensure_future(resilience.acall(slow, is_transport))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await resilience.acall(ok, is_transport)
+
+    assert asyncio.run(scenario()).status_code == 200
+
+
+def test_retryable_status_is_retried_then_returned():
+    resilience = Resilience(max_retries=2, base_delay=0, failure_threshold=10)
+    responses = [Response(503), Response(503), Response(200)]
+    assert resilience.call(lambda: responses.pop(0), is_transport).status_code == 200
+    assert resilience.breaker.state == "closed"
+
+
+def test_losing_hedge_response_is_closed():
+    resilience = Resilience(hedge=True, hedge_min_samples=1)
+    resilience.latency.record(0.01)
+    sent = []
+
+    def send():
+        response = Response()
+        sent.append(response)
+        time.sleep(0.1 if len(sent) == 1 else 0.01)
+        return response
+
+    winner = resilience.call(send, is_transport)
+    time.sleep(0.15)
+    assert len(sent) == 2
+    assert not winner.closed
+    assert all(r.closed for r in sent if r is not winner)
+
+
+def test_models_on_one_endpoint_share_breaker_and_bucket_but_not_retries():
+    url = "https://proxy.test/shared"
+    fast = get_resilience(url, max_retries=0, rate_limit=5.0, failure_threshold=1, reset_timeout=60)
+    patient = get_resilience(url, max_retries=3, rate_limit=50.0, failure_threshold=9, reset_timeout=60)
+    assert fast is get_resilience(url, max_retries=0, rate_limit=5.0, failure_threshold=1, reset_timeout=60)
+    assert (fast.max_retries, patient.max_retries) == (0, 3)
+    assert fast.endpoint is patient.endpoint and fast.limiter is patient.limiter
+    assert get_resilience("https://proxy.test/other").breaker is not fast.breaker
+
+    open_breaker(fast)
+    with pytest.raises(CircuitOpenError):
+        patient.call(Response, is_transport)
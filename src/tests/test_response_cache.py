@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+import agent_core.response_cache as response_cache
+from agent_core.holistic_ai_bedrock import HolisticAIBedrockChat
+from agent_core.response_cache import ResponseCache
+
+PAYLOAD = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "responses.sqlite")
+
+
+def accessed_at(path, key):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT accessed_at FROM responses WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_key_ignores_credentials_and_field_order():
+    key = ResponseCache.make_key({**PAYLOAD, "team_id": "a", "api_token": "secret"})
+    assert key == ResponseCache.make_key(dict(reversed(list(PAYLOAD.items()))))
+    assert key != ResponseCache.make_key({**PAYLOAD, "temperature": 0.5})
+
+
+def test_disk_tier_survives_a_new_instance(path):
+    ResponseCache(path).set("k", {"answer": 1})
+    cache = ResponseCache(path)
+    assert cache.get("k") == {"answer": 1} and cache.get("k") == {"answer": 1}
+    stats = cache.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["disk_entries"]) == (1, 1, 1)
+
+
+def test_expired_entries_are_misses(path):
+    cache = ResponseCache(path, ttl_seconds=0)
+    cache.set("k", {"answer": 1})
+    assert cache.get("k") is None
+    assert cache.stats()["disk_entries"] == 0
+
+
+def test_disk_tier_evicts_least_recently_used_past_the_byte_cap(path):
+    cache = ResponseCache(path, max_memory_entries=0, max_disk_bytes=60)
+    for key in "abc":
+        cache.set(key, {"v": key * 10})
+    cache.get("a")
+    cache.set("d", {"v": "d" * 10})
+    assert cache.get("a") is not None and cache.get("b") is None
+    assert cache.stats()["disk_bytes"] <= 60
+
+
+def test_disk_hits_touch_rows_in_batches(path, monkeypatch):
+    monkeypatch.setattr(response_cache, "_TOUCH_BATCH", 3)
+    cache = ResponseCache(path, max_memory_entries=0)
+    for key in "abc":
+        cache.set(key, {"v": key})
+    written = {key: accessed_at(path, key) for key in "abc"}
+    cache.get("a")
+    cache.get("b")
+    assert {key: accessed_at(path, key) for key in "ab"} == {"a": written["a"], "b": written["b"]}
+    cache.get("c")
+    assert all(accessed_at(path, key) > written[key] for key in "abc")
+
+
+def test_sampled_requests_bypass_the_cache_unless_opted_in():
+    cache = ResponseCache(path=None)
+    model = HolisticAIBedrockChat(team_id="team", api_token="token", response_cache=cache)
+    assert model.temperature > 0
+    assert model._cache_lookup({**PAYLOAD, "temperature": model.temperature}) == (None, None)
+    key, hit = model._cache_lookup(PAYLOAD)
+    assert key is not None and hit is None
+
+    sampled = {**PAYLOAD, "temperature": 0.7}
+    opted_in = HolisticAIBedrockChat(team_id="team", api_token="token", response_cache=cache, cache_sampled=True)
+    cache.set(ResponseCache.make_key(sampled), {"answer": 1})
+    assert opted_in._cache_lookup(sampled)[1] == {"answer": 1}
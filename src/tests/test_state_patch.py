@@ -0,0 +1,135 @@
+"""RFC 6902 (appendix A) cases and the field-path shorthand."""
+
+import pytest
+
+from agent_core.state_patch import PatchError, apply_patch, diff, escape_pointer_token
+
+
+def patched(doc, ops):
+    return apply_patch(doc, ops)[0]
+
+
+def test_add_object_member():
+    assert patched({"foo": "bar"}, [{"op": "add", "path": "/baz", "value": "qux"}]) == {"baz": "qux", "foo": "bar"}
+
+
+def test_add_array_element():
+    assert patched({"foo": ["bar", "baz"]}, [{"op": "add", "path": "/foo/1", "value": "qux"}]) == {
+        "foo": ["bar", "qux", "baz"]
+    }
+
+
+def test_add_to_end_of_array():
+    assert patched({"foo": ["bar"]}, [{"op": "add", "path": "/foo/-", "value": ["abc", "def"]}]) == {
+        "foo": ["bar", ["abc", "def"]]
+    }
+
+
+def test_remove_object_member():
+    assert patched({"baz": "qux", "foo": "bar"}, [{"op": "remove", "path": "/baz"}]) == {"foo": "bar"}
+
+
+def test_remove_array_element():
+    assert patched({"foo": ["bar", "qux", "baz"]}, [{"op": "remove", "path": "/foo/1"}]) == {"foo": ["bar", "baz"]}
+
+
+def test_replace_value():
+    doc = {"baz": "qux", "foo": "bar"}
+    assert patched(doc, [{"op": "replace", "path": "/baz", "value": "boo"}]) == {"baz": "boo", "foo": "bar"}
+
+
+def test_replace_missing_member_fails():
+    with pytest.raises(PatchError):
+        apply_patch({"foo": "bar"}, [{"op": "replace", "path": "/baz", "value": 1}])
+
+
+def test_move_value():
+    doc = {"foo": {"bar": "baz", "waldo": "fred"}, "qux": {"corge": "grault"}}
+    ops = [{"op": "move", "from": "/foo/waldo", "path": "/qux/thud"}]
+    assert patched(doc, ops) == {"foo": {"bar": "baz"}, "qux": {"corge": "grault", "thud": "fred"}}
+
+
+def test_move_array_element():
+    ops = [{"op": "move", "from": "/foo/1", "path": "/foo/3"}]
+    assert patched({"foo": ["all", "grass", "cows", "eat"]}, ops) == {"foo": ["all", "cows", "eat", "grass"]}
+
+
+def test_copy_is_independent_of_source():
+    doc = patched({"a": {"b": [1]}}, [{"op": "copy", "from": "/a", "path": "/c"}, {"op": "add", "path": "/c/b/-", "value": 2}])
+    assert doc == {"a": {"b": [1]}, "c": {"b": [1, 2]}}
+
+
+def test_test_success_and_failure():
+    doc = {"baz": "qux", "foo": ["a", 2, "c"]}
+    ops = [{"op": "test", "path": "/baz", "value": "qux"}, {"op": "test", "path": "/foo/1", "value": 2}]
+    assert patched(doc, ops) == doc
+    with pytest.raises(PatchError):
+        apply_patch({"baz": "qux"}, [{"op": "test", "path": "/baz", "value": "bar"}])
+
+
+def test_test_compares_strings_and_numbers_strictly():
+    with pytest.raises(PatchError):
+        apply_patch({"/": 9, "~1": 10}, [{"op": "test", "path": "/~01", "value": "10"}])
+
+
+def test_add_nested_member_object():
+    ops = [{"op": "add", "path": "/child", "value": {"grandchild": {}}}]
+    assert patched({"foo": "bar"}, ops) == {"foo": "bar", "child": {"grandchild": {}}}
+
+
+def test_unrecognised_members_are_ignored():
+    ops = [{"op": "add", "path": "/baz", "value": "qux", "xyz": 123}]
+    assert patched({"foo": "bar"}, ops) == {"foo": "bar", "baz": "qux"}
+
+
+def test_add_to_nonexistent_target_fails():
+    with pytest.raises(PatchError):
+        apply_patch({"foo": "bar"}, [{"op": "add", "path": "/baz/bat", "value": "qux"}])
+
+
+def test_escaped_pointer_tokens():
+    doc = {"/": 9, "~1": 10}
+    ops = [{"op": "test", "path": "/~01", "value": 10}, {"op": "replace", "path": "/~1", "value": 1}]
+    assert patched(doc, ops) == {"/": 1, "~1": 10}
+    assert escape_pointer_token("a/b~c") == "a~1b~0c"
+
+
+def test_array_index_out_of_range_fails():
+    with pytest.raises(PatchError):
+        apply_patch({"foo": [1]}, [{"op": "add", "path": "/foo/3", "value": 2}])
+
+
+def test_failed_patch_leaves_input_untouched():
+    doc = {"tasks": {"a": {"status": "todo"}}}
+    with pytest.raises(PatchError):
+        apply_patch(doc, [{"op": "replace", "path": "/tasks/a/status", "value": "done"}, {"op": "remove", "path": "/nope"}])
+    assert doc == {"tasks": {"a": {"status": "todo"}}}
+
+
+def test_field_path_creates_parents_and_logs_plain_ops():
+    doc, applied = apply_patch({"tasks": {}}, [{"field": "tasks.intro.status", "value": "done"}])
+    assert doc == {"tasks": {"intro": {"status": "done"}}}
+    assert applied == [
+        {"op": "add", "path": "/tasks/intro", "value": {}},
+        {"op": "add", "path": "/tasks/intro/status", "value": "done"},
+    ]
+
+
+def test_malformed_entries_are_rejected():
+    with pytest.raises(PatchError):
+        apply_patch({}, [{"path": "/a"}])
+    with pytest.raises(PatchError):
+        apply_patch({}, {"op": "add"})
+
+
+@pytest.mark.parametrize("old, new", [
+    ({"a": 1, "b": {"c": [1, 2]}}, {"a": 1, "b": {"c": [1, 2, 3]}, "d": None}),
+    ({"a/b": {"~": 1}}, {"a/b": {"~": 2}}),
+    ({"a": 1}, {"a": True}),
+    ({"a": {"b": 1}}, {"a": [1]}),
+    ({}, {}),
+])
+def test_diff_round_trips(old, new):
+    ops = diff(old, new)
+    assert patched(old, ops) == new
+    assert type(patched(old, ops).get("a")) is type(new.get("a"))
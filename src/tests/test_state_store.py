@@ -0,0 +1,164 @@
+import threading
+
+import pytest
+
+from agent_core.state_store import MemoryStateStore, SQLiteStateStore, VersionConflictError
+
+PROJECT = ("project", "a")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = MemoryStateStore() if request.param == "memory" else SQLiteStateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / "state.db")
+
+
+def test_put_get_and_versions(store):
+    assert store.get_versioned(PROJECT, "state") == (None, 0)
+    assert store.put(PROJECT, "state", {"a": 1}) == 1
+    assert store.put(PROJECT, "state", {"a": 2}) == 2
+    assert store.get_versioned(PROJECT, "state") == ({"a": 2}, 2)
+    assert store.list_keys(PROJECT) == ["state"]
+    assert store.list_versions(PROJECT) == {"state": 2}
+    assert store.list_namespaces(("project",)) == [PROJECT]
+
+
+def test_returned_values_are_copies(store):
+    store.put(PROJECT, "state", {"tasks": {"a": {}}})
+    store.get(PROJECT, "state")["tasks"]["a"]["status"] = "done"
+    assert store.get(PROJECT, "state") == {"tasks": {"a": {}}}
+
+
+def test_conditional_writes(store):
+    store.put(PROJECT, "state", {"a": 1})
+    with pytest.raises(VersionConflictError):
+        store.put(PROJECT, "state", {"a": 2}, expected_version=0)
+    with pytest.raises(VersionConflictError):
+        store.patch(PROJECT, "state", [{"op": "add", "path": "/b", "value": 1}], expected_version=5)
+    value, version = store.patch(PROJECT, "state", [{"op": "add", "path": "/b", "value": 1}], expected_version=1)
+    assert (value, version) == ({"a": 1, "b": 1}, 2)
+
+
+def test_delete_drops_value_and_changes(store):
+    store.put(PROJECT, "state", {"a": 1})
+    store.delete(PROJECT, "state")
+    assert store.get_versioned(PROJECT, "state") == (None, 0)
+    assert store.changes_since(PROJECT, "state", 0) == []
+
+
+def test_concurrent_patches_are_all_applied(sqlite_path):
+    store = SQLiteStateStore(sqlite_path)
+    store.put(PROJECT, "state", {"n": []})
+
+    def append(i):
+        store.patch(PROJECT, "state", [{"op": "add", "path": "/n/-", "value": i}])
+
+    threads = [threading.Thread(target=append, args=(i,)) for i in range(50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    value, version = store.get_versioned(PROJECT, "state")
+    assert sorted(value["n"]) == list(range(50)) and version == 51
+    store.close()
+
+
+def test_own_write_only_invalidates_the_written_key(sqlite_path):
+    store = SQLiteStateStore(sqlite_path)
+    store.put(PROJECT, "state", {"a": 1})
+    store.put(PROJECT, "notes", {"text": "x"})
+    store.get(PROJECT, "state")
+    store.get(PROJECT, "notes")
+    assert store.cache_stats()["entries"] == 2
+
+    store.put(PROJECT, "state", {"a": 2})
+    assert store.cache_stats()["entries"] == 1
+    assert store.get(PROJECT, "state") == {"a": 2}
+    assert store.get(PROJECT, "notes") == {"text": "x"}
+    store.close()
+
+
+def test_write_from_another_process_is_seen(sqlite_path):
+    # A second store on the same file has its own connections and writer,
+    # like another worker process
+    local, other = SQLiteStateStore(sqlite_path), SQLiteStateStore(sqlite_path)
+    local.put(PROJECT, "state", {"a": 1})
+    local.put(PROJECT, "notes", {"text": "x"})
+    assert local.get(PROJECT, "state") == {"a": 1}
+    local.get(PROJECT, "notes")
+
+    other.put(PROJECT, "state", {"a": 2})
+    assert local.get_versioned(PROJECT, "state") == ({"a": 2}, 2)
+
+    # The next local write notices it was not the last writer as well
+    other.put(PROJECT, "notes", {"text": "y"})
+    local.put(PROJECT, "other", {})
+    assert local.get(PROJECT, "notes") == {"text": "y"}
+    local.close()
+    other.close()
+
+
+def test_write_to_one_project_keeps_other_projects_cached(sqlite_path):
+    store = SQLiteStateStore(sqlite_path)
+    project_b = ("project", "b")
+    store.put(PROJECT, "state", {"a": 1})
+    store.put(project_b, "state", {"b": 1})
+    store.get(project_b, "state")
+
+    for i in range(5):
+        store.patch(PROJECT, "state", [{"op": "replace", "path": "/a", "value": i}])
+        assert store.get(PROJECT, "state") == {"a": i}
+    assert store._cache["project/b"] == {"state": ({"b": 1}, 1)}
+
+    # A read of B that overlaps a write to A is still cached
+    generation = store._generation("project/b")
+    store.put(PROJECT, "state", {})
+    assert store._generation("project/b") == generation
+    store.close()
+
+
+def test_cold_projects_are_paged_out(sqlite_path):
+    store = SQLiteStateStore(sqlite_path, cache_namespaces=2)
+    for name in "abc":
+        store.put(("project", name), "state", {"name": name})
+        store.get(("project", name), "state")
+    stats = store.cache_stats()
+    assert stats["namespaces"] == 2 and stats["evictions"] == 1
+    assert store.get(("project", "a"), "state") == {"name": "a"}
+    store.close()
+
+
+def test_put_logs_the_diff_from_the_previous_value(store):
+    state = {"title": "t", "tasks": {"a": {"status": "todo"}, "b": {"status": "todo"}}, "team": ["x", "y"] * 20}
+    store.put(PROJECT, "state", state)
+    state["tasks"]["a"]["status"] = "done"
+    del state["tasks"]["b"]
+    store.put(PROJECT, "state", state)
+    first, second = store.changes_since(PROJECT, "state", 0)
+    assert first["ops"] == [{"op": "replace", "path": ""}]  # nothing to diff against
+    assert second["ops"] == [
+        {"op": "remove", "path": "/tasks/b"},
+        {"op": "replace", "path": "/tasks/a/status", "value": "done"},
+    ]
+
+
+def test_rewrite_logs_a_marker_instead_of_a_copy(store):
+    store.put(PROJECT, "doc", {"content": "a" * 1000})
+    store.put(PROJECT, "doc", {"content": "b" * 1000})
+    assert [c["ops"] for c in store.changes_since(PROJECT, "doc", 0)] == [[{"op": "replace", "path": ""}]] * 2
+
+
+def test_change_log_keeps_only_recent_versions(tmp_path):
+    for store in (MemoryStateStore(changes_keep=3), SQLiteStateStore(str(tmp_path / "s.db"), changes_keep=3)):
+        store.put(PROJECT, "state", {"n": 0})
+        for i in range(1, 10):
+            store.patch(PROJECT, "state", [{"op": "replace", "path": "/n", "value": i}])
+        assert [c["version"] for c in store.changes_since(PROJECT, "state", 0)] == [8, 9, 10]
+        assert store.changes_since(PROJECT, "state", 9)[0]["ops"] == [{"op": "replace", "path": "/n", "value": 9}]
+        store.close()
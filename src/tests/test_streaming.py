@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent_core import transport
+from agent_core.holistic_ai_bedrock import HolisticAIBedrockChat
+from agent_core.response_cache import ResponseCache
+from agent_core.streaming import StreamAccumulator, is_event_stream, iter_stream_events
+from api.fake_proxy import create_app
+from benchmarks.server import serve
+
+TOOL_INPUT = {"state": {"tasks": [{"name": "report", "hours": 3}]}}
+SCRIPT = [
+    {"content": [{"type": "text", "text": "Loading the state"}, {"type": "tool_use", "name": "set_state", "input": TOOL_INPUT}]},
+]
+
+EVENTS = [
+    {"type": "message_start", "message": {"usage": {"input_tokens": 7}}},
+    {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}},
+    {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "Hel"}},
+    {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": "lo"}},
+    {"type": "content_block_stop", "index": 0},
+    {"type": "content_block_start", "index": 1, "content_block": {"type": "tool_use", "id": "t1", "name": "get_state"}},
+    {"type": "content_block_delta", "index": 1, "delta": {"type": "input_json_delta", "partial_json": '{"a": '}},
+    {"type": "content_block_delta", "index": 1, "delta": {"type": "input_json_delta", "partial_json": "1}"}},
+    {"type": "content_block_stop", "index": 1},
+    {"type": "message_delta", "delta": {"stop_reason": "tool_use"}, "usage": {"output_tokens": 3}},
+    {"type": "message_stop"},
+]
+
+
+def test_sse_events_are_assembled_across_data_lines():
+    lines = [
+        ": keep-alive",
+        "event: content_block_delta",
+        'data: {"type": "content_block_delta",',
+        'data:  "index": 0}',
+        "",
+        "data: [DONE]",
+        "",
+        'data: {"type": "message_stop"}',
+    ]
+    assert list(iter_stream_events(lines)) == [{"type": "content_block_delta", "index": 0}, {"type": "message_stop"}]
+
+
+def test_ndjson_lines_are_events_and_garbage_is_skipped():
+    lines = [b'{"type": "message_start"}\r', "not json", "[1, 2]", '{"type": "message_stop"}']
+    assert [e["type"] for e in iter_stream_events(lines)] == ["message_start", "message_stop"]
+    assert is_event_stream("text/event-stream; charset=utf-8") and is_event_stream("application/x-ndjson")
+    assert not is_event_stream("application/json")
+
+
+def test_accumulator_emits_deltas_and_rebuilds_the_response():
+    accumulator = StreamAccumulator()
+    chunks = [c for c in map(accumulator.feed, EVENTS) if c is not None]
+    assert [c.content for c in chunks if c.content] == ["Hel", "lo"]
+    assert "".join(c.tool_call_chunks[0]["args"] for c in chunks if c.tool_call_chunks) == '{"a": 1}'
+    assert accumulator.result() == {
+        "content": [
+            {"type": "text", "text": "Hello"},
+            {"type": "tool_use", "id": "t1", "name": "get_state", "input": {"a": 1}},
+        ],
+        "usage": {"input_tokens": 7, "output_tokens": 3},
+        "stop_reason": "tool_use",
+    }
+
+
+@pytest.fixture(scope="module")
+def proxy():
+    with serve(create_app(script=SCRIPT, latency_ms=0, token_delay_ms=0)) as url:
+        yield f"{url}/invoke"
+
+
+@pytest.fixture
+def model(proxy):
+    yield HolisticAIBedrockChat(
+        team_id="team", api_token="token", api_endpoint=proxy, temperature=0, response_cache=ResponseCache(path=None)
+    )
+    transport.close_transports()
+
+
+def merge(chunks):
+    message = chunks[0]
+    for chunk in chunks[1:]:
+        message = message + chunk
+    return message
+
+
+def check_streamed(chunks):
+    assert len([c for c in chunks if c.content]) > 1  # tokens arrive one by one
+    message = merge(chunks)
+    assert message.content.strip() == "Loading the state"
+    assert message.tool_calls[0]["name"] == "set_state" and message.tool_calls[0]["args"] == TOOL_INPUT
+
+
+def test_sync_stream_yields_tokens_and_caches_the_final_response(model):
+    check_streamed(list(model.stream([HumanMessage(content="go")])))
+    assert model.response_cache.stats()["writes"] == 1
+    replay = merge(list(model.stream([HumanMessage(content="go")])))
+    assert replay.tool_calls[0]["args"] == TOOL_INPUT
+    assert model.response_cache.stats()["hits"] == 1
+
+
+def test_async_stream_yields_tokens(model):
+    async def collect():
+        chunks = [c async for c in model.astream([HumanMessage(content="go")])]
+        await transport.aclose_transports()
+        return chunks
+
+    check_streamed(asyncio.run(collect()))
+    assert model.response_cache.stats()["writes"] == 1
@@ -0,0 +1,103 @@
+import json
+from typing import List
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import BaseModel
+
+from agent_core.holistic_ai_bedrock import HolisticAIBedrockChat
+from agent_core.structured_output import loads_lenient, model_schema, parse_structured, repair_args
+
+
+class Item(BaseModel):
+    name: str
+    hours: int
+
+
+class Plan(BaseModel):
+    title: str
+    items: List[Item]
+
+
+ANSWER = {"title": "plan", "items": [{"name": "a", "hours": 2}]}
+
+
+class ScriptedChat(HolisticAIBedrockChat):
+    """Answers each call with the next scripted message and records what was sent."""
+
+    def __init__(self, replies):
+        super().__init__(team_id="team", api_token="token")
+        object.__setattr__(self, "replies", list(replies))
+        object.__setattr__(self, "calls", [])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        payload, _ = self._build_payload(messages, **kwargs)
+        self.calls.append(payload)
+        return ChatResult(generations=[ChatGeneration(message=self.replies.pop(0))])
+
+
+def tool_call(args, id="call-1"):
+    return AIMessage(content="", tool_calls=[{"name": "Plan", "args": args, "id": id}])
+
+
+def test_schema_is_forced_as_a_tool_in_one_call():
+    model = ScriptedChat([tool_call(ANSWER)])
+    plan = model.with_structured_output(Plan).invoke("make a plan")
+    assert plan == Plan.model_validate(ANSWER)
+    (payload,) = model.calls
+    assert payload["tool_choice"] == {"type": "tool", "name": "Plan"}
+    assert payload["tools"][0]["input_schema"]["properties"]["items"]["items"]["properties"]["hours"] == {
+        "type": "integer"
+    }
+
+
+def test_final_json_answer_is_parsed_without_a_call():
+    model = ScriptedChat([])
+    history = [HumanMessage(content="make a plan"), AIMessage(content=f"```json\n{json.dumps(ANSWER)}\n```")]
+    assert model.with_structured_output(Plan).invoke(history) == Plan.model_validate(ANSWER)
+    assert model.calls == []
+
+
+def test_final_prose_answer_is_regenerated_as_the_tool_call():
+    model = ScriptedChat([tool_call(ANSWER)])
+    history = [HumanMessage(content="make a plan"), AIMessage(content="The plan has one item, a.")]
+    model.with_structured_output(Plan).invoke(history)
+    (payload,) = model.calls
+    assert payload["messages"] == [{"role": "user", "content": "make a plan"}]
+
+
+def test_invalid_arguments_are_reasked_with_the_errors():
+    model = ScriptedChat([tool_call({"title": "plan", "items": [{"name": "a"}]}), tool_call(ANSWER, "call-2")])
+    assert model.with_structured_output(Plan).invoke("make a plan") == Plan.model_validate(ANSWER)
+    reask = model.calls[1]["messages"][-1]["content"][0]
+    assert reask["type"] == "tool_result" and "items.0.hours" in reask["content"]
+
+
+def test_gives_up_after_max_reasks():
+    model = ScriptedChat([tool_call({"title": "plan"})] * 2)
+    with pytest.raises(ValueError, match="Failed to validate structured output"):
+        model.with_structured_output(Plan, max_reasks=1).invoke("make a plan")
+    assert len(model.calls) == 2
+
+
+def test_common_argument_mistakes_are_repaired_locally():
+    schema = model_schema(Plan)
+    nested_as_string = {"title": "plan", "items": json.dumps(ANSWER["items"])}
+    assert repair_args(nested_as_string, schema) == ANSWER
+    assert repair_args({"Plan": ANSWER}, schema) == ANSWER
+    assert loads_lenient('Here you go: {"a": [1, 2,],}') == {"a": [1, 2]}
+    assert parse_structured(Plan, '```\n{"title": "plan", "items": [{"name": "a", "hours": "2"}]}\n```').items[0].hours == 2
+
+
+def test_tool_results_are_sent_as_tool_result_blocks():
+    model = ScriptedChat([])
+    payload, _ = model._build_payload([
+        HumanMessage(content="go"),
+        tool_call({"title": "x"}),
+        ToolMessage(content="ok", tool_call_id="call-1"),
+    ])
+    assert payload["messages"][1]["content"][0] == {
+        "type": "tool_use", "id": "call-1", "name": "Plan", "input": {"title": "x"}
+    }
+    assert payload["messages"][2]["content"] == [{"type": "tool_result", "tool_use_id": "call-1", "content": "ok"}]
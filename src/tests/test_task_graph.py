@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from agent_core.task_graph import ScheduleMonitor, TaskGraph, task_duration
+
+
+def random_dag(rng, n, max_deps=4):
+    return {f"t{i}": [f"t{j}" for j in rng.sample(range(i), min(i, rng.randint(0, max_deps)))] for i in range(n)}
+
+
+def test_schedule_of_small_graph():
+    graph = TaskGraph({"a": [], "b": ["a"], "c": ["a"], "d": ["b", "c"]}, {"a": 1, "b": 3, "c": 1, "d": 2})
+    assert graph.makespan == 6
+    assert graph.critical_path() == ["a", "b", "d"]
+    slack = {row["task"]: row for row in graph.schedule()}
+    assert slack["c"]["earliest_start"] == 1 and slack["c"]["latest_start"] == 3 and slack["c"]["slack"] == 2
+    assert all(slack[t]["critical"] for t in "abd")
+
+
+def test_cycle_is_reported_with_its_tasks():
+    graph = TaskGraph({"a": ["c"], "b": ["a"], "c": ["b"], "d": []}, {})
+    assert not graph.valid
+    assert set(graph.cycle) == {"a", "b", "c"} and graph.cycle[0] == graph.cycle[-1]
+    assert graph.report()["valid"] is False
+
+
+def test_unknown_prerequisites_are_reported_and_ignored():
+    graph = TaskGraph({"a": ["missing"], "b": ["a"]}, {"a": 1, "b": 1})
+    assert graph.missing == {"a": ["missing"]}
+    assert graph.makespan == 2
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_repair_matches_full_rebuild(seed):
+    rng = random.Random(seed)
+    dependencies = random_dag(rng, 400)
+    durations = {name: rng.uniform(0, 5) for name in dependencies}
+    graph = TaskGraph(dependencies, durations)
+    for _ in range(100):
+        name = f"t{rng.randrange(400)}"
+        durations[name] = rng.choice([0.0, rng.uniform(0, 10)])
+        graph.set_duration(name, durations[name])
+    rebuilt = TaskGraph(dependencies, durations)
+    assert graph.head == pytest.approx(rebuilt.head)
+    assert graph.tail == pytest.approx(rebuilt.tail)
+    assert graph.makespan == pytest.approx(rebuilt.makespan)
+    assert graph.critical_path() == rebuilt.critical_path()
+
+
+def test_remaining_duration_follows_progress():
+    assert task_duration({"duration": 4, "status": "25%"}) == 3
+    assert task_duration({"effort": 2, "status": "done"}) == 0
+    assert task_duration({}) == 1
+
+
+def test_monitor_is_incremental_only_for_status_or_duration_changes():
+    monitor = ScheduleMonitor()
+    state = {"tasks": {"a": {"duration": 2}, "b": {"duration": 3, "depends_on": ["a"]}, "c": {"duration": 1, "depends_on": ["a"]}}}
+    assert monitor.observe("p", state, 1)["incremental"] is False
+
+    state["tasks"]["b"]["status"] = "done"
+    report = monitor.observe("p", state, 2, changed_tasks=["b"])
+    assert report["incremental"] and report["critical_path"] == ["a", "c"] and report["makespan"] == 3
+
+    state["tasks"]["c"]["depends_on"] = []
+    assert monitor.observe("p", state, 3, changed_tasks=["c"])["incremental"] is False
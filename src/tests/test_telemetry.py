@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.main as main
+from agent_core.telemetry import MetricsRegistry, RingBufferExporter, add_exporter, set_exporters, span, traced
+
+
+@pytest.fixture
+def exporter():
+    ring = RingBufferExporter(size=100)
+    set_exporters([ring])
+    yield ring
+    set_exporters([RingBufferExporter()])
+
+
+def test_metrics_render_in_prometheus_text_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    registry.gauge("queue_depth", "Depth", lambda: 3)
+    registry.gauge("broken", "Raises", lambda: 1 / 0)
+    requests.inc(route='/a"b')
+    requests.inc(2, route='/a"b')
+    latency.observe(0.05)
+    latency.observe(5)
+    text = registry.render()
+    assert 'requests_total{route="/a\\"b"} 3.0' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text and "queue_depth 3.0" in text
+    assert "broken" not in text
+    assert registry.counter("requests_total", "again") is requests
+
+
+def test_nested_spans_share_the_trace_and_record_errors(exporter):
+    with span("outer", kind="test") as outer:
+        with pytest.raises(KeyError):
+            with span("inner"):
+                raise KeyError("x")
+    inner_record, outer_record = exporter.spans()
+    assert inner_record["parent_id"] == outer.span_id and inner_record["trace_id"] == outer.trace_id
+    assert inner_record["status"] == "error" and "KeyError" in inner_record["error"]
+    assert outer_record["status"] == "ok" and outer_record["attributes"] == {"kind": "test"}
+
+
+def test_traced_wraps_sync_and_async_functions(exporter):
+    @traced("sync.fn")
+    def double(x):
+        return 2 * x
+
+    @traced()
+    async def triple(x):
+        return 3 * x
+
+    assert double(2) == 4 and asyncio.run(triple(2)) == 6
+    assert [s["name"] for s in exporter.spans()] == ["sync.fn", f"{__name__}.test_traced_wraps_sync_and_async_functions.<locals>.triple"]
+
+
+def test_failing_exporter_does_not_break_the_traced_call(exporter):
+    class Broken:
+        def export(self, record):
+            raise RuntimeError("down")
+
+    add_exporter(Broken())
+    with span("still.works"):
+        pass
+    assert exporter.spans(name="still.works")
+
+
+def test_http_requests_are_traced_and_exported_as_metrics(exporter):
+    client = TestClient(main.app)
+    client.get("/projects/demo/project-state")
+    text = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/projects/{project_id}/project-state",status="200"}' in text
+    assert "agent_jobs_queue_depth" in text
+    assert exporter.spans(name="http.request")[0]["attributes"]["route"] == "/projects/{project_id}/project-state"
+    assert client.get("/traces", params={"name": "http.request", "limit": 1}).json()[0]["name"] == "http.request"
+
+
+def test_state_reads_run_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def read(project_id=None):
+        try:
+            asyncio.get_running_loop()
+            threads.append("event loop")
+        except RuntimeError:
+            threads.append("worker")
+        return {"tasks": {}}, 1
+
+    monkeypatch.setattr(main, "get_state_versioned", read)
+    monkeypatch.setattr(main, "state_changes_since", lambda since, project_id=None: read() and [])
+    client = TestClient(main.app)
+    client.get("/project-state")
+    client.get("/project-state/changes")
+    assert threads == ["worker"] * 3
@@ -0,0 +1,127 @@
+import threading
+import time
+
+from langchain.agents import create_agent
+from langchain.agents.middleware import ToolCallRequest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+from agent_core.tool_concurrency import ToolConcurrencyMiddleware, parallel_safe
+
+
+class ScriptedModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def build(tools, tool_calls):
+    model = ScriptedModel(messages=iter([AIMessage(content="", tool_calls=tool_calls), AIMessage(content="done")]))
+    middleware = ToolConcurrencyMiddleware()
+    return create_agent(model, tools=tools, middleware=[middleware]), middleware
+
+
+def call(tool_name, id, **args):
+    return {"name": tool_name, "args": args, "id": id}
+
+
+def request_for(message, index, tools):
+    runtime = type("Runtime", (), {"tools": tools})()
+    tool_call = message.tool_calls[index]
+    return ToolCallRequest(tool_call, next(t for t in tools if t.name == tool_call["name"]), {"messages": [message]}, runtime)
+
+
+def test_declared_calls_overlap_and_undeclared_ones_keep_their_order():
+    running, peak, order = [0], [0], []
+    lock = threading.Lock()
+
+    @tool
+    def fetch(name: str) -> str:
+        """Fetch a file."""
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.1)
+        with lock:
+            running[0] -= 1
+        return name
+
+    @tool
+    def record(value: str) -> str:
+        """Record a value."""
+        time.sleep(0.05 if value == "first" else 0)
+        order.append(value)
+        return value
+
+    parallel_safe(fetch)
+    agent, middleware = build([fetch, record], [
+        call("record", "c1", value="first"),
+        call("fetch", "c2", name="a"),
+        call("fetch", "c3", name="b"),
+        call("record", "c4", value="second"),
+    ])
+    agent.invoke({"messages": [HumanMessage(content="go")]})
+    assert peak[0] == 2
+    assert order == ["first", "second"]
+    assert middleware._turns == {}
+
+
+def test_reader_waits_for_a_write_issued_earlier_in_the_turn():
+    state = {"value": "old"}
+
+    @tool
+    def write(value: str) -> str:
+        """Write state."""
+        time.sleep(0.1)
+        state["value"] = value
+        return value
+
+    @tool
+    def read() -> str:
+        """Read state."""
+        return state["value"]
+
+    parallel_safe(read, reads=("state",))
+    agent, _ = build([write, read], [call("write", "c1", value="new"), call("read", "c2")])
+    messages = agent.invoke({"messages": [HumanMessage(content="go")]})["messages"]
+    results = {m.tool_call_id: m.content for m in messages if isinstance(m, ToolMessage)}
+    assert results["c2"] == "new"
+
+
+def test_unrelated_resources_do_not_serialise():
+    middleware = ToolConcurrencyMiddleware()
+
+    @tool
+    def load(path: str) -> str:
+        """Load a document."""
+        return path
+
+    @tool
+    def read() -> str:
+        """Read state."""
+        return ""
+
+    parallel_safe(load, writes=("documents",))
+    parallel_safe(read, reads=("state",))
+    message = AIMessage(content="", tool_calls=[call("load", "c1", path="a"), call("load", "c2", path="b"), call("read", "c3")])
+    assert middleware._sequenced_ids(request_for(message, 2, [load, read])) == []
+
+
+def test_turns_whose_calls_never_ran_are_dropped_at_the_next_model_call():
+    middleware = ToolConcurrencyMiddleware()
+
+    @tool
+    def write(value: str) -> str:
+        """Write state."""
+        return value
+
+    message = AIMessage(content="", tool_calls=[call("write", "c1", value="a"), call("write", "c2", value="b")])
+    request = request_for(message, 0, [write])
+    middleware.wrap_tool_call(request, lambda r: "ok")
+    assert len(middleware._turns) == 1  # c2 was never executed
+
+    other = {"messages": [AIMessage(content="", tool_calls=[call("write", "x1", value="c")])]}
+    middleware.before_model(other, None)
+    assert len(middleware._turns) == 1
+    middleware.before_model(request.state, None)
+    assert middleware._turns == {}
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from agent_core import transport
+from agent_core.holistic_ai_bedrock import HolisticAIBedrockChat
+from api.fake_proxy import create_app
+from benchmarks.server import serve
+
+SCRIPT = [{"content": [{"type": "text", "text": "pong"}]}]
+
+
+@pytest.fixture(scope="module")
+def proxy():
+    app = create_app(script=SCRIPT, latency_ms=0, token_delay_ms=0)
+    with serve(app) as url:
+        yield app, f"{url}/invoke"
+
+
+@pytest.fixture
+def model(proxy):
+    transport.close_transports()
+    yield HolisticAIBedrockChat(team_id="team", api_token="token", api_endpoint=proxy[1], pool_size=3)
+    transport.close_transports()
+
+
+def test_sync_calls_reuse_one_pooled_connection(proxy, model):
+    app, url = proxy
+    before = app.state.requests
+    for _ in range(3):
+        assert model.invoke([HumanMessage(content="ping")]).content == "pong"
+    assert app.state.requests - before == 3
+    session = transport.get_sync_session(3)
+    pools = session.get_adapter(url).poolmanager.pools
+    (key,) = pools.keys()
+    assert pools[key].num_connections == 1
+
+
+def test_sync_sessions_are_shared_per_pool_size_until_closed():
+    first = transport.get_sync_session(5)
+    assert transport.get_sync_session(5) is first and transport.get_sync_session(6) is not first
+    transport.close_transports()
+    assert transport.get_sync_session(5) is not first
+    transport.close_transports()
+
+
+def test_async_calls_share_a_client_per_event_loop(model):
+    async def run():
+        client = transport.get_async_client(3, http2=False)
+        results = await asyncio.gather(*(model.ainvoke([HumanMessage(content="ping")]) for _ in range(4)))
+        assert transport.get_async_client(3, http2=False) is client
+        await transport.aclose_transports()
+        return client, [r.content for r in results]
+
+    client, contents = asyncio.run(run())
+    assert contents == ["pong"] * 4 and client.is_closed
+    assert asyncio.run(run())[0] is not client
@@ -0,0 +1,104 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import agent_core.tools as tools
+import api.main as main
+from agent_core.uploads import INDEX_FILE, UploadTooLargeError, store_upload
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(tools, "UPLOAD_FOLDER", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def client(folder):
+    return TestClient(main.app)
+
+
+def stored_files(folder):
+    return sorted(name for name in os.listdir(folder) if os.path.isfile(os.path.join(folder, name)))
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    first = store_upload(io.BytesIO(b"brief"), "brief.txt", str(tmp_path), chunk_size=2)
+    again = store_upload(io.BytesIO(b"brief"), "copy.txt", str(tmp_path))
+    assert not first["duplicate"] and again["duplicate"]
+    assert again["filename"] == "brief.txt" and again["sha256"] == first["sha256"]
+    assert stored_files(tmp_path) == [INDEX_FILE, "brief.txt"]
+
+
+def test_same_name_different_content_keeps_both(tmp_path):
+    store_upload(io.BytesIO(b"v1"), "brief.txt", str(tmp_path))
+    second = store_upload(io.BytesIO(b"v2"), "../brief.txt", str(tmp_path))
+    assert second["filename"].startswith("brief-") and second["filename"].endswith(".txt")
+    assert len(stored_files(tmp_path)) == 3
+
+
+def test_oversized_upload_leaves_nothing_behind(tmp_path):
+    with pytest.raises(UploadTooLargeError):
+        store_upload(io.BytesIO(b"x" * 100), "big.bin", str(tmp_path), max_bytes=10, chunk_size=4)
+    assert os.listdir(tmp_path) == []
+
+
+def test_upload_endpoint_stores_and_deduplicates(client, folder):
+    first = client.post("/upload", files={"file": ("a.txt", b"hello")}).json()
+    again = client.post("/projects/p1/upload", files={"file": ("b.txt", b"hello")}).json()
+    dup = client.post("/upload", files={"file": ("c.txt", b"hello")}).json()
+    assert first["status"] == "success" and not first["duplicate"]
+    assert again["stored_at"] == os.path.join(folder, "projects", "p1", "b.txt") and not again["duplicate"]
+    assert dup["duplicate"] and dup["filename"] == "a.txt"
+
+
+def test_upload_without_filename_or_file_part_is_rejected(client, folder):
+    assert client.post("/upload", files={"file": ("", b"hello")}).status_code == 400
+    assert client.post("/upload", files={"other": ("a.txt", b"hello")}).status_code == 400
+    assert client.post("/upload", content=b"x", headers={"content-type": "text/plain"}).status_code == 400
+    assert stored_files(folder) == []
+
+
+def call_upload(chunks, headers):
+    """Drive the ASGI app directly, counting how many body chunks it reads."""
+    received = []
+    messages = []
+
+    async def receive():
+        if len(received) < len(chunks):
+            received.append(chunks[len(received)])
+            return {"type": "http.request", "body": received[-1], "more_body": len(received) < len(chunks)}
+        await asyncio.sleep(10)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/upload", "raw_path": b"/upload", "query_string": b"",
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()], "http_version": "1.1",
+        "scheme": "http", "server": ("test", 80), "client": ("test", 1), "root_path": "",
+    }
+    asyncio.run(main.app(scope, receive, send))
+    return messages[0]["status"], len(received)
+
+
+def test_cap_is_enforced_while_the_body_streams(folder, monkeypatch):
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 1000)
+    head = b'--XX\r\nContent-Disposition: form-data; name="file"; filename="big.bin"\r\n\r\n'
+    chunks = [head] + [b"x" * 100] * 100 + [b"\r\n--XX--\r\n"]
+    status, read = call_upload(chunks, {"content-type": "multipart/form-data; boundary=XX"})
+    assert status == 413
+    assert read < 20  # stopped soon after the cap, not at the end of the body
+    assert os.listdir(folder) == []
+
+
+def test_declared_oversized_body_is_refused_before_reading(folder, monkeypatch):
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 1000)
+    status, read = call_upload(
+        [b"x" * 100], {"content-type": "multipart/form-data; boundary=XX", "content-length": str(10 ** 9)}
+    )
+    assert (status, read) == (413, 0)
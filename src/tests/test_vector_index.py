@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import agent_core.embedding_cache as embedding_cache
+import agent_core.embedding_worker as embedding_worker
+import agent_core.tools as tools
+from agent_core.embedding_cache import EmbeddingCache
+from agent_core.embedding_worker import EmbeddingWorker
+from agent_core.vector_index import VectorIndex, chunk_text
+from benchmarks.synthetic import SyntheticEncoder, lorem
+
+
+def test_short_text_is_one_chunk_and_blank_text_none():
+    assert chunk_text("  one paragraph  ") == ["one paragraph"]
+    assert chunk_text(" \n ") == []
+
+
+def test_long_text_is_split_at_paragraphs_with_overlap():
+    paragraphs = [lorem(40, seed) for seed in range(12)]
+    text = "\n\n".join(paragraphs)
+    chunks = chunk_text(text, chunk_size=600, overlap=100)
+    assert len(chunks) > 1 and all(len(c) <= 600 for c in chunks)
+    assert all(c.endswith(tuple(paragraphs)) for c in chunks[:-1])
+    assert all(a[-50:] in b for a, b in zip(chunks, chunks[1:]))
+    assert all(p in text for p in chunks)
+
+
+def test_search_ranks_by_cosine_and_filters_on_metadata():
+    index = VectorIndex(initial_capacity=2)
+    index.add(
+        ["a", "b", "c", "d"],
+        [[1, 0, 0], [0.9, 0.1, 0], [0, 1, 0], [0, 0, 0]],
+        [{"file": "x"}, {"file": "y"}, {"file": "x"}, {"file": "z"}],
+    )
+    hits = index.search([2, 0, 0], k=2)
+    assert [h["id"] for h in hits] == ["a", "b"] and hits[0]["score"] == pytest.approx(1.0)
+    assert [h["id"] for h in index.search([0, 1, 0], k=5, where={"file": "x"})] == ["c", "a"]
+    assert [h["id"] for h in index.search([1, 0, 0], where={"file": ["y", "z"]})] == ["b", "d"]
+    assert index.search([1, 0, 0], where={"file": "missing"}) == []
+
+
+def test_delete_compacts_rows_and_dimension_is_enforced():
+    index = VectorIndex()
+    index.add(["a", "b", "c"], np.eye(3), [{"doc": 1}, {"doc": 2}, {"doc": 1}])
+    assert index.delete({"doc": 1}) == 2 and len(index) == 1
+    assert [h["id"] for h in index.search([0, 1, 0])] == ["b"]
+    with pytest.raises(ValueError):
+        index.add(["d"], [[1.0, 0.0]], [{}])
+    with pytest.raises(ValueError):
+        index.add(["d", "e"], np.eye(3)[:1], [{}, {}])
+
+
+@pytest.fixture
+def synthetic_embeddings(tmp_path, monkeypatch):
+    worker = EmbeddingWorker(encoder=SyntheticEncoder(dimension=32), max_wait_ms=1)
+    monkeypatch.setattr(embedding_worker, "_worker", worker)
+    key = f"{worker.model_name}|{worker.backend}"
+    monkeypatch.setattr(embedding_cache, "_caches", {key: EmbeddingCache(key, root=str(tmp_path))})
+    monkeypatch.setattr(tools, "document_index", VectorIndex())
+    yield
+    worker.close()
+
+
+def test_indexed_documents_are_searchable_per_file(synthetic_embeddings):
+    budget = "The project budget is twelve thousand pounds for equipment and travel."
+    schedule = "Milestones: prototype in March, user testing in April, final report in May."
+    assert tools.index_document("budget.txt", budget, "sha-1") == 1
+    assert tools.index_document("budget.txt", budget, "sha-1") == 1  # same version: not re-indexed
+    tools.index_document("schedule.txt", schedule, "sha-2")
+    assert len(tools.document_index) == 2
+
+    hits = tools.search_documents.invoke({"query": "budget pounds equipment", "k": 2})
+    assert hits[0]["file_name"] == "budget.txt" and hits[0]["score"] > hits[1]["score"]
+    only = tools.search_documents.invoke({"query": "budget", "file_name": "schedule.txt"})
+    assert [h["file_name"] for h in only] == ["schedule.txt"]
+
+    tools.index_document("budget.txt", "Revised budget text.", "sha-3")
+    assert tools.document_index.count({"file_name": "budget.txt"}) == 1